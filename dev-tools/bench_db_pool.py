@@ -0,0 +1,121 @@
+"""Benchmark dell'engine SQLite: richieste/s sugli endpoint che leggono dal DB.
+
+Confronta la configurazione precedente (NullPool, nessuna PRAGMA: una nuova
+connessione aiosqlite e il suo thread per ogni sessione) con l'engine del
+progetto (pool di connessioni e PRAGMA WAL, synchronous=NORMAL, cache, mmap,
+temp_store). Gli endpoint sono serviti in-process con httpx.ASGITransport e i
+dati sono gia' nel DB, quindi non ci sono chiamate all'API Il Post.
+
+Uso (dalla root del repository):
+    python dev-tools/bench_db_pool.py [--episodes 100] [--concurrency 8] [--seconds 5]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault("EMAIL", "bench@example.com")
+os.environ.setdefault("PASSWORD", "bench")
+os.environ["DB_DIR"] = tempfile.mkdtemp(prefix="ilpostapi_bench_")
+os.environ.setdefault("UPSTREAM_WARMUP", "false")
+for name in ("INBOUND_TOKEN_RATE_PER_MINUTE", "INBOUND_USER_RATE_PER_MINUTE",
+             "INBOUND_IP_RATE_PER_MINUTE", "FEED_MAX_INFLIGHT_RENDERS"):
+    os.environ[name] = "0"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+os.chdir(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import httpx  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import NullPool  # noqa: E402
+
+from database import database  # noqa: E402
+from database.models import Base, Episode, Podcast  # noqa: E402
+from database.user_operations import create_user  # noqa: E402
+from main import app  # noqa: E402
+
+PODCAST_ID = 1
+
+
+async def _populate(engine, session_factory, episodes: int) -> str:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    now = datetime.now(timezone.utc)
+    async with session_factory() as db:
+        podcast = Podcast(id=PODCAST_ID, ilpost_id=str(PODCAST_ID), title="Podcast",
+                          last_checked=now, last_full_sync=now)
+        db.add(podcast)
+        db.add_all(
+            Episode(
+                ilpost_id=str(i), podcast=podcast, title=f"Episodio {i}",
+                description="<p>" + "Lorem ipsum dolor sit amet. " * 40 + "</p>",
+                summary="Sommario", description_verified=True,
+                audio_url=f"https://example.com/{i}.mp3", episode_type="full",
+                publication_date=now, duration=1800,
+            )
+            for i in range(episodes)
+        )
+        user = await create_user(db, username="bench", email="bench@example.com",
+                                 password="benchpass123", role="admin")
+        await db.commit()
+        return user.rss_token
+
+
+async def _requests_per_second(client, url: str, concurrency: int, seconds: float) -> float:
+    done = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker():
+        nonlocal done
+        while time.perf_counter() < deadline:
+            response = await client.get(url)
+            assert response.status_code == 200, response.status_code
+            done += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return done / (time.perf_counter() - started)
+
+
+async def main(args):
+    # Un file per configurazione: journal_mode=WAL resta registrato nel file
+    legacy_url = f"sqlite+aiosqlite:///{os.path.join(os.environ['DB_DIR'], 'legacy.db')}"
+    legacy_engine = create_async_engine(
+        legacy_url, poolclass=NullPool,
+        connect_args={"check_same_thread": False, "timeout": 30},
+    )
+    configurations = (
+        ("NullPool, nessuna PRAGMA", legacy_engine),
+        ("pool + PRAGMA", database.engine),
+    )
+
+    print(f"{'engine':<26} {'endpoint':<14} {'richieste/s':>12}")
+    for label, engine in configurations:
+        session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        database.AsyncSessionLocal = session_factory
+        token = await _populate(engine, session_factory, args.episodes)
+        endpoints = (
+            ("feed RSS", f"/podcast/{PODCAST_ID}/rss/{token}"),
+            ("lista episodi", f"/api/podcast/{PODCAST_ID}/episodes"),
+        )
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await client.post(
+                "/auth/login", data={"username": "bench", "password": "benchpass123"}
+            )
+            for endpoint, url in endpoints:
+                await _requests_per_second(client, url, args.concurrency, 0.5)  # riscaldamento
+                rps = await _requests_per_second(client, url, args.concurrency, args.seconds)
+                print(f"{label:<26} {endpoint:<14} {rps:>12.1f}")
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--episodes", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,109 @@
+"""Benchmark delle scritture concorrenti: COMMIT per richiesta vs scrittore unico.
+
+Piu' task aggiornano in parallelo il timestamp di controllo dei podcast (la
+scrittura piu' frequente, una per feed servito). Confronta:
+  - una sessione e una COMMIT per scrittura, come prima (i task si contendono
+    il lock di SQLite)
+  - le stesse scritture passate a db_writer, che le raggruppa in transazioni
+
+Riporta scritture al secondo, transazioni eseguite, latenza p50/p99 ed errori
+"database is locked".
+
+Uso (dalla root del repository):
+    python dev-tools/bench_db_writer.py [--tasks 32] [--writes 50]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault("EMAIL", "bench@example.com")
+os.environ.setdefault("PASSWORD", "bench")
+os.environ["DB_DIR"] = tempfile.mkdtemp(prefix="ilpostapi_bench_")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from sqlalchemy import update  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from database.database import AsyncSessionLocal, engine  # noqa: E402
+from database.models import Base, Podcast  # noqa: E402
+from database.writer import db_writer  # noqa: E402
+from utils import metrics  # noqa: E402
+
+PODCASTS = 20
+
+
+def _touch_statement(podcast_id: int):
+    return (
+        update(Podcast)
+        .where(Podcast.id == podcast_id)
+        .values(last_checked=datetime.now(timezone.utc))
+    )
+
+
+async def commit_per_write(podcast_id: int):
+    async with AsyncSessionLocal() as db:
+        await db.execute(_touch_statement(podcast_id))
+        await db.commit()
+
+
+async def single_writer(podcast_id: int):
+    stmt = _touch_statement(podcast_id)
+
+    async def touch(session):
+        await session.execute(stmt)
+
+    await db_writer.submit(touch)
+
+
+async def _run(write, tasks: int, writes: int) -> tuple:
+    latencies, errors = [], 0
+
+    async def worker(n: int):
+        nonlocal errors
+        for i in range(writes):
+            started = time.perf_counter()
+            try:
+                await write(1 + (n + i) % PODCASTS)
+            except OperationalError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(tasks)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return len(latencies) / elapsed, statistics.median(latencies), p99, errors
+
+
+async def main(args):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        db.add_all(Podcast(ilpost_id=str(i), title=f"Podcast {i}") for i in range(PODCASTS))
+        await db.commit()
+
+    print(f"{'scritture':<18} {'scritture/s':>12} {'transazioni':>12} "
+          f"{'p50 (ms)':>9} {'p99 (ms)':>9} {'errori':>7}")
+    for label, write in (("COMMIT per scrittura", commit_per_write), ("scrittore unico", single_writer)):
+        before = metrics.get_counter("db_write_transactions_total")
+        rate, p50, p99, errors = await _run(write, args.tasks, args.writes)
+        transactions = (
+            args.tasks * args.writes if write is commit_per_write
+            else metrics.get_counter("db_write_transactions_total") - before
+        )
+        print(f"{label:<18} {rate:>12.0f} {transactions:>12.0f} "
+              f"{p50 * 1000:>9.1f} {p99 * 1000:>9.1f} {errors:>7}")
+    await db_writer.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=32)
+    parser.add_argument("--writes", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
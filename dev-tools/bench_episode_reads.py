@@ -0,0 +1,173 @@
+"""Benchmark delle letture episodi: oggetti Episode completi vs righe a colonne selezionate.
+
+Per un podcast da 5k episodi confronta, per ogni percorso di lettura, il
+caricamento ORM precedente (get_podcast_episodes con selectinload, ordinamento
+in Python) con le righe Core che leggono solo le colonne usate:
+  - feed RSS: tutti gli episodi copiati nei dict passati al generatore
+  - directory: ultimo episodio del podcast (get_last_episode_info)
+  - elenco JSON: primi 100 episodi serializzati
+
+Per ciascuno riporta tempo, memoria allocata (picco tracemalloc) e blocchi
+di memoria ancora vivi mentre il risultato e' in uso.
+
+Uso (dalla root del repository):
+    python dev-tools/bench_episode_reads.py [--episodes 5000] [--repeat 5]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("EMAIL", "bench@example.com")
+os.environ.setdefault("PASSWORD", "bench")
+os.environ["DB_DIR"] = tempfile.mkdtemp(prefix="ilpostapi_bench_")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from database.database import AsyncSessionLocal, engine  # noqa: E402
+from database.models import Base, Episode, Podcast  # noqa: E402
+from database.operations import (  # noqa: E402
+    EPISODE_FEED_COLUMNS,
+    EPISODE_LIST_COLUMNS,
+    LATEST_EPISODE_COLUMNS,
+    get_podcast_episodes,
+)
+
+PODCAST_ID = 1
+
+
+def _feed_dicts(episodes) -> list:
+    """Copia degli episodi nei dict del generatore RSS, come in _generate_rss."""
+    return [
+        {
+            "id": ep.id, "title": ep.title, "description": ep.description,
+            "content_html": ep.description, "summary": ep.summary or "",
+            "episode_raw_url": ep.audio_url, "author": ep.author or "",
+            "image": ep.image_url or "", "share_url": ep.share_url or "",
+            "slug": ep.slug or "", "episode_type": ep.episode_type or "full",
+            "date": ep.publication_date.isoformat() if ep.publication_date else None,
+            "milliseconds": ep.duration * 1000 if ep.duration else None,
+        }
+        for ep in episodes
+    ]
+
+
+def _list_dicts(episodes) -> list:
+    return [
+        {
+            "id": ep.id, "ilpost_id": ep.ilpost_id, "title": ep.title,
+            "description": ep.description, "audio_url": ep.audio_url,
+            "date": ep.publication_date.isoformat() if ep.publication_date else None,
+            "duration": ep.duration * 1000 if ep.duration else None,
+        }
+        for ep in episodes
+    ]
+
+
+def _newest_first(episodes) -> list:
+    return sorted(episodes, key=lambda x: x.publication_date or datetime.min, reverse=True)
+
+
+async def orm_feed(db):
+    episodes, _ = await get_podcast_episodes(db, PODCAST_ID)
+    return _feed_dicts(_newest_first(episodes))
+
+
+async def rows_feed(db):
+    episodes, _ = await get_podcast_episodes(db, PODCAST_ID, columns=EPISODE_FEED_COLUMNS)
+    return _feed_dicts(episodes)
+
+
+async def orm_latest(db):
+    episodes, _ = await get_podcast_episodes(db, PODCAST_ID)
+    latest = max(episodes, key=lambda x: x.publication_date or datetime.min)
+    return latest.publication_date, latest.title, latest.duration
+
+
+async def rows_latest(db):
+    episodes, _ = await get_podcast_episodes(
+        db, PODCAST_ID, columns=LATEST_EPISODE_COLUMNS, limit=1
+    )
+    return episodes[0].publication_date, episodes[0].title, episodes[0].duration
+
+
+async def orm_list(db):
+    episodes, _ = await get_podcast_episodes(db, PODCAST_ID)
+    return _list_dicts(_newest_first(episodes)[:100])
+
+
+async def rows_list(db):
+    episodes, _ = await get_podcast_episodes(
+        db, PODCAST_ID, columns=EPISODE_LIST_COLUMNS, limit=100
+    )
+    return _list_dicts(episodes)
+
+
+async def _populate(episodes: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as db:
+        podcast = Podcast(id=PODCAST_ID, ilpost_id=str(PODCAST_ID), title="Podcast",
+                          last_checked=now, last_full_sync=now)
+        db.add(podcast)
+        db.add_all(
+            Episode(
+                ilpost_id=str(i), podcast=podcast, title=f"Episodio {i}",
+                description="<p>" + "Lorem ipsum dolor sit amet. " * 40 + "</p>",
+                summary="Sommario " * 20, description_verified=True,
+                audio_url=f"https://example.com/{i}.mp3", author="Il Post",
+                image_url="https://example.com/img.jpg",
+                share_url=f"https://example.com/ep/{i}", slug=f"episodio-{i}",
+                episode_type="full", publication_date=now - timedelta(hours=i),
+                duration=1800,
+            )
+            for i in range(episodes)
+        )
+        await db.commit()
+
+
+async def _measure(read, repeat: int) -> tuple:
+    """Tempo medio, picco di memoria e blocchi vivi con il risultato in uso."""
+    elapsed = 0.0
+    for _ in range(repeat):
+        async with AsyncSessionLocal() as db:
+            started = time.perf_counter()
+            await read(db)
+            elapsed += time.perf_counter() - started
+
+    async with AsyncSessionLocal() as db:
+        tracemalloc.start()
+        baseline = tracemalloc.take_snapshot()
+        result = await read(db)
+        _, peak = tracemalloc.get_traced_memory()
+        live = tracemalloc.take_snapshot().compare_to(baseline, "filename")
+        tracemalloc.stop()
+        del result
+    blocks = sum(stat.count_diff for stat in live)
+    return elapsed / repeat, peak, blocks
+
+
+async def main(args):
+    await _populate(args.episodes)
+
+    print(f"{'percorso':<14} {'lettura':<8} {'tempo (ms)':>11} {'picco (KiB)':>12} {'blocchi vivi':>13}")
+    for label, orm_read, rows_read in (
+        ("feed RSS", orm_feed, rows_feed),
+        ("directory", orm_latest, rows_latest),
+        ("elenco JSON", orm_list, rows_list),
+    ):
+        for kind, read in (("ORM", orm_read), ("righe", rows_read)):
+            elapsed, peak, blocks = await _measure(read, args.repeat)
+            print(f"{label:<14} {kind:<8} {elapsed * 1000:>11.1f} "
+                  f"{peak / 1024:>12.0f} {blocks:>13}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--episodes", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
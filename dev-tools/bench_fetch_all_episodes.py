@@ -0,0 +1,71 @@
+"""Benchmark di fetch_all_episodes contro un'API Il Post simulata in locale.
+
+Misura il tempo totale di recupero per podcast da 1k/5k/10k episodi,
+confrontando il download sequenziale (concurrency=1) con quello concorrente.
+
+Uso (dalla root del repository):
+    python dev-tools/bench_fetch_all_episodes.py [--latency 0.15] [--concurrency 4]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("EMAIL", "bench@example.com")
+os.environ.setdefault("PASSWORD", "bench")
+os.environ.setdefault("DB_DIR", tempfile.mkdtemp(prefix="ilpostapi_bench_"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import httpx  # noqa: E402
+from unittest.mock import patch  # noqa: E402
+
+import api_client  # noqa: E402
+
+
+def _stub_transport(total: int, latency: float, per_item: float) -> httpx.MockTransport:
+    """Upstream simulato: latenza fissa piu' un costo per episodio restituito."""
+    episodes = [{"id": i, "title": f"Ep {i}"} for i in range(total, 0, -1)]
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        page = int(request.url.params.get("pg", 1))
+        hits = int(request.url.params.get("hits", 1))
+        chunk = episodes[(page - 1) * hits: page * hits]
+        await asyncio.sleep(latency + per_item * len(chunk))
+        return httpx.Response(200, json={
+            "head": {"data": {"total": total, "pg": page, "hits": hits}},
+            "data": chunk,
+        })
+
+    return httpx.MockTransport(handler)
+
+
+async def _run(total: int, concurrency: int, latency: float, per_item: float) -> float:
+    api_client.clear_all_caches()
+    api_client._async_client = httpx.AsyncClient(
+        transport=_stub_transport(total, latency, per_item)
+    )
+    start = time.perf_counter()
+    result = await api_client.fetch_all_episodes(total, concurrency=concurrency)
+    elapsed = time.perf_counter() - start
+    assert len(result["data"]) == total
+    await api_client.close_client()
+    return elapsed
+
+
+async def main(args):
+    print(f"{'episodi':>8} {'seriale (s)':>12} {'concorrente (s)':>16} {'speedup':>8}")
+    with patch("api_client.get_auth_headers", return_value={}):
+        for total in (1000, 5000, 10000):
+            serial = await _run(total, 1, args.latency, args.per_item)
+            parallel = await _run(total, args.concurrency, args.latency, args.per_item)
+            print(f"{total:>8} {serial:>12.3f} {parallel:>16.3f} {serial / parallel:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.15, help="latenza per richiesta (s)")
+    parser.add_argument("--per-item", type=float, default=0.0002, help="costo per episodio (s)")
+    parser.add_argument("--concurrency", type=int, default=api_client.EPISODES_PAGE_CONCURRENCY)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,108 @@
+"""Benchmark della latenza del client HTTP upstream: prima richiesta vs regime.
+
+Confronta:
+  - prima richiesta su client appena creato (DNS + TCP + TLS a carico della richiesta)
+  - prima richiesta dopo warm_up_client() (connessione gia' aperta nel pool)
+  - richieste a regime sullo stesso client (keep-alive)
+
+Senza --url avvia un server uvicorn locale che simula l'API; con --url misura
+un endpoint reale (es. https://api-prod.ilpost.it/podcast/v1/podcast/?pg=1&hits=1).
+
+Uso (dalla root del repository):
+    python dev-tools/bench_http_client.py [--url URL] [--rounds 20] [--requests 200]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("EMAIL", "bench@example.com")
+os.environ.setdefault("PASSWORD", "bench")
+os.environ.setdefault("DB_DIR", tempfile.mkdtemp(prefix="ilpostapi_bench_"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import api_client  # noqa: E402
+
+
+async def _stub_app(scope, receive, send):
+    """App ASGI minimale che risponde come l'API episodi."""
+    if scope["type"] != "http":
+        return
+    body = b'{"head": {"data": {"total": 1}}, "data": [{"id": 1}]}'
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/json")],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def _start_stub_server() -> str:
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    config = uvicorn.Config(_stub_app, host="127.0.0.1", port=port, log_level="error")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/podcast/v1/podcast/1/?pg=1&hits=1"
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _timed_get(client, url: str) -> float:
+    start = time.perf_counter()
+    response = await client.get(url)
+    response.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+async def main(args):
+    url = args.url or _start_stub_server()
+    base = url.split("/", 3)
+    warm_url = "/".join(base[:3])
+
+    cold, warmed = [], []
+    for _ in range(args.rounds):
+        client = api_client.build_async_client()
+        cold.append(await _timed_get(client, url))
+        await client.aclose()
+
+        api_client._async_client = None
+        await api_client.warm_up_client(warm_url)
+        warmed.append(await _timed_get(await api_client.get_async_client(), url))
+        await api_client.close_client()
+
+    client = api_client.build_async_client()
+    await _timed_get(client, url)
+    steady = [await _timed_get(client, url) for _ in range(args.requests)]
+    await client.aclose()
+
+    print(f"target: {url}")
+    print(f"{'scenario':<28} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for label, values in (
+        ("prima richiesta (fredda)", cold),
+        ("prima richiesta (warm-up)", warmed),
+        ("a regime (keep-alive)", steady),
+    ):
+        print(f"{label:<28} {statistics.median(values):>9.2f} {_percentile(values, 99):>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="endpoint reale da misurare (default: server locale)")
+    parser.add_argument("--rounds", type=int, default=20, help="client creati per la misura a freddo")
+    parser.add_argument("--requests", type=int, default=200, help="richieste a regime")
+    asyncio.run(main(parser.parse_args()))
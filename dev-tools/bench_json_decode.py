@@ -0,0 +1,111 @@
+"""Benchmark della decodifica delle risposte episodi: blocco dell'event loop e memoria.
+
+Per risposte da 1k/5k/10k episodi confronta:
+  - response.json() sull'event loop (comportamento precedente)
+  - decodifica incrementale con riduzione ai campi salvati (make_api_request(compact=True))
+
+Riporta il tempo totale, la pausa massima subita da un task che gira in parallelo
+(quanto a lungo le altre richieste restano ferme) e il picco di memoria allocata.
+
+Uso (dalla root del repository):
+    python dev-tools/bench_json_decode.py [--sizes 1000 5000 10000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("EMAIL", "bench@example.com")
+os.environ.setdefault("PASSWORD", "bench")
+os.environ.setdefault("DB_DIR", tempfile.mkdtemp(prefix="ilpostapi_bench_"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import httpx  # noqa: E402
+
+import api_client  # noqa: E402
+from utils.rate_limiter import UpstreamRateLimiter  # noqa: E402
+
+
+def _episode(i: int) -> dict:
+    """Episodio con i campi e le dimensioni tipiche dell'API reale."""
+    return {
+        "id": i, "title": f"Episodio {i}", "date": "2024-01-01T06:00:00+01:00",
+        "content_html": "<p>" + "Lorem ipsum dolor sit amet. " * 40 + "</p>",
+        "summary": "Sommario " * 20, "episode_raw_url": f"https://example.com/{i}.mp3",
+        "author": "Il Post", "image": "https://example.com/img.jpg",
+        "share_url": f"https://example.com/ep/{i}", "slug": f"episodio-{i}",
+        "milliseconds": 1_800_000, "special": 0,
+        "chapters": [{"start": s, "title": f"Capitolo {s}"} for s in range(10)],
+        "access_level": "all", "timestamp": 1704085200, "type": "podcast",
+        "parent": {"id": 1, "title": "Podcast", "description": "Descrizione " * 30,
+                   "image": "https://example.com/p.jpg", "author": "Il Post",
+                   "share_url": "https://example.com/p", "slug": "podcast",
+                   "meta": [{"key": k, "value": "x" * 20} for k in range(10)]},
+    }
+
+
+async def _measure(body: bytes, decode) -> tuple[float, float, float]:
+    """Restituisce (durata, pausa massima dell'event loop, picco memoria MB)."""
+    max_gap = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal max_gap
+        last = time.perf_counter()
+        while running:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            max_gap = max(max_gap, now - last)
+            last = now
+
+    task = asyncio.ensure_future(ticker())
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    await decode(body)
+    elapsed = time.perf_counter() - started
+    running = False
+    await task
+
+    # Memoria misurata in un passaggio separato: tracemalloc rallenta le allocazioni
+    tracemalloc.start()
+    await decode(body)
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return elapsed, max_gap, peak
+
+
+async def main(args):
+    url = f"{api_client.PODCAST_API_BASE_URL}/1/?pg=1&hits=10000"
+
+    async def decode_full(body: bytes):
+        return json.loads(body)
+
+    async def decode_compact(body: bytes):
+        api_client.clear_all_caches()
+        api_client._async_client = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, content=body))
+        )
+        return await api_client._request_upstream(url, compact=True)
+
+    api_client.api_rate_limiter = UpstreamRateLimiter(rate=1e9, burst=1e9)
+    print(f"{'episodi':>8} {'MB':>6} {'modalita':<14} {'tempo (ms)':>11} "
+          f"{'pausa max loop (ms)':>20} {'picco mem (MB)':>15}")
+    for size in args.sizes:
+        body = json.dumps({
+            "head": {"data": {"total": size}},
+            "data": [_episode(i) for i in range(size)],
+        }).encode()
+        for label, decode in (("json() sul loop", decode_full), ("incrementale", decode_compact)):
+            elapsed, gap, peak = await _measure(body, decode)
+            print(f"{size:>8} {len(body) / 1024 / 1024:>6.1f} {label:<14} {elapsed * 1000:>11.1f} "
+                  f"{gap * 1000:>20.1f} {peak:>15.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 10000])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,111 @@
+"""Benchmark della directory: letture per podcast vs riepilogo podcast_stats.
+
+Salva un catalogo di podcast con save_episodes (che aggiorna anche i
+riepiloghi) e confronta, per costruire i dati della directory:
+  - per podcast: ultimo episodio (select_episode_rows, limit 1) e conteggio
+    degli episodi, due query per podcast
+  - riepilogo: una sola lettura di podcasts + podcast_stats
+    (get_podcast_summaries)
+
+Riporta anche il costo del ricalcolo del riepilogo, eseguito a ogni
+salvataggio di episodi nella transazione dello scrittore.
+
+Uso (dalla root del repository):
+    python dev-tools/bench_podcast_stats.py [--podcasts 100] [--episodes 1000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("EMAIL", "bench@example.com")
+os.environ.setdefault("PASSWORD", "bench")
+os.environ["DB_DIR"] = tempfile.mkdtemp(prefix="ilpostapi_bench_")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from sqlalchemy import select  # noqa: E402
+
+from database.database import AsyncSessionLocal, engine  # noqa: E402
+from database.models import Base, Podcast  # noqa: E402
+from database.operations import (  # noqa: E402
+    LATEST_EPISODE_COLUMNS,
+    count_podcast_episodes,
+    get_podcast_summaries,
+    save_episodes,
+    select_episode_rows,
+)
+from database.stats import podcast_stats_values  # noqa: E402
+from database.writer import db_writer  # noqa: E402
+
+
+def _episode(i: int) -> dict:
+    return {
+        "id": i, "title": f"Puntata {i}", "summary": "Sommario",
+        "date": f"2024-01-01T06:{i % 60:02d}:00+01:00", "content_html": "<p>Testo</p>",
+        "episode_raw_url": f"https://example.com/{i}.mp3", "milliseconds": 1_800_000,
+    }
+
+
+async def per_podcast(db) -> int:
+    podcast_pks = (await db.execute(select(Podcast.id))).scalars().all()
+    for podcast_pk in podcast_pks:
+        await select_episode_rows(db, podcast_pk, LATEST_EPISODE_COLUMNS, limit=1)
+        await count_podcast_episodes(db, podcast_pk)
+    return len(podcast_pks)
+
+
+async def summaries(db) -> int:
+    return len(await get_podcast_summaries(db))
+
+
+async def _timings(read, repeat: int) -> list:
+    latencies = []
+    for _ in range(repeat):
+        async with AsyncSessionLocal() as db:
+            started = time.perf_counter()
+            await read(db)
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def main(args):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSessionLocal() as db:
+        for p in range(args.podcasts):
+            podcast = Podcast(ilpost_id=str(p), title=f"Podcast {p}")
+            db.add(podcast)
+            await db.commit()
+            await save_episodes(db, podcast, [
+                _episode(p * args.episodes + i) for i in range(args.episodes)
+            ])
+
+    print(f"{args.podcasts} podcast da {args.episodes} episodi\n")
+    print(f"{'directory':<14} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for label, read in (("per podcast", per_podcast), ("riepilogo", summaries)):
+        latencies = sorted(await _timings(read, args.repeat))
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{label:<14} {statistics.median(latencies) * 1000:>9.1f} {p99 * 1000:>9.1f}")
+
+    async with AsyncSessionLocal() as db:
+        podcast_pk = await db.scalar(select(Podcast.id).limit(1))
+        latencies = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            await podcast_stats_values(db, podcast_pk)
+            latencies.append(time.perf_counter() - started)
+    print(f"\nricalcolo del riepilogo di un podcast: "
+          f"{statistics.median(latencies) * 1000:.2f} ms (p50)")
+    await db_writer.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--podcasts", type=int, default=100)
+    parser.add_argument("--episodes", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
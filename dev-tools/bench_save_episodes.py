@@ -0,0 +1,116 @@
+"""Benchmark del salvataggio episodi: tempo di ingest e righe scritte.
+
+Per un podcast da 5k episodi confronta il salvataggio riga per riga precedente
+(una SELECT e un INSERT/UPDATE per episodio) con save_episodes (lettura degli
+hash in blocco e upsert dei soli episodi cambiati) in tre scenari:
+  - primo ingest (DB vuoto)
+  - re-ingest identico
+  - re-ingest con l'1% degli episodi modificati
+
+Uso (dalla root del repository):
+    python dev-tools/bench_save_episodes.py [--episodes 5000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("EMAIL", "bench@example.com")
+os.environ.setdefault("PASSWORD", "bench")
+os.environ["DB_DIR"] = tempfile.mkdtemp(prefix="ilpostapi_bench_")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from sqlalchemy import delete, event, select  # noqa: E402
+
+from database.database import AsyncSessionLocal, engine  # noqa: E402
+from database.models import Base, Episode, Podcast  # noqa: E402
+from database.operations import episode_fields, save_episodes  # noqa: E402
+
+
+async def save_episodes_per_row(db, podcast, episodes_data):
+    """Implementazione precedente di save_episodes, come riferimento."""
+    for episode_data in episodes_data:
+        ilpost_id = str(episode_data["id"])
+        result = await db.execute(select(Episode).where(Episode.ilpost_id == ilpost_id))
+        episode = result.scalar_one_or_none()
+        fields = episode_fields(episode_data)
+        if not episode:
+            db.add(Episode(ilpost_id=ilpost_id, podcast=podcast, **fields))
+        else:
+            for key, value in fields.items():
+                setattr(episode, key, value)
+    await db.commit()
+
+
+def _episode(i: int, revision: int = 0) -> dict:
+    return {
+        "id": i, "title": f"Episodio {i}" + (f" (rev {revision})" if revision else ""),
+        "date": "2024-01-01T06:00:00+01:00",
+        "content_html": "<p>" + "Lorem ipsum dolor sit amet. " * 40 + "</p>",
+        "summary": "Sommario " * 20, "episode_raw_url": f"https://example.com/{i}.mp3",
+        "author": "Il Post", "image": "https://example.com/img.jpg",
+        "share_url": f"https://example.com/ep/{i}", "slug": f"episodio-{i}",
+        "milliseconds": 1_800_000, "special": 0,
+    }
+
+
+class WriteCounter:
+    """Conta statement e righe scritte (INSERT/UPDATE) sul DB."""
+
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+        event.listen(engine.sync_engine, "after_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+        if statement.lstrip().upper().startswith(("INSERT", "UPDATE")):
+            self.rows += max(cursor.rowcount, 0)
+
+    def reset(self):
+        self.statements = self.rows = 0
+
+
+async def _run(save, data, counter) -> tuple:
+    async with AsyncSessionLocal() as db:
+        podcast = (await db.execute(select(Podcast))).scalar_one()
+        counter.reset()
+        started = time.perf_counter()
+        await save(db, podcast, data)
+        return time.perf_counter() - started, counter.statements, counter.rows
+
+
+async def main(args):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        db.add(Podcast(ilpost_id="1", title="Podcast"))
+        await db.commit()
+
+    counter = WriteCounter()
+    n = args.episodes
+    initial = [_episode(i) for i in range(n)]
+    changed = [_episode(i, revision=1 if i % 100 == 0 else 0) for i in range(n)]
+
+    print(f"{'implementazione':<16} {'scenario':<22} {'tempo (ms)':>11} "
+          f"{'statement':>10} {'righe scritte':>14}")
+    for label, save in (("riga per riga", save_episodes_per_row), ("in blocco", save_episodes)):
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Episode))
+            await db.commit()
+        for scenario, data in (
+            ("primo ingest", initial),
+            ("re-ingest identico", initial),
+            ("re-ingest 1% cambiati", changed),
+        ):
+            elapsed, statements, rows = await _run(save, data, counter)
+            print(f"{label:<16} {scenario:<22} {elapsed * 1000:>11.1f} "
+                  f"{statements:>10} {rows:>14}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--episodes", type=int, default=5000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,89 @@
+"""Benchmark della ricerca full-text negli episodi salvati.
+
+Salva un catalogo di episodi con save_episodes (che aggiorna anche l'indice
+FTS5) e misura la latenza p50/p99 di search_episodes per alcune ricerche
+tipiche: un titolo preciso, parole presenti in quasi tutti gli episodi (il
+caso peggiore: conteggio e ranking su tutto il catalogo), un prefisso e piu'
+parole.
+
+Uso (dalla root del repository):
+    python dev-tools/bench_search.py [--podcasts 50] [--episodes 200] [--repeat 50]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("EMAIL", "bench@example.com")
+os.environ.setdefault("PASSWORD", "bench")
+os.environ["DB_DIR"] = tempfile.mkdtemp(prefix="ilpostapi_bench_")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from database.database import AsyncSessionLocal, engine  # noqa: E402
+from database.models import Base, Podcast  # noqa: E402
+from database.operations import save_episodes  # noqa: E402
+from database.search import search_episodes  # noqa: E402
+from database.writer import db_writer  # noqa: E402
+
+WORDS = (
+    "governo elezioni economia guerra ucraina europa scuola sanita' clima energia "
+    "calcio musica cinema libri scienza spazio intelligenza artificiale storia "
+    "mafia processo giustizia lavoro pensioni tasse inflazione migranti"
+).split()
+
+QUERIES = ("puntata 4242", "scienza", "intellig", "clima energia europa")
+
+
+def _episode(i: int, rng: random.Random) -> dict:
+    text = " ".join(rng.choice(WORDS) for _ in range(150))
+    return {
+        "id": i, "title": f"Puntata {i}: " + " ".join(rng.choice(WORDS) for _ in range(5)),
+        "date": "2024-01-01T06:00:00+01:00", "content_html": f"<p>{text}</p>",
+        "summary": " ".join(rng.choice(WORDS) for _ in range(20)),
+        "episode_raw_url": f"https://example.com/{i}.mp3", "milliseconds": 1_800_000,
+    }
+
+
+async def main(args):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    rng = random.Random(42)
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        for p in range(args.podcasts):
+            podcast = Podcast(ilpost_id=str(p), title=f"Podcast {p}")
+            db.add(podcast)
+            await db.commit()
+            await save_episodes(db, podcast, [
+                _episode(p * args.episodes + i, rng) for i in range(args.episodes)
+            ])
+    total = args.podcasts * args.episodes
+    print(f"ingest di {total} episodi (con indicizzazione): "
+          f"{(time.perf_counter() - started) * 1000:.0f} ms\n")
+
+    print(f"{'ricerca':<22} {'risultati':>10} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    async with AsyncSessionLocal() as db:
+        for query in QUERIES:
+            latencies = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                _, found = await search_episodes(db, query, per_page=20)
+                latencies.append(time.perf_counter() - t0)
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            print(f"{query:<22} {found:>10} {statistics.median(latencies) * 1000:>9.1f} "
+                  f"{p99 * 1000:>9.1f}")
+    await db_writer.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--podcasts", type=int, default=50)
+    parser.add_argument("--episodes", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
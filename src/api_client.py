@@ -1,37 +1,224 @@
 import asyncio
+import time
 from datetime import datetime, timezone
-from typing import Dict, Optional
+from typing import Any, Callable, Dict, Optional
 
 import httpx
-from cachetools import TTLCache
 from fastapi import HTTPException
 
-from auth import get_auth_headers
-from config import PODCAST_API_BASE_URL, BFF_HP_URL, CACHE_TTL
+from auth import get_auth_headers, token_manager
+from config import (
+    UPSTREAM_BASE_URL,
+    PODCAST_API_BASE_URL,
+    BFF_HP_URL,
+    CACHE_TTL,
+    CACHE_STALE_WHILE_REVALIDATE,
+    CACHE_STALE_IF_ERROR,
+    EPISODES_PAGE_SIZE,
+    EPISODES_PAGE_CONCURRENCY,
+    EPISODES_INCREMENTAL_PAGE_SIZE,
+    UPSTREAM_HTTP2,
+    UPSTREAM_MAX_CONNECTIONS,
+    UPSTREAM_MAX_KEEPALIVE,
+    UPSTREAM_KEEPALIVE_EXPIRY,
+    UPSTREAM_CONNECT_TIMEOUT,
+    UPSTREAM_READ_TIMEOUT,
+    UPSTREAM_WRITE_TIMEOUT,
+    UPSTREAM_POOL_TIMEOUT,
+    UPSTREAM_VALIDATORS_CACHE_SIZE,
+    UPSTREAM_JSON_INCREMENTAL_MIN_BYTES,
+)
+from utils import metrics
 from utils.logging import get_logger
+from utils.circuit_breaker import CircuitOpenError, upstream_breaker
 from utils.rate_limiter import api_rate_limiter
+from utils.retry import parse_retry_after, upstream_retry_policy
+from utils.singleflight import SingleFlight
+from utils.disk_cache import get_disk_cache
+from utils.json_stream import decode_object
+from utils.swr_cache import SWRCache
 
 logger = get_logger(__name__)
 
-# Cache in-memory con TTL automatico
-_podcasts_cache = TTLCache(maxsize=100, ttl=CACHE_TTL)
-_episodes_list_cache = TTLCache(maxsize=100, ttl=CACHE_TTL)
-_episode_info_cache = TTLCache(maxsize=500, ttl=CACHE_TTL)
+# Cache in-memory stale-while-revalidate: alla scadenza del TTL il valore
+# viene ancora servito mentre un task in background lo aggiorna
+# (copiate anche su disco se DISK_CACHE_ENABLED)
+_podcasts_cache = SWRCache(
+    "podcasts", maxsize=100, ttl=CACHE_TTL,
+    grace=CACHE_STALE_WHILE_REVALIDATE, stale_if_error=CACHE_STALE_IF_ERROR,
+    store=get_disk_cache(),
+)
+_episodes_list_cache = SWRCache(
+    "episodes", maxsize=100, ttl=CACHE_TTL,
+    grace=CACHE_STALE_WHILE_REVALIDATE, stale_if_error=CACHE_STALE_IF_ERROR,
+    store=get_disk_cache(),
+)
+_episode_info_cache = SWRCache(
+    "episode_info", maxsize=500, ttl=CACHE_TTL,
+    grace=CACHE_STALE_WHILE_REVALIDATE, stale_if_error=CACHE_STALE_IF_ERROR,
+)
+
+# Ultima risposta valida per URL con i suoi validatori, usata per le
+# richieste condizionali (If-None-Match / If-Modified-Since) dopo la scadenza
+# delle cache TTL
+_validators_cache = SWRCache(
+    "validators", maxsize=UPSTREAM_VALIDATORS_CACHE_SIZE, ttl=float("inf"),
+    store=get_disk_cache(),
+)
+
+
+
+class UpstreamData(dict):
+    """
+    Risposta upstream decodificata.
+
+    Il 304 (``not_modified``) e i validatori da confermare dopo il salvataggio
+    nel DB (``validators``, vedi :func:`commit_validators`) sono attributi e
+    non chiavi: non finiscono nel JSON restituito ai client.
+    """
+
+    def __init__(
+        self,
+        data: Dict,
+        not_modified: bool = False,
+        validators: Optional[Dict[str, Dict]] = None,
+    ):
+        super().__init__(data)
+        self.not_modified = not_modified
+        self.validators = dict(validators or {})
+
+
+def is_not_modified(data: Dict) -> bool:
+    """True se tutte le risposte upstream di ``data`` erano 304."""
+    return bool(getattr(data, "not_modified", False))
+
+
+def commit_validators(data: Dict):
+    """
+    Conferma i validatori delle risposte compatte che hanno prodotto ``data``.
+
+    Da chiamare dopo aver salvato gli episodi nel DB: da allora un 304 indica
+    episodi gia' salvati.
+    """
+    for key, validated in getattr(data, "validators", {}).items():
+        _validators_cache[key] = validated
+
+
+# Campi degli episodi usati da save_episodes / get_or_create_podcast: le
+# risposte scaricate solo per essere salvate nel DB vengono ridotte a questi
+PERSISTED_EPISODE_FIELDS = frozenset({
+    "id", "title", "date", "content_html", "description", "summary", "special",
+    "episode_raw_url", "author", "image", "share_url", "slug", "milliseconds",
+})
+PERSISTED_PARENT_FIELDS = frozenset({
+    "id", "title", "description", "image", "author", "share_url", "slug",
+})
 
 # Client HTTP async condiviso (creato al primo uso)
 _async_client: Optional[httpx.AsyncClient] = None
 
-MAX_RETRIES = 3
+# Coalescing delle chiamate upstream identiche in corso
+_upstream_flight = SingleFlight("upstream")
+_podcasts_flight = SingleFlight("podcasts")
+_episodes_flight = SingleFlight("all_episodes")
+_bff_flight = SingleFlight("bff")
+
+
+# Risposte upstream che indicano un token non valido
+AUTH_FAILURE_STATUSES = frozenset({401, 403})
+
+
+class UpstreamUnavailableError(HTTPException):
+    """Circuit breaker aperto: l'API upstream non viene contattata."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail="API Il Post temporaneamente non disponibile",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+
+
+class IncompleteResponseError(Exception):
+    """L'API upstream ha restituito solo una parte dei dati attesi."""
+
+
+def _module_available(name: str) -> bool:
+    try:
+        __import__(name)
+    except ImportError:
+        return False
+    return True
+
+
+def _accept_encoding() -> str:
+    """Codifiche di trasferimento compresse che il client sa decodificare."""
+    encodings = ["gzip", "deflate"]
+    if _module_available("brotli") or _module_available("brotlicffi"):
+        encodings.append("br")
+    if _module_available("zstandard"):
+        encodings.append("zstd")
+    return ", ".join(encodings)
+
+
+def build_async_client(
+    http2: bool = UPSTREAM_HTTP2, **kwargs
+) -> httpx.AsyncClient:
+    """
+    Crea il client HTTP async verso l'API upstream.
+
+    ``h2``, ``brotli`` e ``zstandard`` arrivano con le extra di httpx
+    (``httpx[http2,brotli,zstd]``); in un ambiente senza ``h2`` si ripiega
+    su HTTP/1.1 con keep-alive.
+    """
+    if http2 and not _module_available("h2"):
+        logger.info("Pacchetto h2 non installato, uso HTTP/1.1 verso l'API")
+        http2 = False
+
+    kwargs.setdefault("timeout", httpx.Timeout(
+        connect=UPSTREAM_CONNECT_TIMEOUT,
+        read=UPSTREAM_READ_TIMEOUT,
+        write=UPSTREAM_WRITE_TIMEOUT,
+        pool=UPSTREAM_POOL_TIMEOUT,
+    ))
+    kwargs.setdefault("limits", httpx.Limits(
+        max_connections=UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+        keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+    ))
+    kwargs.setdefault("headers", {"Accept-Encoding": _accept_encoding()})
+    return httpx.AsyncClient(http2=http2, **kwargs)
 
 
 async def get_async_client() -> httpx.AsyncClient:
     """Restituisce un client HTTP async condiviso."""
     global _async_client
     if _async_client is None or _async_client.is_closed:
-        _async_client = httpx.AsyncClient(timeout=30.0)
+        _async_client = build_async_client()
     return _async_client
 
 
+async def warm_up_client(url: str = UPSTREAM_BASE_URL) -> bool:
+    """
+    Apre in anticipo la connessione verso l'API upstream (DNS, TCP, TLS).
+
+    Qualsiasi risposta HTTP va bene: serve solo a lasciare una connessione
+    keep-alive nel pool. Gli errori vengono loggati ma non propagati.
+    """
+    try:
+        client = await get_async_client()
+        started = time.perf_counter()
+        response = await client.head(url)
+        logger.info(
+            f"Connessione upstream pre-riscaldata ({response.http_version}, "
+            f"{(time.perf_counter() - started) * 1000:.0f} ms)"
+        )
+        return True
+    except httpx.HTTPError as e:
+        logger.warning(f"Pre-riscaldamento connessione upstream fallito: {e}")
+        return False
+
+
 async def close_client():
     """Chiude il client HTTP async."""
     global _async_client
@@ -41,61 +228,261 @@ async def close_client():
 
 
 async def make_api_request(
-    url: str, headers: Optional[Dict] = None, retries: int = 0
+    url: str, headers: Optional[Dict] = None, compact: bool = False
 ) -> Dict:
-    """Effettua una richiesta API con rate limiting e retry limitato."""
-    await api_rate_limiter.wait()
-    logger.info(f"Chiamata API: {url}")
-    try:
-        client = await get_async_client()
-        response = await client.get(url, headers=headers)
+    """
+    Effettua una richiesta API con rate limiting e retry limitato.
+
+    Richieste concorrenti verso lo stesso URL vengono unite: parte una sola
+    chiamata upstream e tutti i chiamanti ricevono lo stesso risultato.
+
+    Con ``compact`` gli episodi in ``data`` vengono ridotti ai soli campi
+    salvati nel DB (``PERSISTED_EPISODE_FIELDS``) mentre vengono decodificati.
+    """
+    key = f"{url}#compact" if compact else url
+    return await _upstream_flight.do(
+        key, lambda: _request_upstream(url, headers, compact)
+    )
+
 
-        if response.status_code == 429:
-            if retries >= MAX_RETRIES:
+async def _request_upstream(
+    url: str, headers: Optional[Dict] = None, compact: bool = False
+) -> Dict:
+    """
+    Esegue la richiesta upstream, ritentando gli errori transitori.
+
+    Timeout, errori di rete e risposte 429/5xx vengono ritentati secondo
+    ``upstream_retry_policy`` (backoff esponenziale con jitter, Retry-After,
+    budget di retry condiviso dal processo). Una risposta 401/403 rinnova il
+    token e ripete la richiesta una sola volta.
+    """
+    policy = upstream_retry_policy
+    policy.budget.record_request()
+    attempt = 0
+    replayed = False
+    while True:
+        try:
+            response, validated = await _send_upstream(url, headers, compact)
+        except httpx.HTTPError as e:
+            reason = type(e).__name__
+            if policy.is_retryable_error(e) and policy.should_retry(attempt, reason):
+                await _retry_sleep(url, attempt, policy.backoff(attempt), reason)
+                attempt += 1
+                continue
+            logger.error(f"Errore nella richiesta API: {e} - URL: {url}")
+            raise HTTPException(status_code=500, detail="Errore nella richiesta API")
+
+        if response.status_code in AUTH_FAILURE_STATUSES:
+            metrics.incr("upstream_auth_failures_total", status=response.status_code)
+            if not replayed and headers and "Token" in headers:
+                # Token revocato o scaduto in anticipo: un solo rinnovo
+                # condiviso e la richiesta viene ripetuta con il nuovo token
+                logger.warning(
+                    f"Token rifiutato dall'API ({response.status_code}), "
+                    f"rinnovo e nuovo tentativo - URL: {url}"
+                )
+                replayed = True
+                token = await token_manager.refresh_rejected(headers["Token"])
+                headers = {**headers, "Token": token}
+                continue
+            logger.error(f"Autenticazione rifiutata dall'API ({response.status_code}) - URL: {url}")
+
+        if policy.is_retryable_status(response.status_code):
+            reason = f"status_{response.status_code}"
+            if policy.should_retry(attempt, reason):
+                retry_after = parse_retry_after(response.headers.get("retry-after"))
+                await _retry_sleep(
+                    url, attempt, policy.backoff(attempt, retry_after), reason
+                )
+                attempt += 1
+                continue
+            if response.status_code == 429:
                 raise HTTPException(
                     status_code=429,
                     detail="Rate limit raggiunto dopo troppi tentativi",
                 )
-            logger.warning(
-                f"Rate limit raggiunto, retry {retries + 1}/{MAX_RETRIES}"
-            )
-            await asyncio.sleep(10)
-            return await make_api_request(url, headers, retries + 1)
 
-        response.raise_for_status()
-        data = response.json()
+        return await _parse_upstream_response(url, response, validated, compact)
 
-        if "data" not in data:
-            logger.error(f"Risposta API non valida: {data}")
-            raise HTTPException(status_code=500, detail="Risposta API non valida")
 
-        return data
+async def _retry_sleep(url: str, attempt: int, delay: float, reason: str):
+    logger.warning(
+        f"Errore upstream ({reason}), retry {attempt + 1}/"
+        f"{upstream_retry_policy.max_retries} tra {delay:.2f}s - URL: {url}"
+    )
+    metrics.observe("upstream_retry_delay_seconds", delay)
+    await asyncio.sleep(delay)
+
+
+def _validators_key(url: str, compact: bool) -> str:
+    return f"{url}#compact" if compact else url
+
+
+async def _send_upstream(url: str, headers: Optional[Dict], compact: bool = False):
+    """Singolo tentativo di GET upstream, condizionale se abbiamo i validatori."""
+    logger.info(f"Chiamata API: {url}")
+
+    request_headers = dict(headers or {})
+    validated = _validators_cache.get(_validators_key(url, compact))
+    if validated:
+        if validated["etag"]:
+            request_headers["If-None-Match"] = validated["etag"]
+        if validated["last_modified"]:
+            request_headers["If-Modified-Since"] = validated["last_modified"]
+
+    client = await get_async_client()
+    response = await _guarded_get(client, url, request_headers)
+    return response, validated
+
+
+def _endpoint_family(url: str) -> str:
+    """Famiglia di endpoint upstream di ``url``, per il rate limiter."""
+    if url.startswith(BFF_HP_URL):
+        return "bff"
+    if url.startswith(f"{PODCAST_API_BASE_URL}/episodes?"):
+        return "batch"
+    if url.startswith(f"{PODCAST_API_BASE_URL}/?"):
+        return "catalog"
+    return "episodes"
+
+
+async def _guarded_get(
+    client: httpx.AsyncClient, url: str, headers: Dict
+) -> httpx.Response:
+    """GET upstream con rate limit e circuit breaker, con metriche di latenza."""
+    await api_rate_limiter.wait(_endpoint_family(url))
+    try:
+        upstream_breaker.before_call()
+    except CircuitOpenError as e:
+        logger.warning(f"{e} - URL: {url}")
+        raise UpstreamUnavailableError(e.retry_after)
+
+    started = time.perf_counter()
+    try:
+        response = await client.get(url, headers=headers)
+    except httpx.HTTPError:
+        upstream_breaker.record_failure()
+        raise
+    except BaseException:
+        upstream_breaker.release()
+        raise
+    elapsed = time.perf_counter() - started
+
+    metrics.observe("upstream_request_duration_seconds", elapsed)
+    metrics.incr("upstream_requests_total", status=response.status_code)
+    api_rate_limiter.record_response(response.status_code, elapsed)
+    if response.status_code >= 500:
+        upstream_breaker.record_failure()
+    else:
+        upstream_breaker.record_success(elapsed)
+    return response
+
+
+async def _parse_upstream_response(
+    url: str, response: httpx.Response, validated: Optional[Dict], compact: bool = False
+) -> Dict:
+    """Decodifica la risposta upstream e ne conserva i validatori."""
+    if response.status_code == 304 and validated:
+        logger.info(f"Risposta upstream non modificata (304): {url}")
+        metrics.incr("upstream_not_modified_total")
+        metrics.incr("upstream_bytes_saved_total", validated["size"])
+        return UpstreamData(validated["data"], not_modified=True)
+
+    try:
+        response.raise_for_status()
     except httpx.HTTPError as e:
         logger.error(f"Errore nella richiesta API: {e} - URL: {url}")
         raise HTTPException(status_code=500, detail="Errore nella richiesta API")
 
+    data = await _decode_response(response, compact)
+
+    if "data" not in data:
+        logger.error(f"Risposta API non valida: {data}")
+        raise HTTPException(status_code=500, detail="Risposta API non valida")
+
+    metrics.incr("upstream_bytes_downloaded_total", len(response.content))
+    data = UpstreamData(data)
+    etag = response.headers.get("etag")
+    last_modified = response.headers.get("last-modified")
+    if etag or last_modified:
+        validated = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "data": dict(data),
+            "size": len(response.content),
+        }
+        if compact:
+            # Risposta scaricata per essere salvata nel DB: i validatori
+            # valgono solo dopo il salvataggio (commit_validators)
+            data.validators[_validators_key(url, compact)] = validated
+        else:
+            _validators_cache[_validators_key(url, compact)] = validated
+
+    return data
+
+
+def _compact_episode(episode: Any) -> Any:
+    """Riduce un episodio ai campi salvati nel DB."""
+    if not isinstance(episode, dict):
+        return episode
+    compact = {k: v for k, v in episode.items() if k in PERSISTED_EPISODE_FIELDS}
+    parent = episode.get("parent")
+    if isinstance(parent, dict):
+        compact["parent"] = {
+            k: v for k, v in parent.items() if k in PERSISTED_PARENT_FIELDS
+        }
+    return compact
+
+
+async def _decode_response(response: httpx.Response, compact: bool) -> Any:
+    """
+    Decodifica il JSON della risposta.
+
+    Le risposte piccole vengono decodificate in un colpo solo; quelle grandi
+    (liste di centinaia di episodi) un episodio alla volta, cedendo il
+    controllo all'event loop tra un gruppo di episodi e l'altro.
+    """
+    if len(response.content) < UPSTREAM_JSON_INCREMENTAL_MIN_BYTES:
+        data = response.json()
+        if compact and isinstance(data, dict) and isinstance(data.get("data"), list):
+            data["data"] = [_compact_episode(ep) for ep in data["data"]]
+        return data
+    started = time.perf_counter()
+    data = await decode_object(
+        response.text, "data", transform=_compact_episode if compact else None
+    )
+    metrics.observe("upstream_json_decode_seconds", time.perf_counter() - started)
+    return data
+
 
 async def fetch_podcasts(page: int = 1, hits: int = 10000) -> Dict:
     """Recupera la lista dei podcast."""
     cache_key = f"podcasts_{page}_{hits}"
-    if cache_key in _podcasts_cache:
-        logger.info("Cache HIT - Lista podcast")
-        return _podcasts_cache[cache_key]
 
-    headers = get_auth_headers()
-    data = await make_api_request(
-        f"{PODCAST_API_BASE_URL}/?pg={page}&hits={hits}", headers=headers
+    async def _download() -> Dict:
+        headers = await get_auth_headers()
+        return await make_api_request(
+            f"{PODCAST_API_BASE_URL}/?pg={page}&hits={hits}", headers=headers
+        )
+
+    return await _podcasts_cache.get_or_fetch(
+        cache_key, lambda: _podcasts_flight.do(cache_key, _download)
     )
-    _podcasts_cache[cache_key] = data
-    return data
 
 
-async def fetch_episodes(podcast_id: int, page: int = 1, hits: int = 1) -> Dict:
-    """Recupera gli episodi di un podcast."""
-    headers = get_auth_headers()
+async def fetch_episodes(
+    podcast_id: int, page: int = 1, hits: int = 1, compact: bool = False
+) -> Dict:
+    """
+    Recupera gli episodi di un podcast.
+
+    Con ``compact`` gli episodi contengono solo i campi salvati nel DB.
+    """
+    headers = await get_auth_headers()
     return await make_api_request(
         f"{PODCAST_API_BASE_URL}/{podcast_id}/?pg={page}&hits={hits}",
         headers=headers,
+        compact=compact,
     )
 
 
@@ -104,71 +491,152 @@ async def fetch_episodes_batch(episode_ids: list[int]) -> Dict:
     if not episode_ids:
         return {"data": []}
 
-    headers = get_auth_headers()
+    headers = await get_auth_headers()
     ids_str = ",".join(map(str, episode_ids))
     return await make_api_request(
         f"{PODCAST_API_BASE_URL}/episodes?ids={ids_str}", headers=headers
     )
 
 
-async def fetch_all_episodes(podcast_id: int, batch_size: int = 500) -> Dict:
-    """Recupera tutti gli episodi di un podcast con paginazione."""
+async def _fetch_episodes_page(podcast_id: int, page: int, hits: int) -> Dict:
+    """
+    Recupera una pagina di episodi.
+
+    I tentativi sugli errori transitori sono quelli di ``upstream_retry_policy``
+    (con il suo budget): una pagina ancora in errore dopo la policy e' persa.
+    """
+    return await fetch_episodes(podcast_id, page, hits, compact=True)
+
+
+async def fetch_all_episodes(
+    podcast_id: int,
+    batch_size: int = EPISODES_PAGE_SIZE,
+    concurrency: int = EPISODES_PAGE_CONCURRENCY,
+) -> Dict:
+    """
+    Recupera tutti gli episodi di un podcast con paginazione concorrente.
+
+    La prima pagina fornisce anche il totale (``head.data.total``), quindi le
+    pagine restanti vengono scaricate in parallelo (al massimo ``concurrency``
+    alla volta) e riassemblate nell'ordine originale.
+    """
     cache_key = f"all_episodes_{podcast_id}"
-    if cache_key in _episodes_list_cache:
-        logger.info(f"Cache HIT - Lista episodi podcast {podcast_id}")
-        return _episodes_list_cache[cache_key]
+    try:
+        return await _episodes_list_cache.get_or_fetch(
+            cache_key,
+            lambda: _episodes_flight.do(
+                cache_key,
+                lambda: _download_all_episodes(podcast_id, batch_size, concurrency),
+            ),
+        )
+    except IncompleteResponseError:
+        return {"data": []}
+
 
+async def _download_all_episodes(
+    podcast_id: int, batch_size: int, concurrency: int
+) -> Dict:
+    """Scarica tutte le pagine di episodi."""
     logger.info(f"Inizio recupero episodi per il podcast {podcast_id}")
 
-    initial_data = await fetch_episodes(podcast_id, page=1, hits=1)
-    total_episodes = initial_data["head"]["data"]["total"]
+    first_page = await _fetch_episodes_page(podcast_id, 1, batch_size)
+    first_episodes = first_page.get("data") or []
+    head = first_page.get("head", {}).get("data", {})
+    total_episodes = head.get("total", len(first_episodes))
     logger.info(f"Totale episodi: {total_episodes}")
 
-    if total_episodes <= batch_size:
-        response = await fetch_episodes(podcast_id, page=1, hits=total_episodes)
-        if response and "data" in response:
-            result = {"data": response["data"]}
-            _episodes_list_cache[cache_key] = result
-            return result
-        return {"data": []}
+    total_pages = max(1, (total_episodes + batch_size - 1) // batch_size)
+    metrics.incr("episodes_sync_pages_total", total_pages, mode="full")
+    pages: Dict[int, list] = {1: first_episodes}
+    not_modified = is_not_modified(first_page)
+    validators = dict(getattr(first_page, "validators", {}))
 
-    all_episodes = []
-    total_pages = (total_episodes + batch_size - 1) // batch_size
+    if total_pages > 1 and len(first_episodes) >= batch_size:
+        semaphore = asyncio.Semaphore(max(1, concurrency))
 
-    for page in range(1, total_pages + 1):
-        try:
-            logger.info(f"Recupero pagina {page}/{total_pages}")
-            response = await fetch_episodes(podcast_id, page, batch_size)
+        async def _bounded_fetch(page: int) -> Dict:
+            async with semaphore:
+                logger.info(f"Recupero pagina {page}/{total_pages}")
+                return await _fetch_episodes_page(podcast_id, page, batch_size)
 
-            if not response or "data" not in response:
+        page_numbers = range(2, total_pages + 1)
+        results = await asyncio.gather(
+            *(_bounded_fetch(page) for page in page_numbers),
+            return_exceptions=True,
+        )
+        for page, result in zip(page_numbers, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Errore pagina {page}: {result}")
+                not_modified = False
                 continue
+            pages[page] = result.get("data") or []
+            not_modified = not_modified and is_not_modified(result)
+            validators.update(getattr(result, "validators", {}))
 
-            episodes = response["data"]
-            if not episodes:
-                break
-
-            all_episodes.extend(episodes)
-            logger.info(f"Recuperati {len(all_episodes)}/{total_episodes} episodi")
-        except Exception as e:
-            logger.error(f"Errore pagina {page}: {e}")
-            continue
+    all_episodes = []
+    for page in sorted(pages):
+        all_episodes.extend(pages[page])
+    logger.info(f"Recuperati {len(all_episodes)}/{total_episodes} episodi")
 
     if len(all_episodes) < total_episodes * 0.9:
         logger.error(
             f"Recuperati solo {len(all_episodes)}/{total_episodes} episodi"
         )
-        return {"data": []}
+        raise IncompleteResponseError(
+            f"Recuperati solo {len(all_episodes)}/{total_episodes} episodi"
+        )
 
-    result = {"data": all_episodes}
-    _episodes_list_cache[cache_key] = result
-    return result
+    # Con tutte le pagine 304 il chiamante puo' evitare di risalvare gli
+    # episodi nel DB
+    return UpstreamData(
+        {"data": all_episodes}, not_modified=not_modified, validators=validators
+    )
+
+
+async def fetch_new_episodes(
+    podcast_id: int,
+    is_known: Callable[[Dict], bool],
+    page_size: int = EPISODES_INCREMENTAL_PAGE_SIZE,
+) -> Dict:
+    """
+    Recupera solo gli episodi nuovi o modificati di un podcast.
+
+    Le pagine vengono lette dalla piu' recente e la lettura si ferma alla prima
+    pagina in cui tutti gli episodi sono gia' noti (``is_known``): byte scaricati
+    e scritture nel DB dipendono dai contenuti nuovi, non dalla dimensione del
+    catalogo.
+    """
+    changed = []
+    validators: Dict[str, Dict] = {}
+    page = 1
+    while True:
+        response = await _fetch_episodes_page(podcast_id, page, page_size)
+        validators.update(getattr(response, "validators", {}))
+        episodes = response.get("data") or []
+        page_changed = [ep for ep in episodes if not is_known(ep)]
+        changed.extend(page_changed)
+
+        total = response.get("head", {}).get("data", {}).get("total")
+        if (
+            not page_changed
+            or len(episodes) < page_size
+            or (total is not None and page * page_size >= total)
+        ):
+            break
+        page += 1
+
+    logger.info(
+        f"Sincronizzazione incrementale podcast {podcast_id}: "
+        f"{len(changed)} episodi nuovi o modificati in {page} pagine"
+    )
+    metrics.incr("episodes_sync_pages_total", page, mode="incremental")
+    return UpstreamData({"data": changed}, validators=validators)
 
 
 async def fetch_episode_details(podcast_id: int, episode_id: int) -> Optional[Dict]:
     """Recupera i dettagli di un singolo episodio dall'API."""
     url = f"{PODCAST_API_BASE_URL}/{podcast_id}/{episode_id}/"
-    headers = get_auth_headers()
-    await api_rate_limiter.wait()
+    headers = await get_auth_headers()
 
     try:
         data = await make_api_request(url, headers)
@@ -185,11 +653,20 @@ async def fetch_episode_details(podcast_id: int, episode_id: int) -> Optional[Di
 
 async def check_updates_from_bff() -> Dict:
     """Controlla aggiornamenti usando l'endpoint BFF Homepage."""
-    headers = get_auth_headers()
+    return await _bff_flight.do("bff_hp", _check_updates_from_bff)
+
+
+async def _check_updates_from_bff() -> Dict:
+    headers = await get_auth_headers()
 
     try:
         client = await get_async_client()
-        response = await client.get(BFF_HP_URL, headers=headers)
+        response = await _guarded_get(client, BFF_HP_URL, headers)
+        if response.status_code in AUTH_FAILURE_STATUSES:
+            metrics.incr("upstream_auth_failures_total", status=response.status_code)
+            token = await token_manager.refresh_rejected(headers["Token"])
+            headers = {**headers, "Token": token}
+            response = await _guarded_get(client, BFF_HP_URL, headers)
         response.raise_for_status()
         data = response.json()
 
@@ -244,3 +721,4 @@ def clear_all_caches():
     _podcasts_cache.clear()
     _episodes_list_cache.clear()
     _episode_info_cache.clear()
+    _validators_cache.clear()
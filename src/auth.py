@@ -1,22 +1,34 @@
+import asyncio
+import base64
+import json
+import time
+from typing import Awaitable, Callable, Optional
+
 import httpx
-from cachetools import TTLCache, cached
 from fastapi import HTTPException
 
-from config import EMAIL, PASSWORD, API_AUTH_LOGIN, TOKEN_CACHE_TTL, API_KEY
+from config import (
+    EMAIL,
+    PASSWORD,
+    API_AUTH_LOGIN,
+    TOKEN_CACHE_TTL,
+    TOKEN_REFRESH_MARGIN,
+    API_KEY,
+)
+from utils import metrics
 from utils.logging import get_logger
+from utils.rate_limiter import api_rate_limiter
+from utils.singleflight import SingleFlight
 
 logger = get_logger(__name__)
 
-token_cache = TTLCache(maxsize=1, ttl=TOKEN_CACHE_TTL)
-
 
-@cached(cache=token_cache)
-def _fetch_token() -> str:
-    """Ottiene un token di autenticazione dall'API (cached con TTL)."""
-    logger.info("Richiesta nuovo token di autenticazione")
+async def _fetch_token() -> str:
+    """Ottiene un nuovo token di autenticazione dall'API."""
+    await api_rate_limiter.wait("login")
     try:
-        with httpx.Client(timeout=30.0) as client:
-            response = client.post(
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            response = await client.post(
                 API_AUTH_LOGIN, data={"username": EMAIL, "password": PASSWORD}
             )
             response.raise_for_status()
@@ -27,19 +39,159 @@ def _fetch_token() -> str:
         raise HTTPException(status_code=500, detail="Errore di autenticazione")
 
 
-def get_token() -> str:
-    """Restituisce il token, riprovando una volta se fallisce."""
+def token_expiry(token: str) -> Optional[float]:
+    """Scadenza (epoch) letta dal claim ``exp`` se il token e' un JWT, altrimenti None."""
     try:
-        return _fetch_token()
-    except Exception:
-        token_cache.clear()
-        return _fetch_token()
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp is not None else None
+    except (IndexError, ValueError, TypeError, AttributeError):
+        return None
+
+
+class TokenManager:
+    """
+    Token dell'API Il Post gestito senza bloccare l'event loop.
+
+    Il login e' asincrono e le richieste concorrenti di un nuovo token vengono
+    unite in una sola. La scadenza viene letta dal token (JWT ``exp``) quando
+    possibile, altrimenti si usa ``default_ttl``. Con :meth:`start` un task in
+    background rinnova il token ``refresh_margin`` secondi prima della
+    scadenza (al massimo a meta' della sua durata, per i token brevi), cosi'
+    le richieste trovano sempre un token valido.
+    """
+
+    def __init__(
+        self,
+        login: Callable[[], Awaitable[str]],
+        default_ttl: float = TOKEN_CACHE_TTL,
+        refresh_margin: float = TOKEN_REFRESH_MARGIN,
+        timer: Callable[[], float] = time.time,
+    ):
+        self._login = login
+        self.default_ttl = default_ttl
+        self.refresh_margin = refresh_margin
+        # Margine per il token corrente: refresh_margin, o meta' della durata
+        self._margin = refresh_margin
+        self._timer = timer
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._flight = SingleFlight("auth_token")
+        self._background: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+    @property
+    def remaining(self) -> float:
+        """Secondi di validita' residua del token corrente."""
+        return self._expires_at - self._timer() if self._token else 0.0
+
+    async def get_token(self) -> str:
+        """Restituisce un token valido; attende il login solo se non ce n'e' uno."""
+        if self.remaining > 0:
+            if self.remaining <= self._margin:
+                self._schedule_refresh()
+            return self._token
+        return await self.refresh()
+
+    async def refresh(self) -> str:
+        """Ottiene un nuovo token (un solo login per richieste concorrenti)."""
+        return await self._flight.do("token", self._refresh)
+
+    async def refresh_rejected(self, rejected: Optional[str]) -> str:
+        """
+        Rinnova il token dopo che l'upstream ha rifiutato ``rejected``.
+
+        Se nel frattempo il token e' gia' stato sostituito si restituisce quello
+        nuovo: piu' richieste rifiutate insieme producono un solo login.
+        """
+        if self.remaining > 0 and self._token != rejected:
+            return self._token
+        return await self.refresh()
+
+    def invalidate(self):
+        """Scarta il token corrente: la prossima richiesta ne otterra' uno nuovo."""
+        self._token = None
+        self._expires_at = 0.0
+
+    async def _refresh(self) -> str:
+        logger.info("Richiesta nuovo token di autenticazione")
+        try:
+            try:
+                token = await self._login()
+            except Exception:
+                # Un secondo tentativo, come il vecchio get_token()
+                token = await self._login()
+        except Exception:
+            metrics.incr("auth_token_refreshes_total", result="error")
+            raise
+
+        now = self._timer()
+        expiry = token_expiry(token)
+        self._expires_at = expiry if expiry and expiry > now else now + self.default_ttl
+        self._margin = min(self.refresh_margin, (self._expires_at - now) / 2)
+        self._token = token
+        metrics.incr("auth_token_refreshes_total", result="ok")
+        metrics.set_gauge("auth_token_expiry_timestamp", self._expires_at)
+        return token
+
+    def _schedule_refresh(self):
+        if self._background is not None and not self._background.done():
+            return
+        self._background = asyncio.ensure_future(self.refresh())
+        self._background.add_done_callback(self._background_done)
+
+    @staticmethod
+    def _background_done(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            logger.warning(f"Rinnovo token in background fallito: {task.exception()}")
+
+    # --- Rinnovo proattivo ---
+
+    def start(self):
+        """Avvia il task che rinnova il token prima della scadenza."""
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.ensure_future(self._refresh_loop())
+
+    async def stop(self):
+        for task in (self._loop_task, self._background):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._loop_task = None
+
+    async def _refresh_loop(self):
+        retry_delay = 5.0
+        while True:
+            try:
+                if self.remaining <= self._margin:
+                    await self.refresh()
+                retry_delay = 5.0
+                await asyncio.sleep(max(1.0, self.remaining - self._margin))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Rinnovo token fallito, nuovo tentativo tra {retry_delay:.0f}s: {e}")
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(300.0, retry_delay * 2)
+
+
+# Istanza globale del gestore del token per le chiamate API
+token_manager = TokenManager(_fetch_token)
+
+
+async def get_token() -> str:
+    """Restituisce il token di autenticazione corrente."""
+    return await token_manager.get_token()
 
 
-def get_auth_headers() -> dict:
+async def get_auth_headers() -> dict:
     """Restituisce gli header di autenticazione per le chiamate API."""
-    return {"Apikey": API_KEY, "Token": get_token()}
+    return {"Apikey": API_KEY, "Token": await get_token()}
 
 
 def clear_token_cache():
-    token_cache.clear()
+    token_manager.invalidate()
@@ -16,13 +16,110 @@ if not EMAIL or not PASSWORD:
     logger.error("EMAIL and PASSWORD are required but not set properly")
     raise ValueError("EMAIL and PASSWORD are required but not set properly")
 
+UPSTREAM_BASE_URL = "https://api-prod.ilpost.it"
 PODCAST_API_BASE_URL = "https://api-prod.ilpost.it/podcast/v1/podcast"
 BFF_HP_URL = "https://api-prod.ilpost.it/podcast/v1/bff/hp"
 API_AUTH_LOGIN = "https://api-prod.ilpost.it/user/v1/auth/login"
 API_KEY = "testapikey"
 
 TOKEN_CACHE_TTL = 2 * 60 * 60  # 2 hours
+# Anticipo con cui il token viene rinnovato in background prima della scadenza
+TOKEN_REFRESH_MARGIN = int(os.getenv("TOKEN_REFRESH_MARGIN", "300"))
 CACHE_TTL = 15 * 60  # 15 minutes
+# Finestra in cui un valore scaduto viene servito mentre si aggiorna in background
+CACHE_STALE_WHILE_REVALIDATE = int(os.getenv("CACHE_STALE_WHILE_REVALIDATE", str(15 * 60)))
+# Finestra in cui un valore scaduto viene servito se l'API upstream e' in errore
+CACHE_STALE_IF_ERROR = int(os.getenv("CACHE_STALE_IF_ERROR", str(6 * 60 * 60)))
+
+# Paginazione episodi dall'API upstream
+EPISODES_PAGE_SIZE = int(os.getenv("EPISODES_PAGE_SIZE", "500"))
+EPISODES_PAGE_CONCURRENCY = int(os.getenv("EPISODES_PAGE_CONCURRENCY", "4"))
+
+# Sincronizzazione episodi: incrementale (solo le pagine piu' recenti fino al
+# primo episodio gia' salvato) con una sincronizzazione completa periodica
+EPISODES_INCREMENTAL_PAGE_SIZE = int(os.getenv("EPISODES_INCREMENTAL_PAGE_SIZE", "50"))
+EPISODES_FULL_SYNC_INTERVAL = int(os.getenv("EPISODES_FULL_SYNC_INTERVAL", str(24 * 60 * 60)))
+
+# Client HTTP verso l'API upstream
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "true").lower() == "true"
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "20"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "10"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "120"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "30"))
+UPSTREAM_WRITE_TIMEOUT = float(os.getenv("UPSTREAM_WRITE_TIMEOUT", "10"))
+UPSTREAM_POOL_TIMEOUT = float(os.getenv("UPSTREAM_POOL_TIMEOUT", "10"))
+UPSTREAM_WARMUP = os.getenv("UPSTREAM_WARMUP", "true").lower() == "true"
+
+# Retry verso l'API upstream (backoff esponenziale con jitter e budget)
+UPSTREAM_RETRY_MAX_RETRIES = int(os.getenv("UPSTREAM_RETRY_MAX_RETRIES", "3"))
+UPSTREAM_RETRY_BASE_DELAY = float(os.getenv("UPSTREAM_RETRY_BASE_DELAY", "0.5"))
+UPSTREAM_RETRY_MAX_DELAY = float(os.getenv("UPSTREAM_RETRY_MAX_DELAY", "30"))
+UPSTREAM_RETRY_BUDGET_RATIO = float(os.getenv("UPSTREAM_RETRY_BUDGET_RATIO", "0.2"))
+UPSTREAM_RETRY_BUDGET_MAX = float(os.getenv("UPSTREAM_RETRY_BUDGET_MAX", "10"))
+
+# Circuit breaker verso l'API upstream: se aperto si servono i dati del DB
+UPSTREAM_BREAKER_FAILURE_RATE = float(os.getenv("UPSTREAM_BREAKER_FAILURE_RATE", "0.5"))
+UPSTREAM_BREAKER_SLOW_CALL_SECONDS = float(os.getenv("UPSTREAM_BREAKER_SLOW_CALL_SECONDS", "10"))
+UPSTREAM_BREAKER_SLOW_CALL_RATE = float(os.getenv("UPSTREAM_BREAKER_SLOW_CALL_RATE", "0.8"))
+UPSTREAM_BREAKER_WINDOW = int(os.getenv("UPSTREAM_BREAKER_WINDOW", "20"))
+UPSTREAM_BREAKER_MIN_CALLS = int(os.getenv("UPSTREAM_BREAKER_MIN_CALLS", "10"))
+UPSTREAM_BREAKER_OPEN_SECONDS = float(os.getenv("UPSTREAM_BREAKER_OPEN_SECONDS", "30"))
+UPSTREAM_BREAKER_HALF_OPEN_CALLS = int(os.getenv("UPSTREAM_BREAKER_HALF_OPEN_CALLS", "3"))
+
+# Rate limiting verso l'API upstream (token bucket): richieste al secondo e
+# burst complessivi, piu' limiti per famiglia di endpoint nella forma
+# "famiglia=rate/burst,..." (catalog, episodes, batch, bff, login)
+UPSTREAM_RATE_LIMIT = float(os.getenv("UPSTREAM_RATE_LIMIT", "10"))
+UPSTREAM_RATE_BURST = float(os.getenv("UPSTREAM_RATE_BURST", "5"))
+UPSTREAM_RATE_FAMILY_LIMITS = os.getenv("UPSTREAM_RATE_FAMILY_LIMITS", "")
+# Rate globale adattivo (AIMD): sale finche' le risposte sono sane, si riduce
+# su 429 o latenza media oltre la soglia, sempre tra FLOOR e CEILING
+UPSTREAM_RATE_ADAPTIVE = os.getenv("UPSTREAM_RATE_ADAPTIVE", "true").lower() == "true"
+UPSTREAM_RATE_FLOOR = float(os.getenv("UPSTREAM_RATE_FLOOR", "1"))
+UPSTREAM_RATE_CEILING = float(os.getenv("UPSTREAM_RATE_CEILING", "20"))
+UPSTREAM_RATE_INCREASE = float(os.getenv("UPSTREAM_RATE_INCREASE", "0.5"))
+UPSTREAM_RATE_DECREASE = float(os.getenv("UPSTREAM_RATE_DECREASE", "0.5"))
+UPSTREAM_RATE_LATENCY_TARGET = float(os.getenv("UPSTREAM_RATE_LATENCY_TARGET", "2"))
+# Secondi di attesa dopo cui una chiamata in coda sale di una classe di priorita'
+UPSTREAM_PRIORITY_AGING = float(os.getenv("UPSTREAM_PRIORITY_AGING", "5"))
+# Dove vive lo stato dei bucket: "memory" (per processo) o "sqlite" (un file
+# condiviso da tutti i worker dello stesso nodo)
+UPSTREAM_RATE_BACKEND = os.getenv("UPSTREAM_RATE_BACKEND", "memory").lower()
+UPSTREAM_RATE_STORE_PATH = os.getenv(
+    "UPSTREAM_RATE_STORE_PATH", os.path.join(os.getenv("DB_DIR", "/data"), "rate_limit.db")
+)
+
+# Limiti sulle richieste ai feed RSS (richieste al minuto per token RSS e feed,
+# utente e IP; 0 disattiva) e massimo di feed generati in parallelo. Oltre i
+# limiti si serve l'ultimo feed generato, se c'e', altrimenti 429 / 503 con
+# Retry-After. Il burst per IP deve contenere l'aggiornamento di tutti i feed
+# dell'OPML da parte di un podcatcher
+INBOUND_TOKEN_RATE_PER_MINUTE = float(os.getenv("INBOUND_TOKEN_RATE_PER_MINUTE", "6"))
+INBOUND_USER_RATE_PER_MINUTE = float(os.getenv("INBOUND_USER_RATE_PER_MINUTE", "30"))
+INBOUND_IP_RATE_PER_MINUTE = float(os.getenv("INBOUND_IP_RATE_PER_MINUTE", "60"))
+INBOUND_BURST = float(os.getenv("INBOUND_BURST", "5"))
+INBOUND_IP_BURST = float(os.getenv("INBOUND_IP_BURST", "100"))
+FEED_MAX_INFLIGHT_RENDERS = int(os.getenv("FEED_MAX_INFLIGHT_RENDERS", "8"))
+FEED_SHED_RETRY_AFTER = int(os.getenv("FEED_SHED_RETRY_AFTER", "30"))
+FEED_RENDER_CACHE_SIZE = int(os.getenv("FEED_RENDER_CACHE_SIZE", "200"))
+
+# Cache persistente su disco delle risposte upstream (sopravvive ai riavvii)
+DISK_CACHE_ENABLED = os.getenv("DISK_CACHE_ENABLED", "false").lower() == "true"
+DISK_CACHE_PATH = os.path.join(os.getenv("DB_DIR", "/data"), "http_cache.db")
+DISK_CACHE_MAX_BYTES = int(os.getenv("DISK_CACHE_MAX_MB", "64")) * 1024 * 1024
+
+# Risposte upstream conservate con i validatori (ETag / Last-Modified)
+UPSTREAM_VALIDATORS_CACHE_SIZE = int(os.getenv("UPSTREAM_VALIDATORS_CACHE_SIZE", "500"))
+
+# Risposte JSON oltre questa dimensione vengono decodificate un episodio alla
+# volta, senza bloccare l'event loop per tutta la durata della decodifica
+UPSTREAM_JSON_INCREMENTAL_MIN_BYTES = int(os.getenv("UPSTREAM_JSON_INCREMENTAL_MIN_BYTES", "65536"))
+
+# Scrittore unico del DB: scritture raggruppate al massimo in una transazione,
+# e attesa di altre scritture dopo la prima (0 = solo quelle gia' in coda)
+DB_WRITE_BATCH_MAX = int(os.getenv("DB_WRITE_BATCH_MAX", "50"))
+DB_WRITE_BATCH_WINDOW_MS = float(os.getenv("DB_WRITE_BATCH_WINDOW_MS", "0"))
 
 BASE_URL = os.getenv("BASE_URL", "http://localhost:5000")
 
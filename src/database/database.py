@@ -5,15 +5,20 @@ from pathlib import Path
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
-from sqlalchemy import inspect
+from sqlalchemy import event, inspect, text
 
 from utils.logging import get_logger
 from .models import Base, Podcast, Episode
+from .search import build_search_index
+from .stats import build_podcast_stats
 
 logger = get_logger(__name__)
 
 DB_DIR = os.getenv("DB_DIR", "/data")
 DB_NAME = "podcasts.db"
+# Database esterno (PostgreSQL) condiviso tra piu' repliche; se vuoto si usa
+# il file SQLite in DB_DIR
+DATABASE_URL = os.getenv("DATABASE_URL", "")
 
 
 def check_database_directory():
@@ -39,27 +44,107 @@ def check_database_directory():
 
 
 def get_database_url():
-    """Costruisce l'URL del database."""
+    """
+    Costruisce l'URL del database.
+
+    DATABASE_URL nella forma postgres:// o postgresql:// (quella dei servizi
+    gestiti) usa il driver asyncpg; senza DATABASE_URL il DB e' SQLite in DB_DIR.
+    """
+    if DATABASE_URL:
+        for scheme in ("postgres://", "postgresql://"):
+            if DATABASE_URL.startswith(scheme):
+                return "postgresql+asyncpg://" + DATABASE_URL[len(scheme):]
+        return DATABASE_URL
     db_path = Path(DB_DIR) / DB_NAME
     return f"sqlite+aiosqlite:///{db_path}"
 
 
-check_database_directory()
+# Connessioni riutilizzate tra le richieste (0 = nessun pool, una connessione
+# nuova per sessione). Con PostgreSQL ogni replica apre fino a
+# DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW connessioni, piu' quella dello scrittore:
+# il totale delle repliche deve stare sotto max_connections del server
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10"))
+# Secondi dopo cui una connessione PostgreSQL viene riaperta (proxy e load
+# balancer chiudono quelle inattive); -1 per non riciclarle mai
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# PRAGMA applicate a ogni nuova connessione; un valore vuoto lascia il default
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    # Valori negativi di cache_size sono in KiB
+    "cache_size": os.getenv("SQLITE_CACHE_SIZE", "-20000"),
+    "mmap_size": os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+    "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"),
+}
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Configura una connessione SQLite appena aperta."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            if value:
+                cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
 
-engine = create_async_engine(
-    get_database_url(),
-    echo=False,
-    poolclass=NullPool,
-    connect_args={
-        "check_same_thread": False,
-        "timeout": 30,
-    },
-)
+
+def create_engine_for(url: str, pool_size: int = None, max_overflow: int = None):
+    """Engine asincrono con pool (e PRAGMA, per SQLite) configurati dall'ambiente."""
+    pool_options = (
+        {
+            "pool_size": DB_POOL_SIZE if pool_size is None else pool_size,
+            "max_overflow": DB_POOL_MAX_OVERFLOW if max_overflow is None else max_overflow,
+            # Riusa per prima la connessione rilasciata per ultima: quelle in
+            # eccesso restano inattive e vengono riciclate
+            "pool_use_lifo": True,
+        }
+        if DB_POOL_SIZE > 0 else {"poolclass": NullPool}
+    )
+    if not url.startswith("sqlite"):
+        # Le connessioni di rete possono cadere mentre sono nel pool:
+        # vengono verificate prima dell'uso e riaperte periodicamente
+        return create_async_engine(
+            url,
+            echo=False,
+            pool_pre_ping=True,
+            pool_recycle=DB_POOL_RECYCLE,
+            **pool_options,
+        )
+    async_engine = create_async_engine(
+        url,
+        echo=False,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": 30,
+        },
+        **pool_options,
+    )
+    event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    return async_engine
+
+
+if not DATABASE_URL:
+    check_database_directory()
+
+engine = create_engine_for(get_database_url())
 
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
+# Connessione dedicata alle scritture (vedi database.writer): chi attende una
+# scrittura tiene occupata una connessione del pool, lo scrittore non deve
+# contendersele
+writer_engine = create_engine_for(get_database_url(), pool_size=1, max_overflow=0)
+
+WriterSessionLocal = sessionmaker(
+    writer_engine, class_=AsyncSession, expire_on_commit=False
+)
+
 
 def _check_schema_current(sync_conn):
     """Verifica che lo schema del DB abbia tutte le colonne necessarie."""
@@ -81,10 +166,64 @@ def _check_schema_current(sync_conn):
     return True
 
 
+def _add_missing_columns(sync_conn) -> list:
+    """
+    Aggiunge le colonne nullable definite nei modelli ma assenti nel DB.
+
+    Le colonne nuove che non richiedono dati (es. timestamp opzionali) non
+    giustificano la ricreazione delle tabelle, che cancellerebbe anche utenti
+    e preferiti.
+    """
+    inspector = inspect(sync_conn)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.execute(
+                text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+            )
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def _add_missing_indexes(sync_conn) -> list:
+    """Crea gli indici definiti nei modelli ma assenti nel DB."""
+    inspector = inspect(sync_conn)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            # Gli indici dichiarati per un altro dialetto (ddl_if) non vengono creati
+            index.create(sync_conn)
+        created = {index["name"] for index in inspect(sync_conn).get_indexes(table.name)}
+        added.extend(sorted(created - existing))
+    return added
+
+
+# Chiave del lock advisory che serializza init_db tra le repliche (PostgreSQL)
+_INIT_LOCK_KEY = 0x1170057
+
+
 async def init_db():
     """Inizializza il database, ricreando le tabelle se lo schema e' cambiato."""
     try:
         async with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Le repliche che partono insieme non devono creare o
+                # modificare le tabelle in parallelo: il lock dura fino alla
+                # fine della transazione
+                await conn.execute(
+                    text("SELECT pg_advisory_xact_lock(:key)"), {"key": _INIT_LOCK_KEY}
+                )
             schema_ok = await conn.run_sync(_check_schema_current)
             if not schema_ok:
                 logger.info("Schema non aggiornato, ricreazione tabelle...")
@@ -92,6 +231,18 @@ async def init_db():
                 await conn.run_sync(Base.metadata.create_all)
                 logger.info("Tabelle ricreate con successo")
             else:
+                added = await conn.run_sync(_add_missing_columns)
+                if added:
+                    logger.info(f"Colonne aggiunte allo schema: {', '.join(added)}")
+                indexes = await conn.run_sync(_add_missing_indexes)
+                if indexes:
+                    logger.info(f"Indici creati: {', '.join(indexes)}")
+                indexed = await conn.run_sync(build_search_index)
+                if indexed:
+                    logger.info(f"Indice di ricerca creato: {indexed} episodi indicizzati")
+                summarized = await conn.run_sync(build_podcast_stats)
+                if summarized:
+                    logger.info(f"Riepiloghi podcast creati: {summarized} podcast")
                 logger.debug("Database esistente, schema aggiornato")
     except Exception as e:
         logger.error(f"Errore inizializzazione database: {e}")
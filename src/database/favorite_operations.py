@@ -2,6 +2,7 @@ from sqlalchemy import select, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .models import Favorite
+from .writer import db_writer
 
 
 async def get_user_favorites(db: AsyncSession, user_id: int) -> list[int]:
@@ -24,21 +25,25 @@ async def is_favorite(db: AsyncSession, user_id: int, podcast_id: int) -> bool:
 
 async def add_favorite(db: AsyncSession, user_id: int, podcast_id: int) -> bool:
     """Aggiunge un podcast ai preferiti. Restituisce True se aggiunto, False se gia' presente."""
-    existing = await is_favorite(db, user_id, podcast_id)
-    if existing:
-        return False
-    db.add(Favorite(user_id=user_id, podcast_id=podcast_id))
-    await db.commit()
-    return True
+    async def add(session: AsyncSession) -> bool:
+        existing = await is_favorite(session, user_id, podcast_id)
+        if existing:
+            return False
+        session.add(Favorite(user_id=user_id, podcast_id=podcast_id))
+        return True
+
+    return await db_writer.submit(add)
 
 
 async def remove_favorite(db: AsyncSession, user_id: int, podcast_id: int) -> bool:
     """Rimuove un podcast dai preferiti. Restituisce True se rimosso, False se non presente."""
-    result = await db.execute(
-        delete(Favorite).where(
-            Favorite.user_id == user_id,
-            Favorite.podcast_id == podcast_id,
+    async def remove(session: AsyncSession) -> bool:
+        result = await session.execute(
+            delete(Favorite).where(
+                Favorite.user_id == user_id,
+                Favorite.podcast_id == podcast_id,
+            )
         )
-    )
-    await db.commit()
-    return result.rowcount > 0
+        return result.rowcount > 0
+
+    return await db_writer.submit(remove)
@@ -1,10 +1,12 @@
 import secrets
 from datetime import datetime, timezone
 
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, UniqueConstraint
+from sqlalchemy import (
+    Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Index, UniqueConstraint,
+)
 from sqlalchemy.orm import DeclarativeBase, relationship
 
-__all__ = ["Base", "Podcast", "Episode", "User", "Favorite"]
+__all__ = ["Base", "Podcast", "Episode", "PodcastStats", "User", "Favorite"]
 
 
 class Base(DeclarativeBase):
@@ -22,7 +24,9 @@ class Podcast(Base):
     author = Column(String)
     share_url = Column(String)
     slug = Column(String)
-    last_checked = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    last_checked = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    # Ultima sincronizzazione completa degli episodi (le altre sono incrementali)
+    last_full_sync = Column(DateTime(timezone=True), nullable=True)
     episodes = relationship(
         "Episode", back_populates="podcast", cascade="all, delete-orphan"
     )
@@ -39,7 +43,7 @@ class User(Base):
     rss_token = Column(String, unique=True, nullable=False, index=True,
                        default=lambda: secrets.token_urlsafe(32))
     oauth_sub = Column(String, unique=True, nullable=True, index=True)  # OIDC subject
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
     @property
     def is_admin(self):
@@ -53,7 +57,7 @@ class Favorite(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     podcast_id = Column(Integer, nullable=False, index=True)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
 
 class Episode(Base):
@@ -74,4 +78,43 @@ class Episode(Base):
     episode_type = Column(String)  # "full", "bonus", "trailer"
     publication_date = Column(DateTime(timezone=True))
     duration = Column(Integer)  # in seconds
+    # Hash dei campi ricevuti dall'API all'ultimo salvataggio
+    content_hash = Column(String, nullable=True)
     podcast = relationship("Podcast", back_populates="episodes")
+
+
+class PodcastStats(Base):
+    """
+    Riepilogo degli episodi di un podcast per directory e ultimo episodio.
+
+    Ricalcolato nella stessa transazione che salva gli episodi
+    (operations.save_episodes): chi legge non deve ordinare ne' contare gli
+    episodi.
+    """
+    __tablename__ = "podcast_stats"
+
+    podcast_id = Column(Integer, ForeignKey("podcasts.id", ondelete="CASCADE"), primary_key=True)
+    episode_count = Column(Integer, nullable=False, default=0)
+    total_duration = Column(Integer, nullable=False, default=0)  # in seconds
+    last_episode_date = Column(DateTime(timezone=True))
+    last_episode_title = Column(String)
+    last_episode_duration = Column(Integer)  # in seconds
+    # Ultimo salvataggio che ha scritto episodi e quanti ne ha scritti
+    last_sync_at = Column(DateTime(timezone=True))
+    last_sync_episodes = Column(Integer)
+
+
+# Elenco episodi di un podcast dal piu' recente: filtro, ordinamento e
+# paginazione serviti dall'indice senza leggere tutta la tabella. Gli episodi
+# senza data vanno in fondo: in SQLite DESC mette gia' i NULL per ultimi (e
+# NULLS LAST non e' ammesso negli indici), in PostgreSQL va dichiarato
+Index(
+    "ix_episodes_podcast_id_publication_date",
+    Episode.podcast_id,
+    Episode.publication_date.desc(),
+).ddl_if(dialect="sqlite")
+Index(
+    "ix_episodes_podcast_id_publication_date",
+    Episode.podcast_id,
+    Episode.publication_date.desc().nulls_last(),
+).ddl_if(dialect="postgresql")
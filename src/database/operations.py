@@ -1,21 +1,54 @@
+import hashlib
+import json
 from datetime import datetime, timedelta, timezone
-from sqlalchemy import select
+from sqlalchemy import Row, bindparam, func, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, Sequence
 
+from config import EPISODES_FULL_SYNC_INTERVAL
+from utils import metrics
 from utils.logging import get_logger
-from .models import Podcast, Episode
+from .models import Podcast, Episode, PodcastStats
+from .search import index_episodes
+from .stats import podcast_stats_values
+from .writer import db_writer
 
 logger = get_logger(__name__)
 
 
+# INSERT ... ON CONFLICT DO UPDATE: stessa sintassi in SQLite e PostgreSQL,
+# ma costrutti SQLAlchemy distinti per dialetto
+_DIALECT_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+
+def _upsert_insert(session: AsyncSession, table):
+    """``insert()`` con ``on_conflict_do_update`` per il DB della sessione."""
+    return _DIALECT_INSERTS[session.get_bind().dialect.name](table)
+
+
+# Campi del podcast e chiave corrispondente nel payload dell'API
+_PODCAST_FIELDS = {
+    "title": "title",
+    "description": "description",
+    "image_url": "image",
+    "author": "author",
+    "share_url": "share_url",
+    "slug": "slug",
+}
+
+
 async def get_or_create_podcast(
     db: AsyncSession, ilpost_id: str, podcast_data: Dict[str, Any]
 ) -> Podcast:
     """
     Recupera un podcast dal database o lo crea se non esiste.
 
+    Inserimento e aggiornamento sono un unico upsert, cosi' piu' repliche
+    possono salvare lo stesso podcast contemporaneamente.
+
     Args:
         db: Sessione del database
         ilpost_id: ID del podcast su Il Post
@@ -24,54 +57,150 @@ async def get_or_create_podcast(
     Returns:
         Podcast: L'istanza del podcast
     """
-    stmt = select(Podcast).where(Podcast.ilpost_id == ilpost_id)
-    result = await db.execute(stmt)
-    podcast = result.scalar_one_or_none()
-
     # Dati del podcast dal payload (possono venire dal podcast diretto o dal parent di un episodio)
     parent = podcast_data.get("parent", podcast_data)
-
-    if not podcast:
-        podcast = Podcast(
-            ilpost_id=ilpost_id,
-            title=parent.get("title", ""),
-            description=parent.get("description", ""),
-            image_url=parent.get("image", ""),
-            author=parent.get("author", ""),
-            share_url=parent.get("share_url", ""),
-            slug=parent.get("slug", ""),
-        )
-        db.add(podcast)
-        await db.commit()
-        await db.refresh(podcast)
-    else:
-        podcast.title = parent.get("title", podcast.title)
-        podcast.description = parent.get("description", podcast.description)
-        podcast.image_url = parent.get("image", podcast.image_url)
-        podcast.author = parent.get("author", podcast.author)
-        podcast.share_url = parent.get("share_url", podcast.share_url)
-        podcast.slug = parent.get("slug", podcast.slug)
-        await db.commit()
-        await db.refresh(podcast)
-
-    return podcast
-
-
-async def update_podcast_check_time(db: AsyncSession, podcast: Podcast) -> None:
+    values = {column: parent.get(key, "") for column, key in _PODCAST_FIELDS.items()}
+    # Un podcast esistente aggiorna solo i campi presenti nel payload
+    changes = {column: parent[key] for column, key in _PODCAST_FIELDS.items() if key in parent}
+
+    async def upsert(session: AsyncSession) -> int:
+        table = Podcast.__table__
+        stmt = _upsert_insert(session, table).values(ilpost_id=ilpost_id, **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.ilpost_id],
+            # Senza campi da aggiornare la riga va comunque restituita
+            set_={column: stmt.excluded[column] for column in changes} or {"ilpost_id": ilpost_id},
+        ).returning(table.c.id)
+        return await session.scalar(stmt)
+
+    podcast_pk = await db_writer.submit(upsert)
+    return await db.get(Podcast, podcast_pk, populate_existing=True)
+
+
+async def update_podcast_check_time(
+    db: AsyncSession, podcast: Podcast, full_sync: bool = False
+) -> None:
     """
     Aggiorna il timestamp dell'ultimo controllo del podcast.
 
     Args:
         db: Sessione del database
         podcast: Istanza del podcast da aggiornare
+        full_sync: Se True, registra anche una sincronizzazione completa
     """
-    podcast.last_checked = datetime.now(timezone.utc)
-    await db.commit()
+    values = {"last_checked": datetime.now(timezone.utc)}
+    if full_sync:
+        values["last_full_sync"] = values["last_checked"]
+    stmt = update(Podcast).where(Podcast.id == podcast.id).values(**values)
+
+    async def touch(session: AsyncSession) -> None:
+        await session.execute(stmt)
+
+    await db_writer.submit(touch)
+    await db.refresh(podcast)
+
+
+async def reset_podcast_check_time(db: AsyncSession, podcast: Podcast) -> None:
+    """Azzera l'ultimo controllo del podcast: la prossima richiesta lo aggiorna dall'API."""
+    stmt = update(Podcast).where(Podcast.id == podcast.id).values(last_checked=None)
+
+    async def reset(session: AsyncSession) -> None:
+        await session.execute(stmt)
+
+    await db_writer.submit(reset)
     await db.refresh(podcast)
 
 
+def needs_full_sync(podcast: Podcast) -> bool:
+    """True se l'ultima sincronizzazione completa e' assente o troppo vecchia."""
+    last_full_sync = podcast.last_full_sync
+    if not last_full_sync:
+        return True
+    if last_full_sync.tzinfo is None:
+        last_full_sync = last_full_sync.replace(tzinfo=timezone.utc)
+    age = datetime.now(timezone.utc) - last_full_sync
+    return age > timedelta(seconds=EPISODES_FULL_SYNC_INTERVAL)
+
+
+async def _find_podcast(db: AsyncSession, podcast_id: int, *options) -> Optional[Podcast]:
+    """Cerca un podcast per ID interno e, se non c'e', per ID de Il Post."""
+    stmt = select(Podcast).where(Podcast.id == podcast_id).options(*options)
+    result = await db.execute(stmt)
+    podcast = result.scalar_one_or_none()
+
+    if not podcast:
+        stmt = select(Podcast).where(Podcast.ilpost_id == str(podcast_id)).options(*options)
+        result = await db.execute(stmt)
+        podcast = result.scalar_one_or_none()
+    return podcast
+
+
+def _podcast_needs_update(podcast: Podcast, podcast_id: int, needs_update: bool) -> bool:
+    """True se l'ultimo controllo e' piu' vecchio di 15 minuti o se e' richiesto un aggiornamento."""
+    last_checked = podcast.last_checked
+    if last_checked and last_checked.tzinfo is None:
+        last_checked = last_checked.replace(tzinfo=timezone.utc)
+    if needs_update or not last_checked or (datetime.now(timezone.utc) - last_checked) > timedelta(minutes=15):
+        return True
+
+    logger.info(
+        f"🎯 Cache HIT - Episodi del podcast {podcast_id} trovati nel database e aggiornati"
+    )
+    return False
+
+
+# Colonne lette dai percorsi di sola lettura: le righe (Row) hanno gli stessi
+# attributi di Episode ma senza identity map, strumentazione degli attributi
+# e colonne Text non richieste
+EPISODE_SYNC_COLUMNS = (
+    Episode.id, Episode.ilpost_id, Episode.title, Episode.summary,
+    Episode.audio_url, Episode.duration,
+)
+EPISODE_LIST_COLUMNS = (
+    Episode.id, Episode.ilpost_id, Episode.title, Episode.description,
+    Episode.audio_url, Episode.publication_date, Episode.duration,
+)
+EPISODE_FEED_COLUMNS = EPISODE_LIST_COLUMNS + (
+    Episode.summary, Episode.description_verified, Episode.author,
+    Episode.image_url, Episode.share_url, Episode.slug, Episode.episode_type,
+)
+LATEST_EPISODE_COLUMNS = (Episode.title, Episode.publication_date, Episode.duration)
+
+
+async def select_episode_rows(
+    db: AsyncSession,
+    podcast_pk: int,
+    columns: Sequence,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> List[Row]:
+    """
+    Episodi del podcast con ID interno ``podcast_pk``, dal piu' recente.
+
+    Legge solo ``columns`` (es. EPISODE_FEED_COLUMNS) e restituisce righe
+    compatte accessibili per attributo (``row.title``), non oggetti Episode.
+    A parita' di data l'ordine e' per id crescente; gli episodi senza data
+    sono in fondo. Filtro e ordinamento usano l'indice
+    (podcast_id, publication_date DESC), che ha gia' l'id (rowid) in coda.
+    """
+    stmt = (
+        select(*columns)
+        .where(Episode.podcast_id == podcast_pk)
+        .order_by(Episode.publication_date.desc().nulls_last(), Episode.id)
+        .offset(offset)
+    )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    result = await db.execute(stmt)
+    return list(result.all())
+
+
 async def get_podcast_episodes(
-    db: AsyncSession, podcast_id: int, needs_update: bool = False
+    db: AsyncSession,
+    podcast_id: int,
+    needs_update: bool = False,
+    columns: Optional[Sequence] = None,
+    limit: Optional[int] = None,
 ) -> Tuple[List[Episode], bool]:
     """
     Recupera gli episodi di un podcast dal database.
@@ -80,103 +209,345 @@ async def get_podcast_episodes(
         db: Sessione del database
         podcast_id: ID del podcast (può essere sia l'ID interno che l'ID de Il Post)
         needs_update: Se True, forza un aggiornamento
+        columns: Se indicate, restituisce righe con le sole colonne richieste,
+            dal piu' recente (vedi select_episode_rows), invece degli oggetti Episode
+        limit: Numero massimo di righe, solo con ``columns``
 
     Returns:
         Tuple[List[Episode], bool]: Lista degli episodi e flag che indica se serve un aggiornamento
     """
+    if columns is None:
+        podcast = await _find_podcast(db, podcast_id, selectinload(Podcast.episodes))
+        if not podcast:
+            return [], True
+        return podcast.episodes, _podcast_needs_update(podcast, podcast_id, needs_update)
+
+    podcast = await _find_podcast(db, podcast_id)
+    if not podcast:
+        return [], True
+    episodes = await select_episode_rows(db, podcast.id, columns, limit=limit)
+    return episodes, _podcast_needs_update(podcast, podcast_id, needs_update)
+
+
+async def count_podcast_episodes(db: AsyncSession, podcast_pk: int) -> int:
+    """Numero di episodi salvati per il podcast con ID interno ``podcast_pk``."""
+    stmt = select(func.count()).select_from(Episode).where(Episode.podcast_id == podcast_pk)
+    return await db.scalar(stmt)
+
+
+async def get_podcast_episodes_page(
+    db: AsyncSession,
+    podcast_id: int,
+    page: int = 1,
+    per_page: int = 20,
+    needs_update: bool = False,
+    columns: Sequence = EPISODE_LIST_COLUMNS,
+) -> Tuple[List[Row], int, bool]:
+    """
+    Recupera una pagina di episodi di un podcast, dal piu' recente.
+
+    Ordinamento, paginazione e conteggio sono eseguiti dal DB sull'indice
+    (podcast_id, publication_date DESC): il costo dipende da ``per_page``, non
+    dal numero di episodi del podcast.
+
+    Args:
+        db: Sessione del database
+        podcast_id: ID del podcast (può essere sia l'ID interno che l'ID de Il Post)
+        page: Numero di pagina, da 1
+        per_page: Episodi per pagina
+        needs_update: Se True, forza un aggiornamento
+        columns: Colonne lette per ogni episodio
+
+    Returns:
+        Tuple[List[Row], int, bool]: Episodi della pagina, totale degli
+        episodi del podcast e flag che indica se serve un aggiornamento
+    """
+    podcast = await _find_podcast(db, podcast_id)
+    if not podcast:
+        return [], 0, True
+
+    per_page = max(per_page, 0)
+    episodes = await select_episode_rows(
+        db, podcast.id, columns, limit=per_page, offset=max(page - 1, 0) * per_page
+    )
+    total = await count_podcast_episodes(db, podcast.id)
+    return episodes, total, _podcast_needs_update(podcast, podcast_id, needs_update)
+
+
+PODCAST_SUMMARY_COLUMNS = (
+    Podcast.ilpost_id, Podcast.title, Podcast.description, Podcast.image_url,
+    Podcast.author, Podcast.slug,
+    PodcastStats.episode_count, PodcastStats.total_duration,
+    PodcastStats.last_episode_date, PodcastStats.last_episode_title,
+    PodcastStats.last_episode_duration, PodcastStats.last_sync_at,
+)
 
-    # Prima proviamo a cercare per ID interno
+
+async def get_podcast_summaries(
+    db: AsyncSession, podcast_ids: Optional[Sequence[int]] = None
+) -> List[Row]:
+    """
+    Podcast salvati con il riepilogo degli episodi, dall'ultimo episodio piu' recente.
+
+    Una sola lettura di podcasts e podcast_stats, senza toccare gli episodi.
+    I podcast senza episodi salvati hanno i campi del riepilogo a None.
+
+    Args:
+        db: Sessione del database
+        podcast_ids: Se indicati, solo questi podcast (ID de Il Post)
+
+    Returns:
+        List[Row]: Righe con le colonne di PODCAST_SUMMARY_COLUMNS
+    """
     stmt = (
-        select(Podcast)
-        .where(Podcast.id == podcast_id)
-        .options(selectinload(Podcast.episodes))
+        select(*PODCAST_SUMMARY_COLUMNS)
+        .outerjoin(PodcastStats, PodcastStats.podcast_id == Podcast.id)
+        .order_by(PodcastStats.last_episode_date.desc().nulls_last(), Podcast.id)
     )
+    if podcast_ids is not None:
+        stmt = stmt.where(Podcast.ilpost_id.in_([str(i) for i in podcast_ids]))
     result = await db.execute(stmt)
-    podcast = result.scalar_one_or_none()
+    return list(result.all())
 
-    if not podcast:
-        # Se non lo troviamo, proviamo con l'ID de Il Post
-        stmt = (
-            select(Podcast)
-            .where(Podcast.ilpost_id == str(podcast_id))
-            .options(selectinload(Podcast.episodes))
+
+def _expire_episodes(db: AsyncSession, ilpost_ids: set) -> None:
+    """
+    Segna da ricaricare gli episodi gia' caricati in ``db``.
+
+    Le scritture avvengono nella sessione dello scrittore: gli oggetti della
+    sessione del chiamante vanno riletti alla prossima lettura.
+    """
+    for obj in list(db.identity_map.values()):
+        if isinstance(obj, Episode) and obj.ilpost_id in ilpost_ids:
+            db.expire(obj)
+
+
+async def save_episode_descriptions(db: AsyncSession, descriptions: Dict[str, str]) -> None:
+    """
+    Salva le descrizioni complete degli episodi e le segna come verificate.
+
+    Args:
+        db: Sessione del database
+        descriptions: Descrizione per ID de Il Post dell'episodio
+    """
+    if not descriptions:
+        return
+    stmt = (
+        update(Episode.__table__)
+        .where(Episode.__table__.c.ilpost_id == bindparam("b_ilpost_id"))
+        .values(description=bindparam("b_description"), description_verified=True)
+    )
+    params = [
+        {"b_ilpost_id": ilpost_id, "b_description": description}
+        for ilpost_id, description in descriptions.items()
+    ]
+
+    async def write(session: AsyncSession) -> None:
+        await session.execute(stmt, params)
+        await index_episodes(session, descriptions)
+
+    await db_writer.submit(write)
+    _expire_episodes(db, set(descriptions))
+
+
+async def update_episode(db: AsyncSession, ilpost_id: str, values: Dict[str, Any]) -> bool:
+    """
+    Aggiorna alcuni campi di un episodio salvato.
+
+    Nella stessa transazione vengono ricalcolati l'hash dei campi salvati,
+    l'indice di ricerca e il riepilogo del podcast.
+
+    Args:
+        db: Sessione del database
+        ilpost_id: ID de Il Post dell'episodio
+        values: Nuovi valori per colonna
+
+    Returns:
+        bool: True se l'episodio era salvato
+    """
+    table = Episode.__table__
+    stmt = update(table).where(table.c.ilpost_id == ilpost_id).values(**values)
+    stored = select(table.c.podcast_id, *(table.c[column] for column in EPISODE_FIELD_COLUMNS))
+
+    async def write(session: AsyncSession) -> bool:
+        result = await session.execute(stmt)
+        if not result.rowcount:
+            return False
+        row = (await session.execute(stored.where(table.c.ilpost_id == ilpost_id))).one()
+        # Hash dei campi come salvati ora: se i dati dell'API sono diversi la
+        # prossima sincronizzazione riscrive l'episodio
+        fields = {column: getattr(row, column) for column in EPISODE_FIELD_COLUMNS}
+        await session.execute(
+            update(table)
+            .where(table.c.ilpost_id == ilpost_id)
+            .values(content_hash=episode_content_hash(fields))
         )
-        result = await db.execute(stmt)
-        podcast = result.scalar_one_or_none()
+        await index_episodes(session, [ilpost_id])
+        await _save_podcast_stats(session, row.podcast_id)
+        return True
+
+    updated = await db_writer.submit(write)
+    _expire_episodes(db, {ilpost_id})
+    return updated
+
+
+def episode_fields(episode_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Converte un episodio dell'API nei campi del modello Episode."""
+    # Convertiamo la data di pubblicazione
+    try:
+        publication_date = datetime.fromisoformat(episode_data["date"])
+    except (ValueError, KeyError):
+        publication_date = datetime.now(timezone.utc)
+
+    # Otteniamo la descrizione dal content_html o dalla description
+    description = episode_data.get("content_html", "") or episode_data.get(
+        "description", ""
+    )
 
-    if not podcast:
-        return [], True
+    # Determina il tipo di episodio
+    episode_type = "full"
+    if episode_data.get("special"):
+        episode_type = "bonus"
+
+    return dict(
+        title=episode_data.get("title", ""),
+        description=description,
+        summary=episode_data.get("summary", ""),
+        description_verified=True,
+        audio_url=episode_data.get("episode_raw_url", ""),
+        author=episode_data.get("author", ""),
+        image_url=episode_data.get("image", ""),
+        share_url=episode_data.get("share_url", ""),
+        slug=episode_data.get("slug", ""),
+        episode_type=episode_type,
+        publication_date=publication_date,
+        duration=episode_data.get("milliseconds", 0) // 1000,
+    )
 
-    # Check if last update is older than 15 minutes or if an update is explicitly requested
-    last_checked = podcast.last_checked
-    if last_checked and last_checked.tzinfo is None:
-        last_checked = last_checked.replace(tzinfo=timezone.utc)
-    if needs_update or not last_checked or (datetime.now(timezone.utc) - last_checked) > timedelta(minutes=15):
-        return podcast.episodes, True
 
-    logger.info(
-        f"🎯 Cache HIT - Episodi del podcast {podcast_id} trovati nel database e aggiornati"
+# Colonne scritte da episode_fields, su cui si calcola content_hash
+EPISODE_FIELD_COLUMNS = (
+    "title", "description", "summary", "description_verified", "audio_url", "author",
+    "image_url", "share_url", "slug", "episode_type", "publication_date", "duration",
+)
+
+
+# Campi confrontati per decidere se un episodio gia' salvato e' cambiato
+_FINGERPRINT_FIELDS = ("title", "summary", "audio_url", "duration")
+
+
+def stored_episode_fingerprint(episode: Episode) -> Tuple:
+    """Impronta di un episodio salvato, confrontabile con api_episode_fingerprint."""
+    return tuple(getattr(episode, field) or None for field in _FINGERPRINT_FIELDS)
+
+
+def api_episode_fingerprint(episode_data: Dict[str, Any]) -> Tuple:
+    """Impronta di un episodio dell'API, calcolata sui campi che verrebbero salvati."""
+    fields = episode_fields(episode_data)
+    return tuple(fields[field] or None for field in _FINGERPRINT_FIELDS)
+
+
+def episode_content_hash(fields: Dict[str, Any]) -> str:
+    """Hash dei campi salvati di un episodio, per riconoscere quelli invariati."""
+    payload = json.dumps(fields, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+async def _save_podcast_stats(
+    session: AsyncSession, podcast_pk: int, written: Optional[int] = None
+) -> None:
+    """
+    Ricalcola il riepilogo del podcast (PodcastStats) dopo una scrittura di episodi.
+
+    Con ``written`` (episodi scritti da una sincronizzazione) registra anche la
+    sincronizzazione.
+    """
+    values = await podcast_stats_values(session, podcast_pk)
+    if written is not None:
+        values.update(last_sync_at=datetime.now(timezone.utc), last_sync_episodes=written)
+    table = PodcastStats.__table__
+    stmt = _upsert_insert(session, table).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.podcast_id],
+        set_={column: stmt.excluded[column] for column in values if column != "podcast_id"},
     )
-    return podcast.episodes, False
+    await session.execute(stmt)
+
+
+# Episodi per query IN (...) nella lettura degli hash salvati
+_HASH_LOOKUP_CHUNK = 500
 
 
 async def save_episodes(
     db: AsyncSession, podcast: Podcast, episodes_data: List[Dict[str, Any]]
-) -> None:
+) -> int:
     """
     Salva o aggiorna gli episodi di un podcast nel database.
 
+    Gli hash degli episodi gia' salvati vengono letti con poche query e solo
+    gli episodi nuovi o cambiati vengono scritti, con un unico
+    ``INSERT ... ON CONFLICT DO UPDATE`` a piu' righe. Nella stessa
+    transazione viene ricalcolato il riepilogo del podcast (PodcastStats).
+
     Args:
         db: Sessione del database
         podcast: Istanza del podcast
         episodes_data: Lista dei dati degli episodi dall'API
+
+    Returns:
+        int: Numero di episodi inseriti o aggiornati
     """
+    rows: Dict[str, Dict[str, Any]] = {}
     for episode_data in episodes_data:
-        ilpost_id = str(episode_data["id"])
-        stmt = select(Episode).where(Episode.ilpost_id == ilpost_id)
-        result = await db.execute(stmt)
-        episode = result.scalar_one_or_none()
-
-        # Convertiamo la data di pubblicazione
-        try:
-            publication_date = datetime.fromisoformat(episode_data["date"])
-        except (ValueError, KeyError):
-            publication_date = datetime.now(timezone.utc)
-
-        # Otteniamo la descrizione dal content_html o dalla description
-        description = episode_data.get("content_html", "") or episode_data.get(
-            "description", ""
+        fields = episode_fields(episode_data)
+        fields["content_hash"] = episode_content_hash(fields)
+        rows[str(episode_data["id"])] = fields
+
+    stored: Dict[str, Optional[str]] = {}
+    ids = list(rows)
+    for start in range(0, len(ids), _HASH_LOOKUP_CHUNK):
+        result = await db.execute(
+            select(Episode.ilpost_id, Episode.content_hash).where(
+                Episode.ilpost_id.in_(ids[start:start + _HASH_LOOKUP_CHUNK])
+            )
         )
-
-        # Determina il tipo di episodio
-        episode_type = "full"
-        if episode_data.get("special"):
-            episode_type = "bonus"
-
-        # Campi comuni
-        common_fields = dict(
-            title=episode_data.get("title", ""),
-            description=description,
-            summary=episode_data.get("summary", ""),
-            description_verified=True,
-            audio_url=episode_data.get("episode_raw_url", ""),
-            author=episode_data.get("author", ""),
-            image_url=episode_data.get("image", ""),
-            share_url=episode_data.get("share_url", ""),
-            slug=episode_data.get("slug", ""),
-            episode_type=episode_type,
-            publication_date=publication_date,
-            duration=episode_data.get("milliseconds", 0) // 1000,
+        stored.update(result.all())
+
+    changed = [
+        dict(ilpost_id=ilpost_id, podcast_id=podcast.id, **fields)
+        for ilpost_id, fields in rows.items()
+        if ilpost_id not in stored or stored[ilpost_id] != fields["content_hash"]
+    ]
+    metrics.incr("episodes_saved_total", len(changed), result="written")
+    metrics.incr("episodes_saved_total", len(rows) - len(changed), result="unchanged")
+    if not changed:
+        return 0
+
+    async def upsert(session: AsyncSession) -> None:
+        table = Episode.__table__
+        stmt = _upsert_insert(session, table)
+        # Come prima, un episodio esistente non cambia podcast
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.ilpost_id],
+            set_={
+                column: stmt.excluded[column]
+                for column in changed[0]
+                if column not in ("ilpost_id", "podcast_id")
+            },
         )
+        await session.execute(stmt, changed)
+        await index_episodes(session, [row["ilpost_id"] for row in changed])
+        await _save_podcast_stats(session, podcast.id, len(changed))
 
-        if not episode:
-            episode = Episode(ilpost_id=ilpost_id, podcast=podcast, **common_fields)
-            db.add(episode)
-        else:
-            for key, value in common_fields.items():
-                setattr(episode, key, value)
+    await db_writer.submit(upsert)
+    _expire_episodes(db, {row["ilpost_id"] for row in changed})
+    db.expire(podcast, ["episodes"])
 
-    await db.commit()
+    logger.info(
+        f"Episodi podcast {podcast.ilpost_id}: {len(changed)} scritti, "
+        f"{len(rows) - len(changed)} invariati"
+    )
+    return len(changed)
 
 
 async def get_podcast_by_ilpost_id(
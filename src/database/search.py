@@ -0,0 +1,288 @@
+import html
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import DDL, DateTime, and_, case, event, func, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from helpers import clean_html_text
+from .models import Base, Episode, Podcast
+
+# Indice full-text (FTS5) degli episodi: titolo, sommario e descrizione senza
+# HTML. Il rowid e' l'id dell'episodio; l'indice contiene una copia del testo
+# pulito, quindi va aggiornato da chi scrive gli episodi (index_episodes).
+# Esiste solo con SQLite: con altri database la ricerca usa ILIKE (_search_like)
+EPISODES_FTS_TABLE = "episodes_fts"
+
+_CREATE_FTS = DDL(
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {EPISODES_FTS_TABLE} USING fts5("
+    "podcast_id UNINDEXED, title, summary, description, "
+    "tokenize = 'unicode61 remove_diacritics 2')"
+)
+_DROP_FTS = DDL(f"DROP TABLE IF EXISTS {EPISODES_FTS_TABLE}")
+
+# L'indice segue il ciclo di vita delle tabelle (create_all / drop_all)
+event.listen(Base.metadata, "after_create", _CREATE_FTS.execute_if(dialect="sqlite"))
+event.listen(Base.metadata, "before_drop", _DROP_FTS.execute_if(dialect="sqlite"))
+
+# Peso delle colonne nel ranking bm25 (podcast_id, title, summary, description)
+_BM25_WEIGHTS = "0.0, 10.0, 4.0, 1.0"
+# Delimitatori dei termini trovati negli snippet, sostituiti da <mark> dopo
+# l'escape HTML del testo
+_MARK_START, _MARK_END = "\x02", "\x03"
+_SNIPPET_TOKENS = 16
+# Episodi per statement nella lettura dei testi da indicizzare
+_INDEX_CHUNK = 500
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def _index_row(episode) -> Dict[str, Any]:
+    return {
+        "id": episode.id,
+        "podcast_id": episode.podcast_id,
+        "title": clean_html_text(episode.title),
+        "summary": clean_html_text(episode.summary),
+        "description": clean_html_text(episode.description),
+    }
+
+
+_INDEX_COLUMNS = (
+    Episode.id, Episode.podcast_id, Episode.title, Episode.summary, Episode.description,
+)
+_DELETE_ROW = text(f"DELETE FROM {EPISODES_FTS_TABLE} WHERE rowid = :id")
+_INSERT_ROW = text(
+    f"INSERT INTO {EPISODES_FTS_TABLE} (rowid, podcast_id, title, summary, description) "
+    "VALUES (:id, :podcast_id, :title, :summary, :description)"
+)
+
+
+async def index_episodes(session: AsyncSession, ilpost_ids: Iterable[str]) -> int:
+    """
+    Aggiorna l'indice di ricerca per gli episodi indicati.
+
+    Va chiamata nella stessa transazione che scrive gli episodi (la sessione
+    dello scrittore), dopo la scrittura.
+
+    Returns:
+        int: Episodi indicizzati
+    """
+    if session.get_bind().dialect.name != "sqlite":
+        return 0
+    ids = list(ilpost_ids)
+    indexed = 0
+    for start in range(0, len(ids), _INDEX_CHUNK):
+        result = await session.execute(
+            select(*_INDEX_COLUMNS).where(
+                Episode.ilpost_id.in_(ids[start:start + _INDEX_CHUNK])
+            )
+        )
+        rows = [_index_row(episode) for episode in result]
+        if not rows:
+            continue
+        await session.execute(_DELETE_ROW, [{"id": row["id"]} for row in rows])
+        await session.execute(_INSERT_ROW, rows)
+        indexed += len(rows)
+    return indexed
+
+
+def build_search_index(sync_conn) -> int:
+    """
+    Crea l'indice se manca e lo popola con gli episodi gia' salvati.
+
+    Per i DB creati prima dell'indice: se esiste gia' non viene toccato.
+
+    Returns:
+        int: Episodi indicizzati (0 se l'indice esisteva gia')
+    """
+    if sync_conn.dialect.name != "sqlite":
+        return 0
+    if sync_conn.dialect.has_table(sync_conn, EPISODES_FTS_TABLE):
+        return 0
+    sync_conn.execute(_CREATE_FTS)
+    result = sync_conn.execute(select(*_INDEX_COLUMNS))
+    indexed = 0
+    while True:
+        rows = [_index_row(episode) for episode in result.fetchmany(_INDEX_CHUNK)]
+        if not rows:
+            break
+        sync_conn.execute(_INSERT_ROW, rows)
+        indexed += len(rows)
+    return indexed
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    Converte il testo cercato dall'utente in un'espressione MATCH di FTS5.
+
+    Ogni parola diventa un termine tra virgolette con ricerca per prefisso
+    ("amer" trova "america"), in AND con le altre: la sintassi di FTS5
+    (operatori, colonne, virgolette) non e' esposta all'utente.
+    """
+    terms = _TERM.findall(query or "")
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _highlight(snippet: str) -> str:
+    return (
+        html.escape(snippet or "")
+        .replace(_MARK_START, "<mark>")
+        .replace(_MARK_END, "</mark>")
+    )
+
+
+async def search_episodes(
+    db: AsyncSession,
+    query: str,
+    page: int = 1,
+    per_page: int = 20,
+    podcast_id: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Cerca negli episodi salvati, dal risultato piu' rilevante.
+
+    Args:
+        db: Sessione del database
+        query: Testo cercato
+        page: Numero di pagina, da 1
+        per_page: Risultati per pagina
+        podcast_id: Se indicato, solo gli episodi del podcast (ID de Il Post)
+
+    Returns:
+        Tuple[List[Dict], int]: Risultati della pagina (con uno snippet HTML
+        in cui i termini trovati sono in <mark>) e totale dei risultati
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return [], 0
+    if db.get_bind().dialect.name != "sqlite":
+        return await _search_like(db, _TERM.findall(query), page, per_page, podcast_id)
+
+    params = {"match": expression}
+    podcast_filter = ""
+    if podcast_id is not None:
+        podcast_filter = "AND p.ilpost_id = :podcast_id"
+        params["podcast_id"] = str(podcast_id)
+
+    joins = (
+        f"FROM {EPISODES_FTS_TABLE} f "
+        "JOIN episodes e ON e.id = f.rowid "
+        "JOIN podcasts p ON p.id = e.podcast_id "
+        f"WHERE {EPISODES_FTS_TABLE} MATCH :match {podcast_filter}"
+    )
+    total = await db.scalar(text(f"SELECT count(*) {joins}"), params)
+    if not total:
+        return [], 0
+
+    per_page = max(per_page, 0)
+    result = await db.execute(
+        text(
+            "SELECT e.ilpost_id, e.title, e.audio_url, e.publication_date, e.duration, "
+            "p.ilpost_id AS podcast_id, p.title AS podcast_title, "
+            f"snippet({EPISODES_FTS_TABLE}, -1, :mark_start, :mark_end, '...', "
+            f"{_SNIPPET_TOKENS}) AS snippet "
+            f"{joins} "
+            f"ORDER BY bm25({EPISODES_FTS_TABLE}, {_BM25_WEIGHTS}), "
+            "e.publication_date DESC, e.id "
+            "LIMIT :limit OFFSET :offset"
+        ).columns(publication_date=DateTime(timezone=True)),
+        {
+            **params,
+            "mark_start": _MARK_START,
+            "mark_end": _MARK_END,
+            "limit": per_page,
+            "offset": max(page - 1, 0) * per_page,
+        },
+    )
+    return [_result(row, row.snippet) for row in result], total
+
+
+def _result(row, snippet: str) -> Dict[str, Any]:
+    return {
+        "ilpost_id": row.ilpost_id,
+        "title": row.title,
+        "podcast_id": int(row.podcast_id),
+        "podcast_title": row.podcast_title,
+        "audio_url": row.audio_url,
+        "date": row.publication_date.isoformat() if row.publication_date else None,
+        "duration": row.duration * 1000 if row.duration else None,
+        "snippet": _highlight(snippet),
+    }
+
+
+def _like_pattern(term: str) -> str:
+    # Dei caratteri speciali di LIKE, in un termine (\w+) puo' esserci solo "_"
+    return "%" + term.replace("_", "\\_") + "%"
+
+
+def _like_snippet(row, terms: List[str]) -> str:
+    """Snippet attorno al primo termine trovato, con i termini tra i delimitatori."""
+    pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+    for field in (row.description, row.summary, row.title):
+        words = clean_html_text(field).split()
+        hits = [i for i, word in enumerate(words) if pattern.search(word)]
+        if not hits:
+            continue
+        start = max(hits[0] - _SNIPPET_TOKENS // 2, 0)
+        window = words[start:start + _SNIPPET_TOKENS]
+        snippet = " ".join(
+            pattern.sub(lambda m: f"{_MARK_START}{m.group(0)}{_MARK_END}", word)
+            for word in window
+        )
+        prefix = "..." if start > 0 else ""
+        suffix = "..." if start + _SNIPPET_TOKENS < len(words) else ""
+        return f"{prefix}{snippet}{suffix}"
+    return ""
+
+
+async def _search_like(
+    db: AsyncSession,
+    terms: List[str],
+    page: int,
+    per_page: int,
+    podcast_id: Optional[int],
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Ricerca senza indice full-text, per i database diversi da SQLite.
+
+    Ogni termine deve comparire (ILIKE, anche dentro una parola) nel titolo,
+    nel sommario o nella descrizione (HTML compreso); gli episodi con tutti i termini nel
+    titolo vengono prima, poi dal piu' recente. Legge tutta la tabella: e'
+    pensata per cataloghi come quello de Il Post, non per milioni di righe.
+    """
+    patterns = [_like_pattern(term) for term in terms]
+    conditions = [
+        or_(
+            Episode.title.ilike(pattern, escape="\\"),
+            Episode.summary.ilike(pattern, escape="\\"),
+            Episode.description.ilike(pattern, escape="\\"),
+        )
+        for pattern in patterns
+    ]
+    if podcast_id is not None:
+        conditions.append(Podcast.ilpost_id == str(podcast_id))
+    joined = select().select_from(Episode).join(Podcast, Podcast.id == Episode.podcast_id)
+
+    total = await db.scalar(joined.add_columns(func.count()).where(*conditions))
+    if not total:
+        return [], 0
+
+    per_page = max(per_page, 0)
+    in_title = and_(*(Episode.title.ilike(pattern, escape="\\") for pattern in patterns))
+    result = await db.execute(
+        joined.add_columns(
+            Episode.ilpost_id, Episode.title, Episode.summary, Episode.description,
+            Episode.audio_url, Episode.publication_date, Episode.duration,
+            Podcast.ilpost_id.label("podcast_id"), Podcast.title.label("podcast_title"),
+        )
+        .where(*conditions)
+        .order_by(
+            case((in_title, 0), else_=1),
+            Episode.publication_date.desc().nulls_last(),
+            Episode.id,
+        )
+        .limit(per_page)
+        .offset(max(page - 1, 0) * per_page)
+    )
+    return [_result(row, _like_snippet(row, terms)) for row in result], total
@@ -0,0 +1,75 @@
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Episode, PodcastStats
+
+# Riepilogo per podcast (PodcastStats): calcolato dagli episodi salvati, va
+# aggiornato da chi li scrive (operations.save_episodes)
+
+
+def _summary_stmt(podcast_pk: int):
+    return select(
+        func.count(Episode.id), func.coalesce(func.sum(Episode.duration), 0)
+    ).where(Episode.podcast_id == podcast_pk)
+
+
+def _latest_stmt(podcast_pk: int):
+    # Stesso ordinamento (e indice) dell'elenco episodi
+    return (
+        select(Episode.title, Episode.publication_date, Episode.duration)
+        .where(Episode.podcast_id == podcast_pk)
+        .order_by(Episode.publication_date.desc().nulls_last(), Episode.id)
+        .limit(1)
+    )
+
+
+def _stats_values(podcast_pk: int, summary, latest) -> Dict[str, Any]:
+    episode_count, total_duration = summary
+    return {
+        "podcast_id": podcast_pk,
+        "episode_count": episode_count,
+        "total_duration": total_duration,
+        "last_episode_date": latest.publication_date if latest else None,
+        "last_episode_title": latest.title if latest else None,
+        "last_episode_duration": latest.duration if latest else None,
+    }
+
+
+async def podcast_stats_values(session: AsyncSession, podcast_pk: int) -> Dict[str, Any]:
+    """
+    Calcola il riepilogo del podcast con ID interno ``podcast_pk``.
+
+    Due letture sugli episodi del podcast, servite dall'indice
+    (podcast_id, publication_date): conteggio e durata totale, ultimo episodio.
+    """
+    summary = (await session.execute(_summary_stmt(podcast_pk))).one()
+    latest: Optional[Any] = (await session.execute(_latest_stmt(podcast_pk))).first()
+    return _stats_values(podcast_pk, summary, latest)
+
+
+def build_podcast_stats(sync_conn) -> int:
+    """
+    Crea la tabella dei riepiloghi se manca e la popola dagli episodi salvati.
+
+    Per i DB creati prima della tabella: se esiste gia' non viene toccata.
+
+    Returns:
+        int: Podcast riepilogati (0 se la tabella esisteva gia')
+    """
+    if sync_conn.dialect.has_table(sync_conn, PodcastStats.__tablename__):
+        return 0
+    PodcastStats.__table__.create(sync_conn)
+    podcast_pks = sync_conn.execute(select(Episode.podcast_id).distinct()).scalars().all()
+    rows = [
+        _stats_values(
+            podcast_pk,
+            sync_conn.execute(_summary_stmt(podcast_pk)).one(),
+            sync_conn.execute(_latest_stmt(podcast_pk)).first(),
+        )
+        for podcast_pk in podcast_pks
+    ]
+    if rows:
+        sync_conn.execute(insert(PodcastStats), rows)
+    return len(rows)
@@ -0,0 +1,162 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import DB_WRITE_BATCH_MAX, DB_WRITE_BATCH_WINDOW_MS
+from utils import metrics
+from utils.logging import get_logger
+from . import database
+
+logger = get_logger(__name__)
+
+WriteIntent = Callable[[AsyncSession], Awaitable[Any]]
+
+
+class DatabaseWriter:
+    """
+    Unico task che scrive sul DB, per non contendersi il lock di SQLite.
+
+    Chi deve scrivere passa a :meth:`submit` una funzione che riceve la
+    sessione dello scrittore e ne attende il risultato. Lo scrittore prende
+    dalla coda le scritture in attesa (fino a ``max_batch``) e le esegue in
+    un'unica transazione: una sola COMMIT per gruppo. Se una scrittura del
+    gruppo fallisce la transazione viene annullata e le scritture vengono
+    ripetute una per transazione, cosi' l'errore arriva solo a chi l'ha causato.
+
+    Le funzioni devono restituire valori semplici (es. ID), non oggetti ORM
+    della sessione dello scrittore, e non devono chiamare :meth:`submit`.
+    Chi chiama :meth:`submit` non deve avere scritture non confermate nella
+    propria sessione: lo scrittore resterebbe in attesa del lock.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+        max_batch: int = DB_WRITE_BATCH_MAX,
+        batch_window: float = DB_WRITE_BATCH_WINDOW_MS / 1000,
+    ):
+        # Senza session_factory si usa WriterSessionLocal al momento della scrittura
+        self._session_factory = session_factory
+        self.max_batch = max(1, max_batch)
+        self.batch_window = batch_window
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def submit(self, intent: WriteIntent) -> Any:
+        """Accoda una scrittura e ne restituisce il risultato dopo la COMMIT."""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.ensure_future(self._run(self._queue))
+        future = loop.create_future()
+        self._queue.put_nowait((intent, future))
+        metrics.set_gauge("db_write_queue_depth", self._queue.qsize())
+        # Se chi attende viene cancellato la scrittura avviene comunque
+        return await future
+
+    async def stop(self):
+        """Esegue le scritture gia' in coda e ferma lo scrittore."""
+        task = self._task
+        self._task = None
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            return
+        self._queue.put_nowait(None)
+        await task
+
+    async def _run(self, queue: asyncio.Queue):
+        stopping = False
+        try:
+            while not stopping:
+                item = await queue.get()
+                if item is None:
+                    return
+                batch = [item]
+                stopping = await self._fill(queue, batch)
+                metrics.set_gauge("db_write_queue_depth", queue.qsize())
+                await self._write(batch)
+        finally:
+            # Scritture rimaste in coda se lo scrittore viene cancellato
+            while not queue.empty():
+                item = queue.get_nowait()
+                if item is not None and not item[1].done():
+                    item[1].cancel()
+
+    async def _fill(self, queue: asyncio.Queue, batch: list) -> bool:
+        """Aggiunge al gruppo le scritture in coda; True se e' arrivato lo stop."""
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            if queue.empty():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = queue.get_nowait()
+            if item is None:
+                return True
+            batch.append(item)
+        return False
+
+    async def _write(self, batch: List[Tuple[WriteIntent, asyncio.Future]]):
+        try:
+            await self._write_batch(batch)
+        finally:
+            # Interrotto (es. CancelledError) prima di risolverle: chi attende
+            # non deve restare appeso
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
+
+    async def _write_batch(self, batch: List[Tuple[WriteIntent, asyncio.Future]]):
+        try:
+            results = await self._transaction([intent for intent, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                self._resolve(batch[0][1], error=e)
+                return
+            logger.warning(
+                f"Scrittura di gruppo fallita ({len(batch)} scritture), "
+                f"ripeto singolarmente: {e}"
+            )
+            for intent, future in batch:
+                try:
+                    (result,) = await self._transaction([intent])
+                except Exception as single_error:
+                    self._resolve(future, error=single_error)
+                else:
+                    self._resolve(future, result)
+        else:
+            for (_, future), result in zip(batch, results):
+                self._resolve(future, result)
+
+    async def _transaction(self, intents: List[WriteIntent]) -> list:
+        factory = self._session_factory or database.WriterSessionLocal
+        started = time.perf_counter()
+        async with factory() as session:
+            try:
+                results = [await intent(session) for intent in intents]
+                await session.commit()
+            except BaseException:
+                await session.rollback()
+                raise
+        metrics.incr("db_write_transactions_total")
+        metrics.observe("db_write_transaction_seconds", time.perf_counter() - started)
+        return results
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any = None, error: BaseException = None):
+        metrics.incr("db_writes_total", result="error" if error else "ok")
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+db_writer = DatabaseWriter()
@@ -6,15 +6,19 @@ from fastapi.staticfiles import StaticFiles
 from fastapi_mcp import FastApiMCP
 from starlette.middleware.sessions import SessionMiddleware
 
-from api_client import close_client
+from api_client import close_client, warm_up_client
+from auth import token_manager
 from auth_dependencies import AuthRedirect
-from config import SECRET_KEY, logger
+from config import SECRET_KEY, UPSTREAM_WARMUP, logger
 from database import init_db
+from database.database import engine, writer_engine
+from database.writer import db_writer
 from routes.api import router as api_router
 from routes.auth import router as auth_router
 from routes.admin import router as admin_router
 from routes.profile import router as profile_router
 from routes.web import router as web_router
+from utils.swr_cache import restore_persistent_caches
 
 
 @asynccontextmanager
@@ -24,13 +28,24 @@ async def lifespan(app: FastAPI):
     try:
         await init_db()
         logger.info("Database inizializzato con successo")
+        restored = await restore_persistent_caches()
+        if restored:
+            logger.info(f"Ripristinate {restored} voci di cache da disco")
+        if UPSTREAM_WARMUP:
+            await warm_up_client()
+        # Login e rinnovi del token in background, prima della scadenza
+        token_manager.start()
         yield
     except Exception as e:
         logger.error(f"Errore durante l'inizializzazione: {e}")
         raise
     finally:
         logger.info("Chiusura dell'applicazione...")
+        await token_manager.stop()
         await close_client()
+        await db_writer.stop()
+        await writer_engine.dispose()
+        await engine.dispose()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -1,5 +1,9 @@
 import hashlib
+import math
 from datetime import datetime, timezone
+from typing import Optional
+
+from cachetools import LRUCache
 
 from fastapi import APIRouter, HTTPException, Request, Depends, Path
 from fastapi.responses import JSONResponse, Response
@@ -11,27 +15,51 @@ from api_client import (
     fetch_episodes,
     fetch_episodes_batch,
     fetch_all_episodes,
+    fetch_new_episodes,
     fetch_episode_details,
     check_updates_from_bff,
     clear_all_caches,
     clear_episodes_cache,
+    commit_validators,
+    is_not_modified,
 )
 from auth import clear_token_cache
 from auth_dependencies import require_auth
+from config import FEED_RENDER_CACHE_SIZE, FEED_SHED_RETRY_AFTER
 from database import get_db, Podcast, Episode
 from database.operations import (
+    EPISODE_FEED_COLUMNS,
+    EPISODE_LIST_COLUMNS,
+    EPISODE_SYNC_COLUMNS,
+    api_episode_fingerprint,
     get_or_create_podcast,
     get_podcast_by_ilpost_id,
     update_podcast_check_time,
     get_podcast_episodes,
+    get_podcast_episodes_page,
+    save_episode_descriptions,
+    needs_full_sync,
+    reset_podcast_check_time,
     save_episodes,
+    stored_episode_fingerprint,
+    update_episode,
 )
+from database.search import search_episodes
 from database.user_operations import get_user_by_rss_token
 from database.favorite_operations import get_user_favorites, add_favorite, remove_favorite
 from feeds import rss_generator
 from helpers import clean_html_text, format_duration
+from utils import metrics
+from utils.circuit_breaker import upstream_breaker
 from utils.logging import get_logger
-from utils.rate_limiter import api_rate_limiter
+from utils.metrics import render_prometheus
+from utils.rate_limiter import (
+    BACKGROUND,
+    FEED_POLL,
+    feed_render_limiter,
+    inbound_rate_limiter,
+    upstream_priority,
+)
 
 logger = get_logger(__name__)
 
@@ -196,7 +224,7 @@ async def readiness(db: AsyncSession = Depends(get_db)):
     # Check auth token (verifica che l'API esterna sia raggiungibile)
     try:
         from auth import get_token
-        token = get_token()
+        token = await get_token()
         checks["auth"] = "ok" if token else "error: no token"
         if not token:
             ready = False
@@ -204,6 +232,10 @@ async def readiness(db: AsyncSession = Depends(get_db)):
         checks["auth"] = f"error: {e}"
         ready = False
 
+    # Stato del circuit breaker: con il circuito aperto l'app resta pronta
+    # perche' i feed vengono serviti dai dati del DB
+    checks["upstream_circuit"] = upstream_breaker.snapshot()
+
     status_code = 200 if ready else 503
     return JSONResponse(
         content={"status": "ready" if ready else "not_ready", "checks": checks},
@@ -216,6 +248,13 @@ async def healthcheck():
     return {"status": "ok"}
 
 
+@router.get("/metrics", description="Metriche dell'applicazione in formato Prometheus.")
+async def get_metrics():
+    return Response(
+        content=render_prometheus(), media_type="text/plain; version=0.0.4"
+    )
+
+
 @router.get("/clear-cache")
 async def clear_cache(_user=Depends(require_auth)):
     """Pulisce tutte le cache."""
@@ -226,48 +265,101 @@ async def clear_cache(_user=Depends(require_auth)):
 
 @router.get("/api/podcast/{podcast_id}/episodes")
 async def get_podcast_episodes_json(
+    response: Response,
     podcast_id: int = Path(...),
     per_page: int = 100,
     _user=Depends(require_auth),
     db: AsyncSession = Depends(get_db),
 ):
     try:
-        episodes, needs_update = await get_podcast_episodes(db, podcast_id)
+        latest, _, needs_update = await get_podcast_episodes_page(db, podcast_id, per_page=per_page)
 
         if needs_update:
-            await api_rate_limiter.wait()
-            response = await fetch_episodes(podcast_id, hits=10000)
-            podcast_data = response.get("data", [])
-
-            if not podcast_data:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Nessun episodio trovato per questo podcast",
+            # La sincronizzazione confronta tutti gli episodi salvati con l'API
+            episodes, _ = await get_podcast_episodes(db, podcast_id, columns=EPISODE_SYNC_COLUMNS)
+            try:
+                synced = await _sync_incremental(db, podcast_id, episodes)
+                if synced is None:
+                    api_response = await fetch_episodes(
+                        podcast_id, hits=10000, compact=True
+                    )
+            except HTTPException as e:
+                if not _can_serve_stale(e, episodes):
+                    raise
+                logger.warning(
+                    f"API non disponibile per il podcast {podcast_id}, "
+                    f"servo gli episodi dal DB: {e.detail}"
                 )
+                response.headers.update(_stale_headers(True))
+            else:
+                if synced is None:
+                    podcast_data = api_response.get("data", [])
+
+                    if not podcast_data:
+                        raise HTTPException(
+                            status_code=404,
+                            detail="Nessun episodio trovato per questo podcast",
+                        )
+
+                    podcast = None
+                    if is_not_modified(api_response) and episodes:
+                        # L'API ha risposto 304: gli episodi nel DB sono gia' aggiornati
+                        podcast = await get_podcast_by_ilpost_id(db, str(podcast_id))
+
+                    if podcast:
+                        await update_podcast_check_time(db, podcast, full_sync=True)
+                    else:
+                        podcast = await get_or_create_podcast(
+                            db, str(podcast_id), podcast_data[0]
+                        )
+                        if not podcast:
+                            raise HTTPException(
+                                status_code=404,
+                                detail="Impossibile creare o recuperare il podcast",
+                            )
+
+                        await _save_fetched_episodes(db, podcast, api_response)
+                        await update_podcast_check_time(db, podcast, full_sync=True)
+            latest, _, _ = await get_podcast_episodes_page(db, podcast_id, per_page=per_page)
+
+        return {"data": [serialize_episode(ep) for ep in latest]}
+    except Exception as e:
+        logger.error(f"Errore episodi podcast {podcast_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
 
-            podcast = await get_or_create_podcast(
-                db, str(podcast_id), podcast_data[0]
-            )
-            if not podcast:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Impossibile creare o recuperare il podcast",
-                )
 
-            await save_episodes(db, podcast, podcast_data)
-            await update_podcast_check_time(db, podcast)
-            episodes, _ = await get_podcast_episodes(db, podcast.id)
+# Massimo di risultati per pagina della ricerca
+SEARCH_MAX_PER_PAGE = 100
 
-        if not episodes:
-            return {"data": []}
 
-        episodes.sort(
-            key=lambda x: x.publication_date or datetime.min, reverse=True
+@router.get(
+    "/api/search",
+    description="Ricerca full-text negli episodi salvati (titolo, sommario e descrizione).",
+)
+async def search_episodes_json(
+    q: str,
+    page: int = 1,
+    per_page: int = 20,
+    podcast_id: Optional[int] = None,
+    _user=Depends(require_auth),
+    db: AsyncSession = Depends(get_db),
+):
+    page = max(page, 1)
+    per_page = min(max(per_page, 1), SEARCH_MAX_PER_PAGE)
+    try:
+        results, total = await search_episodes(
+            db, q, page=page, per_page=per_page, podcast_id=podcast_id
         )
-        return {"data": [serialize_episode(ep) for ep in episodes[:per_page]]}
     except Exception as e:
-        logger.error(f"Errore episodi podcast {podcast_id}: {e}", exc_info=True)
+        logger.error(f"Errore ricerca {q!r}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "data": results,
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "total_pages": (total + per_page - 1) // per_page,
+    }
 
 
 @router.get("/api/podcast/{podcast_id}/episode/{episode_id}/description")
@@ -288,7 +380,6 @@ async def get_episode_description(
                 "content_html": episode.description,
             }
 
-        await api_rate_limiter.wait()
         episode_details = await fetch_episode_details(
             podcast_id, int(episode_id)
         )
@@ -300,9 +391,7 @@ async def get_episode_description(
 
             # Salva nel DB se abbiamo i dettagli
             if episode and description:
-                episode.description = description
-                episode.description_verified = True
-                await db.commit()
+                await save_episode_descriptions(db, {episode.ilpost_id: description})
 
             return {
                 "description": clean_html_text(description),
@@ -323,15 +412,8 @@ async def refresh_episode(
     db: AsyncSession = Depends(get_db),
 ):
     try:
-        stmt = select(Episode).where(Episode.ilpost_id == episode_id)
-        result = await db.execute(stmt)
-        episode = result.scalar_one_or_none()
-
-        if episode:
-            episode.description_verified = False
-            await db.commit()
+        saved = await update_episode(db, episode_id, {"description_verified": False})
 
-        await api_rate_limiter.wait()
         episode_details = await fetch_episode_details(
             podcast_id, int(episode_id)
         )
@@ -339,16 +421,18 @@ async def refresh_episode(
         if not episode_details:
             raise HTTPException(status_code=404, detail="Episodio non trovato")
 
-        # Aggiorna nel DB
-        if episode and "data" in episode_details:
+        # Aggiorna nel DB i campi presenti nella risposta
+        if saved and "data" in episode_details:
             ep_data = episode_details["data"]
-            episode.title = ep_data.get("title", episode.title)
-            episode.description = ep_data.get("content_html", "") or ep_data.get(
-                "summary", episode.description
-            )
-            episode.description_verified = True
-            episode.audio_url = ep_data.get("episode_raw_url", episode.audio_url)
-            await db.commit()
+            values = {"description_verified": True}
+            if "title" in ep_data:
+                values["title"] = ep_data["title"]
+            description = ep_data.get("content_html", "") or ep_data.get("summary")
+            if description is not None:
+                values["description"] = description
+            if "episode_raw_url" in ep_data:
+                values["audio_url"] = ep_data["episode_raw_url"]
+            await update_episode(db, episode_id, values)
 
         return {"message": "Episodio aggiornato con successo"}
     except HTTPException:
@@ -370,10 +454,11 @@ async def update_podcast(
         podcast = result.scalar_one_or_none()
 
         if podcast:
-            podcast.last_checked = None
-            await db.commit()
+            await reset_podcast_check_time(db, podcast)
 
-        await api_rate_limiter.wait()
+        # Una lista in cache (anche da un aggiornamento in background) potrebbe
+        # essere vecchia: si riscarica e si salva
+        clear_episodes_cache(podcast_id)
         response = await fetch_all_episodes(podcast_id, batch_size=500)
 
         if not response or "data" not in response:
@@ -392,13 +477,9 @@ async def update_podcast(
                 detail="Impossibile creare o recuperare il podcast",
             )
 
-        await save_episodes(db, podcast, podcast_data)
-        await update_podcast_check_time(db, podcast)
-        episodes, _ = await get_podcast_episodes(db, podcast_id)
-
-        episodes.sort(
-            key=lambda x: x.publication_date or datetime.min, reverse=True
-        )
+        await _save_fetched_episodes(db, podcast, response)
+        await update_podcast_check_time(db, podcast, full_sync=True)
+        episodes, _ = await get_podcast_episodes(db, podcast_id, columns=EPISODE_LIST_COLUMNS)
 
         return JSONResponse({
             "success": True,
@@ -519,34 +600,118 @@ def _generate_opml(podcasts: list, token: str, favorites_only: bool, base_url: s
 
 # --- Feed Endpoints ---
 
+# Header aggiunto quando la risposta usa i dati del DB perche' l'API upstream
+# non e' disponibile
+STALE_HEADER = "X-Served-Stale"
+
+
+def _can_serve_stale(error: HTTPException, episodes: list) -> bool:
+    """Errore upstream (5xx) con episodi gia' presenti nel DB da poter servire."""
+    return error.status_code >= 500 and bool(episodes)
+
+
+async def _save_fetched_episodes(db: AsyncSession, podcast: Podcast, response: dict) -> None:
+    """
+    Salva gli episodi di una risposta upstream e ne conferma i validatori.
+
+    Solo dopo il salvataggio un 304 puo' indicare episodi gia' nel DB: se il
+    salvataggio fallisce la prossima richiesta riscarica gli episodi.
+    """
+    await save_episodes(db, podcast, response["data"])
+    commit_validators(response)
+
+
+async def _sync_incremental(db: AsyncSession, podcast_id: int, episodes: list):
+    """
+    Aggiorna gli episodi scaricando solo quelli nuovi o modificati.
+
+    Restituisce la lista aggiornata degli episodi, oppure None se serve una
+    sincronizzazione completa (podcast senza episodi o ultima sincronizzazione
+    completa piu' vecchia di EPISODES_FULL_SYNC_INTERVAL).
+    """
+    if not episodes:
+        return None
+    podcast = await get_podcast_by_ilpost_id(db, str(podcast_id))
+    if not podcast or needs_full_sync(podcast):
+        return None
+
+    fingerprints = {ep.ilpost_id: stored_episode_fingerprint(ep) for ep in episodes}
+    response = await fetch_new_episodes(
+        podcast_id,
+        lambda ep: fingerprints.get(str(ep["id"])) == api_episode_fingerprint(ep),
+    )
+    await update_podcast_check_time(db, podcast)
+    if not response["data"]:
+        commit_validators(response)
+        return episodes
+
+    await _save_fetched_episodes(db, podcast, response)
+    episodes, _ = await get_podcast_episodes(db, podcast_id, columns=EPISODE_FEED_COLUMNS)
+    return episodes
+
+
+def _stale_headers(served_stale: bool) -> dict:
+    if not served_stale:
+        return {}
+    # Cache breve: i lettori RSS riprovano presto quando l'API torna disponibile
+    return {STALE_HEADER: "true", "Cache-Control": "public, max-age=60"}
+
 
 async def _generate_rss(podcast_id: int, request: Request, db: AsyncSession):
     try:
-        episodes, needs_update = await get_podcast_episodes(db, podcast_id)
+        episodes, needs_update = await get_podcast_episodes(
+            db, podcast_id, columns=EPISODE_FEED_COLUMNS
+        )
+        served_stale = False
 
         if needs_update or not episodes:
             # Invalidate api_client cache for this podcast to avoid stale data
             clear_episodes_cache(podcast_id)
-            await api_rate_limiter.wait()
-            api_episodes = await fetch_all_episodes(podcast_id)
-
-            if not api_episodes.get("data"):
-                raise HTTPException(
-                    status_code=404, detail="Podcast non trovato"
-                )
-
-            db_podcast = await get_or_create_podcast(
-                db, str(podcast_id), api_episodes["data"][0]
-            )
-            if not db_podcast:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Impossibile creare o recuperare il podcast",
+            try:
+                synced = await _sync_incremental(db, podcast_id, episodes)
+                if synced is None:
+                    api_episodes = await fetch_all_episodes(podcast_id)
+            except HTTPException as e:
+                if not _can_serve_stale(e, episodes):
+                    raise
+                # API non disponibile (es. circuit breaker aperto): il DB ha
+                # gia' una lista di episodi utilizzabile
+                logger.warning(
+                    f"API non disponibile per il podcast {podcast_id}, "
+                    f"servo gli episodi dal DB: {e.detail}"
                 )
-
-            await save_episodes(db, db_podcast, api_episodes["data"])
-            await update_podcast_check_time(db, db_podcast)
-            episodes, _ = await get_podcast_episodes(db, podcast_id)
+                served_stale = True
+            else:
+                if synced is not None:
+                    episodes = synced
+                else:
+                    if not api_episodes.get("data"):
+                        raise HTTPException(
+                            status_code=404, detail="Podcast non trovato"
+                        )
+
+                    db_podcast = None
+                    if is_not_modified(api_episodes) and episodes:
+                        # L'API ha risposto 304: gli episodi nel DB sono gia' aggiornati
+                        db_podcast = await get_podcast_by_ilpost_id(db, str(podcast_id))
+
+                    if db_podcast:
+                        await update_podcast_check_time(db, db_podcast, full_sync=True)
+                    else:
+                        db_podcast = await get_or_create_podcast(
+                            db, str(podcast_id), api_episodes["data"][0]
+                        )
+                        if not db_podcast:
+                            raise HTTPException(
+                                status_code=404,
+                                detail="Impossibile creare o recuperare il podcast",
+                            )
+
+                        await _save_fetched_episodes(db, db_podcast, api_episodes)
+                        await update_podcast_check_time(db, db_podcast, full_sync=True)
+                        episodes, _ = await get_podcast_episodes(
+                            db, podcast_id, columns=EPISODE_FEED_COLUMNS
+                        )
 
         # Sort episodes by publication date (newest first) for the RSS feed
         def _sort_date(ep):
@@ -568,28 +733,34 @@ async def _generate_rss(podcast_id: int, request: Request, db: AsyncSession):
         episodes_to_update = [
             ep for ep in episodes if not ep.description_verified
         ]
-        if episodes_to_update:
+        if episodes_to_update and not served_stale:
             total = len(episodes_to_update)
             logger.info(
                 f"Aggiornamento {total} descrizioni per '{db_podcast.title}'"
             )
             ep_ids = [int(ep.ilpost_id) for ep in episodes_to_update]
             try:
-                await api_rate_limiter.wait()
-                batch_result = await fetch_episodes_batch(ep_ids)
+                # Completamento descrizioni: non deve rallentare chi attende
+                with upstream_priority(BACKGROUND):
+                    batch_result = await fetch_episodes_batch(ep_ids)
                 if batch_result and "data" in batch_result:
                     # Mappa i risultati per ID
                     details_map = {
                         ep["id"]: ep for ep in batch_result["data"]
                     }
+                    descriptions = {}
                     for episode in episodes_to_update:
                         ep_data = details_map.get(int(episode.ilpost_id))
                         if ep_data:
-                            episode.description = ep_data.get(
+                            descriptions[episode.ilpost_id] = ep_data.get(
                                 "content_html", ""
                             ) or ep_data.get("description", "")
-                            episode.description_verified = True
-                    await db.commit()
+                    if descriptions:
+                        await save_episode_descriptions(db, descriptions)
+                        episodes, _ = await get_podcast_episodes(
+                            db, podcast_id, columns=EPISODE_FEED_COLUMNS
+                        )
+                        episodes.sort(key=_sort_date, reverse=True)
             except Exception as e:
                 logger.error(
                     f"Errore batch descrizioni ({total} episodi): {e}"
@@ -644,7 +815,9 @@ async def _generate_rss(podcast_id: int, request: Request, db: AsyncSession):
         # Controlla If-None-Match dal client
         if_none_match = request.headers.get("if-none-match", "")
         if if_none_match == etag:
-            return Response(status_code=304, headers={"ETag": etag})
+            return Response(
+                status_code=304, headers={"ETag": etag, **_stale_headers(served_stale)}
+            )
 
         # Determina Last-Modified dall'episodio più recente
         last_modified = None
@@ -668,13 +841,18 @@ async def _generate_rss(podcast_id: int, request: Request, db: AsyncSession):
             if if_modified_since == last_modified:
                 return Response(
                     status_code=304,
-                    headers={"ETag": etag, "Last-Modified": last_modified},
+                    headers={
+                        "ETag": etag,
+                        "Last-Modified": last_modified,
+                        **_stale_headers(served_stale),
+                    },
                 )
 
         # Risposta completa con header di caching
         headers = {
             "ETag": etag,
             "Cache-Control": "public, max-age=300",
+            **_stale_headers(served_stale),
         }
         if last_modified:
             headers["Last-Modified"] = last_modified
@@ -691,16 +869,77 @@ async def _generate_rss(podcast_id: int, request: Request, db: AsyncSession):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Ultimo feed generato per URL, servito a chi supera i limiti di richieste
+_feed_cache = LRUCache(maxsize=FEED_RENDER_CACHE_SIZE)
+
+
+def _client_ip(request: Request) -> Optional[str]:
+    return request.client.host if request.client else None
+
+
+def _cached_feed_response(request: Request) -> Optional[Response]:
+    """304 o 200 dall'ultimo feed generato per questo URL, se presente."""
+    cached = _feed_cache.get(str(request.url))
+    if cached is None:
+        return None
+    content, headers = cached
+    if request.headers.get("if-none-match", "") == headers.get("ETag"):
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type="application/rss+xml", headers=headers)
+
+
+def _limited_feed(request: Request, status_code: int, retry_after: float, reason: str):
+    """Risposta a una richiesta oltre i limiti: il feed in cache, o l'errore."""
+    cached = _cached_feed_response(request)
+    if cached is not None:
+        metrics.incr("feed_served_from_cache_total", reason=reason)
+        return cached
+    raise HTTPException(
+        status_code=status_code,
+        detail="Troppe richieste, riprova piu' tardi",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def _check_inbound_limits(request: Request, **keys: str) -> Optional[Response]:
+    """Conta la richiesta per IP e per ``keys``; oltre il limite la risposta da dare."""
+    retry_after = inbound_rate_limiter.check(ip=_client_ip(request), **keys)
+    if retry_after > 0:
+        return _limited_feed(request, 429, retry_after, "rate_limited")
+    return None
+
+
+async def _serve_feed(podcast_id: int, request: Request, db: AsyncSession):
+    """Genera il feed, se non ci sono gia' troppi feed in generazione."""
+    if not feed_render_limiter.try_acquire():
+        return _limited_feed(request, 503, FEED_SHED_RETRY_AFTER, "load_shed")
+    try:
+        with upstream_priority(FEED_POLL):
+            response = await _generate_rss(podcast_id, request, db)
+    finally:
+        feed_render_limiter.release()
+    if response.status_code == 200:
+        _feed_cache[str(request.url)] = (response.body, {
+            name: response.headers[name]
+            for name in ("ETag", "Last-Modified", "Cache-Control")
+            if name in response.headers
+        })
+    return response
+
+
 # --- Authenticated feed routes (session auth) ---
 
 @router.get("/podcast/{podcast_id}/rss")
 async def get_podcast_rss(
     podcast_id: int = Path(...),
     request: Request = None,
-    _user=Depends(require_auth),
+    user=Depends(require_auth),
     db: AsyncSession = Depends(get_db),
 ):
-    return await _generate_rss(podcast_id, request, db)
+    limited = _check_inbound_limits(request, user=str(user.id))
+    if limited is not None:
+        return limited
+    return await _serve_feed(podcast_id, request, db)
 
 
 # --- Token-authenticated feed routes (for RSS readers) ---
@@ -712,9 +951,15 @@ async def get_podcast_rss_token(
     request: Request = None,
     db: AsyncSession = Depends(get_db),
 ):
+    # Il limite e' per token e feed: l'OPML usa lo stesso token per tutti i
+    # feed, che un podcatcher aggiorna insieme. Ogni richiesta conta, ma il
+    # feed in cache si serve solo dopo aver verificato il token (revocabile)
+    limited = _check_inbound_limits(request, token=f"{token}:{podcast_id}")
     user = await get_user_by_rss_token(db, token)
     if not user:
         raise HTTPException(status_code=403, detail="Token non valido")
-    return await _generate_rss(podcast_id, request, db)
+    if limited is not None:
+        return limited
+    return await _serve_feed(podcast_id, request, db)
 
 
@@ -1,6 +1,5 @@
-from datetime import datetime
+from datetime import datetime, timezone
 
-from cachetools import TTLCache
 from fastapi import APIRouter, HTTPException, Request, Depends, Path
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
@@ -14,8 +13,11 @@ from api_client import (
 )
 from auth_dependencies import require_auth
 from config import CACHE_TTL, BASE_URL, BUILD_COMMIT, BUILD_VERSION
-from database import get_db
-from database.operations import get_podcast_episodes
+from database import get_db, AsyncSessionLocal
+from database.operations import (
+    get_podcast_episodes_page,
+    get_podcast_summaries,
+)
 from database.favorite_operations import get_user_favorites
 from helpers import (
     clean_html_text,
@@ -25,7 +27,9 @@ from helpers import (
     format_date_time,
     escapejs,
 )
+from utils.disk_cache import get_disk_cache
 from utils.logging import get_logger
+from utils.swr_cache import SWRCache
 
 logger = get_logger(__name__)
 
@@ -55,8 +59,8 @@ templates.env.filters.update({
     "format_duration": format_duration,
 })
 
-# Cache per la directory dei podcast
-_directory_cache = TTLCache(maxsize=1, ttl=CACHE_TTL)
+# Cache per la directory dei podcast (copiata su disco se DISK_CACHE_ENABLED)
+_directory_cache = SWRCache("directory", maxsize=1, ttl=CACHE_TTL, store=get_disk_cache())
 
 
 async def update_podcast_directory_cache() -> bool:
@@ -70,7 +74,9 @@ async def update_podcast_directory_cache() -> bool:
         cached = _directory_cache.get("directory")
 
         if cached is not None:
-            podcast_list = cached
+            # Copia delle voci: il valore in cache non va modificato (viene
+            # serializzato su disco in un altro thread)
+            podcast_list = [dict(podcast) for podcast in cached]
             podcast_ids_in_cache = {p["id"] for p in podcast_list}
 
             for podcast in podcast_list:
@@ -79,7 +85,7 @@ async def update_podcast_directory_cache() -> bool:
                     latest = latest_updates[podcast_id]
                     current_date = podcast.get("last_episode_date")
 
-                    if not current_date or latest["date"] > current_date:
+                    if not current_date or _episode_date(latest["date"]) > _episode_date(current_date):
                         podcast.update({
                             "last_episode_date": latest["date"],
                             "last_episode_title": clean_html_text(
@@ -105,9 +111,15 @@ async def update_podcast_directory_cache() -> bool:
                 for podcast in podcasts["data"]
             ]
 
+        # I podcast assenti dalla homepage (o aggiornati dopo) prendono
+        # l'ultimo episodio dal riepilogo salvato nel DB
+        async with AsyncSessionLocal() as db:
+            summaries = {int(row.ilpost_id): row for row in await get_podcast_summaries(db)}
+        for podcast in podcast_list:
+            _apply_podcast_summary(podcast, summaries.get(podcast["id"]))
+
         podcast_list.sort(
-            key=lambda x: x["last_episode_date"]
-            or "1970-01-01T00:00:00+00:00",
+            key=lambda x: _episode_date(x["last_episode_date"]),
             reverse=True,
         )
 
@@ -138,32 +150,92 @@ def _build_podcast_entry(podcast: dict, latest: dict) -> dict:
     }
 
 
+def _episode_date(value) -> datetime:
+    """
+    Data di un episodio (stringa ISO o datetime) confrontabile con le altre.
+
+    L'API usa l'ora locale con offset, PostgreSQL restituisce date in UTC e
+    SQLite date senza fuso (trattate come UTC): confrontare le stringhe ISO
+    darebbe l'ordine sbagliato. Senza data si va in fondo.
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            value = None
+    if value is None:
+        return datetime.min.replace(tzinfo=timezone.utc)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _summary_fields(row) -> dict:
+    """Campi dell'ultimo episodio per la directory dal riepilogo nel DB."""
+    return {
+        "last_episode_date": (
+            row.last_episode_date.isoformat() if row.last_episode_date else None
+        ),
+        "last_episode_title": clean_html_text(row.last_episode_title),
+        "last_episode_duration": format_duration(
+            row.last_episode_duration * 1000 if row.last_episode_duration else None
+        ),
+        "episode_count": row.episode_count or 0,
+    }
+
+
+def _apply_podcast_summary(podcast: dict, row) -> None:
+    """Usa il riepilogo nel DB se la voce non ha un ultimo episodio o ne ha uno piu' vecchio."""
+    if row is None or not row.last_episode_date:
+        return
+    fields = _summary_fields(row)
+    current_date = podcast.get("last_episode_date")
+    if not current_date or _episode_date(row.last_episode_date) > _episode_date(current_date):
+        podcast.update(fields)
+    else:
+        podcast["episode_count"] = fields["episode_count"]
+
+
+def _build_summary_entry(row) -> dict:
+    """Costruisce un dizionario podcast per la directory da un podcast salvato nel DB."""
+    return {
+        "id": int(row.ilpost_id),
+        "title": clean_html_text(row.title),
+        "image": row.image_url,
+        "description": clean_html_text(row.description),
+        "author": clean_html_text(row.author),
+        "rss_url": f"/podcast/{row.ilpost_id}/rss",
+        "slug": row.slug,
+        **_summary_fields(row),
+    }
+
+
 async def get_last_episode_info(podcast_id: int, db: AsyncSession = None):
     """Recupera le informazioni dell'ultimo episodio con caching."""
     cache = get_episode_info_cache()
-
-    if podcast_id in cache:
-        return cache[podcast_id]
-
-    if db:
-        episodes, needs_update = await get_podcast_episodes(db, podcast_id)
-        if episodes and not needs_update:
-            episodes.sort(
-                key=lambda x: x.publication_date or datetime.min, reverse=True
+    return await cache.get_or_fetch(
+        podcast_id, lambda: _load_last_episode_info(podcast_id, use_db=db is not None)
+    )
+
+
+async def _load_last_episode_info(podcast_id: int, use_db: bool):
+    """Legge l'ultimo episodio dal riepilogo nel DB, o dall'API se il podcast non e' salvato."""
+    if use_db:
+        # Sessione propria: il caricamento puo' avvenire in background,
+        # dopo la fine della richiesta che lo ha innescato
+        async with AsyncSessionLocal() as db:
+            summaries = await get_podcast_summaries(db, [podcast_id])
+        if summaries and summaries[0].episode_count:
+            latest = summaries[0]
+            return (
+                (
+                    latest.last_episode_date.isoformat()
+                    if latest.last_episode_date
+                    else None
+                ),
+                latest.last_episode_title,
+                latest.last_episode_duration * 1000 if latest.last_episode_duration else None,
             )
-            if episodes:
-                latest = episodes[0]
-                info = (
-                    (
-                        latest.publication_date.isoformat()
-                        if latest.publication_date
-                        else None
-                    ),
-                    latest.title,
-                    latest.duration * 1000 if latest.duration else None,
-                )
-                cache[podcast_id] = info
-                return info
 
     last_episode = await fetch_episodes(podcast_id, page=1, hits=1)
 
@@ -173,16 +245,12 @@ async def get_last_episode_info(podcast_id: int, db: AsyncSession = None):
         and len(last_episode["data"]) > 0
     ):
         episode = last_episode["data"][0]
-        info = (
+        return (
             episode.get("date"),
             episode.get("title"),
             episode.get("milliseconds"),
         )
-    else:
-        info = (None, None, None)
-
-    cache[podcast_id] = info
-    return info
+    return (None, None, None)
 
 
 # --- Web Endpoints ---
@@ -202,9 +270,13 @@ async def podcast_directory(
         if cached is not None:
             podcast_list = cached
         else:
+            # Senza cache la pagina parte dai podcast salvati nel DB e la
+            # directory completa viene caricata dal browser in background
             needs_update = True
-            await update_podcast_directory_cache()
-            podcast_list = _directory_cache.get("directory", [])
+            podcast_list = [_build_summary_entry(row) for row in await get_podcast_summaries(db)]
+            if not podcast_list:
+                await update_podcast_directory_cache()
+                podcast_list = _directory_cache.get("directory", [])
 
         favorites = await get_user_favorites(db, user.id)
         base_url = BASE_URL.rstrip("/")
@@ -255,13 +327,11 @@ async def podcast_episodes(
             "slug": podcast_info["slug"],
         }
 
-        episodes, needs_update = await get_podcast_episodes(db, podcast_id)
-        episodes.sort(
-            key=lambda x: x.publication_date or datetime.min, reverse=True
+        paginated_episodes, total_items, needs_update = await get_podcast_episodes_page(
+            db, podcast_id, page=page, per_page=per_page
         )
 
         # Paginazione
-        total_items = len(episodes)
         total_pages = (total_items + per_page - 1) // per_page
         has_next = page < total_pages
         has_prev = page > 1
@@ -280,10 +350,6 @@ async def podcast_episodes(
                 pages.append("...")
             pages.append(total_pages)
 
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        paginated_episodes = episodes[start_idx:end_idx]
-
         pagination = {
             "current_page": page,
             "per_page": per_page,
@@ -0,0 +1,179 @@
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from cachetools import LRUCache
+
+from utils import metrics
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def settle(
+    tokens: float, updated: float, now: float, rate: float, burst: float
+) -> float:
+    """Token disponibili a ``now`` dopo il rifornimento a ``rate`` token al secondo."""
+    return min(burst, tokens + max(0.0, now - updated) * rate)
+
+
+def take_tokens(
+    tokens: float, now: float, rate: float, cost: float, debt: bool
+) -> Tuple[float, float]:
+    """
+    Preleva ``cost`` token da un saldo gia' rifornito.
+
+    Restituisce ``(nuovo saldo, secondi di attesa)``. Con ``debt`` il prelievo
+    avviene sempre (il saldo puo' andare in negativo, come una prenotazione);
+    senza, se non bastano i token il saldo resta invariato e l'attesa indica
+    quando ci saranno.
+    """
+    if debt or tokens >= cost:
+        tokens -= cost
+        return tokens, (0.0 if tokens >= 0 else -tokens / rate)
+    return tokens, (cost - tokens) / rate
+
+
+class BucketStore(ABC):
+    """
+    Stato dei token bucket: saldo e istante dell'ultimo aggiornamento per chiave.
+
+    :meth:`take` deve essere atomico rispetto a tutti i processi che condividono
+    lo store. Per uno store di rete (es. Redis tra piu' nodi) basta implementare
+    :meth:`take` con la stessa logica di :func:`settle` e :func:`take_tokens`
+    eseguita lato server.
+    """
+
+    @abstractmethod
+    def take(
+        self,
+        key: str,
+        rate: float,
+        burst: float,
+        now: float,
+        cost: float = 1.0,
+        debt: bool = True,
+    ) -> float:
+        """Preleva ``cost`` token dal bucket ``key`` e restituisce i secondi da attendere."""
+
+    def close(self):
+        pass
+
+
+class MemoryBucketStore(BucketStore):
+    """
+    Stato in memoria: i limiti valgono per il singolo processo.
+
+    Con ``maxsize`` vengono tenuti solo i bucket usati piu' di recente (es. un
+    bucket per indirizzo IP): uno dimenticato riparte pieno.
+    """
+
+    def __init__(self, maxsize: Optional[int] = None):
+        self._state: Dict[str, Tuple[float, float]] = (
+            LRUCache(maxsize) if maxsize else {}
+        )
+
+    def take(self, key, rate, burst, now, cost=1.0, debt=True):
+        tokens, updated = self._state.get(key, (burst, now))
+        tokens, delay = take_tokens(
+            settle(tokens, updated, now, rate, burst), now, rate, cost, debt
+        )
+        self._state[key] = (tokens, now)
+        return delay
+
+
+class SQLiteBucketStore(BucketStore):
+    """
+    Stato su un file SQLite condiviso dai worker dello stesso nodo.
+
+    Ogni prelievo e' una transazione ``BEGIN IMMEDIATE``: i processi si
+    serializzano solo per la lettura e scrittura di una riga, mai durante
+    l'attesa del proprio turno. Gli istanti devono venire da un orologio
+    comune ai processi (``time.time``). Se il file non e' utilizzabile il
+    limite viene applicato solo dal processo corrente invece di bloccare le
+    chiamate.
+
+    :meth:`take` gira sull'event loop: senza fsync (``synchronous=OFF``, lo
+    stato si puo' perdere senza danni) la transazione dura una frazione di
+    millisecondo, e se il file resta occupato oltre ``busy_timeout_ms`` il
+    prelievo passa allo stato in memoria invece di fermare il loop.
+    """
+
+    # Attesa massima per preparare il file (WAL e tabella) alla prima apertura
+    SETUP_TIMEOUT_MS = 1000
+
+    def __init__(self, path: str, busy_timeout_ms: int = 50):
+        self.path = Path(path)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._fallback = MemoryBucketStore()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Dopo un fork la connessione del processo padre non va riutilizzata
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute(f"PRAGMA busy_timeout={self.SETUP_TIMEOUT_MS}")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS token_buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def take(self, key, rate, burst, now, cost=1.0, debt=True):
+        with self._lock:
+            try:
+                return self._take(key, rate, burst, now, cost, debt)
+            except sqlite3.Error as e:
+                logger.warning(f"Rate limiter condiviso non disponibile ({self.path}): {e}")
+                metrics.incr("upstream_rate_limit_store_errors_total")
+                return self._fallback.take(key, rate, burst, now, cost, debt)
+
+    def _take(self, key, rate, burst, now, cost, debt) -> float:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM token_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens, delay = take_tokens(
+                settle(tokens, updated, now, rate, burst), now, rate, cost, debt
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO token_buckets VALUES (?, ?, ?)",
+                (key, tokens, max(now, updated)),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return delay
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+def build_bucket_store(backend: str, path: str) -> BucketStore:
+    """Crea lo store configurato con UPSTREAM_RATE_BACKEND."""
+    if backend == "memory":
+        return MemoryBucketStore()
+    if backend == "sqlite":
+        return SQLiteBucketStore(path)
+    raise ValueError(f"Backend del rate limiter sconosciuto: {backend!r}")
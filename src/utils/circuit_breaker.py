@@ -0,0 +1,184 @@
+import time
+from collections import deque
+from typing import Callable, Dict
+
+from config import (
+    UPSTREAM_BREAKER_FAILURE_RATE,
+    UPSTREAM_BREAKER_SLOW_CALL_SECONDS,
+    UPSTREAM_BREAKER_SLOW_CALL_RATE,
+    UPSTREAM_BREAKER_WINDOW,
+    UPSTREAM_BREAKER_MIN_CALLS,
+    UPSTREAM_BREAKER_OPEN_SECONDS,
+    UPSTREAM_BREAKER_HALF_OPEN_CALLS,
+)
+from utils import metrics
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Valore numerico dello stato esportato come gauge
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Chiamata rifiutata perche' il circuito e' aperto."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuito {name} aperto, nuovo tentativo tra {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker a finestra scorrevole sulle ultime ``window_size`` chiamate.
+
+    - ``closed``: le chiamate passano; se su almeno ``min_calls`` chiamate la
+      quota di errori supera ``failure_rate_threshold``, o quella di chiamate
+      piu' lente di ``slow_call_seconds`` supera ``slow_call_rate_threshold``,
+      il circuito si apre;
+    - ``open``: le chiamate vengono rifiutate subito per ``open_seconds``;
+    - ``half_open``: passano al massimo ``half_open_calls`` chiamate di prova;
+      se vanno tutte bene il circuito si richiude, al primo errore si riapre.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 10.0,
+        slow_call_rate_threshold: float = 0.8,
+        window_size: int = 20,
+        min_calls: int = 10,
+        open_seconds: float = 30.0,
+        half_open_calls: int = 3,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self._timer = timer
+        # Esiti recenti come coppie (fallita, lenta)
+        self._window: deque = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._export_state()
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self._timer() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def before_call(self):
+        """Da chiamare prima di ogni chiamata: solleva CircuitOpenError se rifiutata."""
+        state = self.state
+        if state == OPEN:
+            metrics.incr("circuit_breaker_rejected_total", breaker=self.name)
+            raise CircuitOpenError(
+                self.name, self.open_seconds - (self._timer() - self._opened_at)
+            )
+        if state == HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_calls:
+                metrics.incr("circuit_breaker_rejected_total", breaker=self.name)
+                raise CircuitOpenError(self.name, 0)
+            self._probes_in_flight += 1
+
+    def record_success(self, duration: float = 0.0):
+        slow = duration >= self.slow_call_seconds
+        if self._state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if slow:
+                self._open()
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_calls:
+                self._transition(CLOSED)
+            return
+        self._record(False, slow)
+
+    def record_failure(self):
+        if self._state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            self._open()
+            return
+        self._record(True, False)
+
+    def release(self):
+        """Chiamata abbandonata (es. cancellata) senza un esito da registrare."""
+        if self._state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def snapshot(self) -> Dict:
+        """Stato corrente e statistiche della finestra, per /readyz."""
+        calls = len(self._window)
+        failures = sum(1 for failed, _ in self._window if failed)
+        slow = sum(1 for _, is_slow in self._window if is_slow)
+        return {
+            "state": self.state,
+            "calls": calls,
+            "failure_rate": round(failures / calls, 3) if calls else 0.0,
+            "slow_call_rate": round(slow / calls, 3) if calls else 0.0,
+        }
+
+    def _record(self, failed: bool, slow: bool):
+        self._window.append((failed, slow))
+        if self._state != CLOSED or len(self._window) < self.min_calls:
+            return
+        calls = len(self._window)
+        failure_rate = sum(1 for f, _ in self._window if f) / calls
+        slow_rate = sum(1 for _, s in self._window if s) / calls
+        if (
+            failure_rate >= self.failure_rate_threshold
+            or slow_rate >= self.slow_call_rate_threshold
+        ):
+            logger.warning(
+                f"Circuito {self.name} aperto: errori {failure_rate:.0%}, "
+                f"chiamate lente {slow_rate:.0%} su {calls} chiamate"
+            )
+            self._open()
+
+    def _open(self):
+        self._opened_at = self._timer()
+        self._transition(OPEN)
+
+    def _transition(self, state: str):
+        if state == self._state:
+            return
+        logger.info(f"Circuito {self.name}: {self._state} -> {state}")
+        metrics.incr(
+            "circuit_breaker_transitions_total", breaker=self.name, state=state
+        )
+        self._state = state
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        if state == CLOSED:
+            self._window.clear()
+        self._export_state()
+
+    def _export_state(self):
+        metrics.set_gauge(
+            "circuit_breaker_state", _STATE_VALUES[self._state], breaker=self.name
+        )
+
+
+# Istanza globale del circuit breaker per le chiamate all'API Il Post
+upstream_breaker = CircuitBreaker(
+    "upstream",
+    failure_rate_threshold=UPSTREAM_BREAKER_FAILURE_RATE,
+    slow_call_seconds=UPSTREAM_BREAKER_SLOW_CALL_SECONDS,
+    slow_call_rate_threshold=UPSTREAM_BREAKER_SLOW_CALL_RATE,
+    window_size=UPSTREAM_BREAKER_WINDOW,
+    min_calls=UPSTREAM_BREAKER_MIN_CALLS,
+    open_seconds=UPSTREAM_BREAKER_OPEN_SECONDS,
+    half_open_calls=UPSTREAM_BREAKER_HALF_OPEN_CALLS,
+)
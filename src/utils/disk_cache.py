@@ -0,0 +1,154 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+from config import DISK_CACHE_ENABLED, DISK_CACHE_PATH, DISK_CACHE_MAX_BYTES
+from utils import metrics
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class DiskCache:
+    """
+    Cache persistente su SQLite per le risposte upstream.
+
+    I valori sono serializzati in JSON e compressi con zlib, insieme all'istante
+    di recupero. La dimensione totale e' limitata a ``max_bytes``: oltre il
+    limite vengono rimosse le voci usate meno di recente (scritte o servite,
+    vedi :meth:`touch`).
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Un solo worker: le scritture restano nell'ordine in cui sono richieste
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk-cache")
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def encode(value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    def put(self, namespace: str, key: str, payload: bytes, fetched_at: float):
+        """Salva un valore gia' serializzato con :meth:`encode`."""
+        body = zlib.compress(payload, 6)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, body, len(body), fetched_at, time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+        metrics.incr("disk_cache_writes_total", cache=namespace)
+
+    def load(self, namespace: str) -> List[Tuple[str, Any, float]]:
+        """Restituisce tutte le voci di un namespace come (chiave, valore, fetched_at)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, body, fetched_at FROM cache_entries WHERE namespace = ?",
+                (namespace,),
+            ).fetchall()
+        entries = []
+        for key, body, fetched_at in rows:
+            try:
+                entries.append((key, json.loads(zlib.decompress(body)), fetched_at))
+            except (zlib.error, ValueError) as e:
+                logger.warning(f"Voce cache su disco non valida {namespace}/{key}: {e}")
+        return entries
+
+    def touch(self, namespace: str, keys: List[str], accessed_at: float):
+        """Registra l'uso delle voci ``keys``, per l'ordine di rimozione."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                [(accessed_at, namespace, key) for key in keys],
+            )
+            self._conn.commit()
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            )
+            self._conn.commit()
+
+    def clear(self, namespace: Optional[str] = None):
+        with self._lock:
+            if namespace is None:
+                self._conn.execute("DELETE FROM cache_entries")
+            else:
+                self._conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ?", (namespace,)
+                )
+            self._conn.commit()
+
+    def total_size(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM cache_entries"
+            ).fetchone()[0]
+
+    def _evict(self):
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache_entries"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT namespace, key, size FROM cache_entries ORDER BY accessed_at"
+        ).fetchall()
+        for namespace, key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            )
+            total -= size
+            metrics.incr("disk_cache_evictions_total")
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        with self._lock:
+            self._conn.close()
+
+
+_disk_cache: Optional[DiskCache] = None
+
+
+def get_disk_cache() -> Optional[DiskCache]:
+    """Restituisce la cache su disco condivisa, o None se disabilitata."""
+    global _disk_cache
+    if not DISK_CACHE_ENABLED:
+        return None
+    if _disk_cache is None:
+        try:
+            Path(DISK_CACHE_PATH).parent.mkdir(parents=True, exist_ok=True)
+            _disk_cache = DiskCache(DISK_CACHE_PATH, DISK_CACHE_MAX_BYTES)
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Impossibile aprire la cache su disco {DISK_CACHE_PATH}: {e}")
+            return None
+    return _disk_cache
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import re
+from typing import Any, Callable, Dict, Optional, Tuple
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+Transform = Callable[[Any], Any]
+
+
+def _skip(text: str, idx: int) -> int:
+    return _WHITESPACE.match(text, idx).end()
+
+
+def _expect(text: str, idx: int, chars: str) -> str:
+    if idx >= len(text) or text[idx] not in chars:
+        raise json.JSONDecodeError(f"Atteso uno tra {chars!r}", text, idx)
+    return text[idx]
+
+
+async def decode_object(
+    text: str,
+    list_key: str = "data",
+    transform: Optional[Transform] = None,
+    batch: int = 100,
+) -> Any:
+    """
+    Decodifica un oggetto JSON elemento per elemento, cedendo il controllo
+    all'event loop ogni ``batch`` elementi della lista ``list_key``.
+
+    Ogni elemento della lista viene passato a ``transform`` appena decodificato
+    (es. per tenere solo i campi necessari), cosi' il documento completo non
+    viene mai materializzato insieme alla versione ridotta. Le altre chiavi
+    vengono decodificate normalmente; un documento che non e' un oggetto viene
+    passato a ``json.loads``.
+    """
+    idx = _skip(text, 0)
+    if not text.startswith("{", idx):
+        return json.loads(text)
+
+    result: Dict[str, Any] = {}
+    idx = _skip(text, idx + 1)
+    if text.startswith("}", idx):
+        idx += 1
+    else:
+        while True:
+            _expect(text, idx, '"')
+            key, idx = _decoder.raw_decode(text, idx)
+            idx = _skip(text, idx)
+            _expect(text, idx, ":")
+            idx = _skip(text, idx + 1)
+            if key == list_key and text.startswith("[", idx):
+                result[key], idx = await _decode_array(text, idx, transform, batch)
+            else:
+                result[key], idx = _decoder.raw_decode(text, idx)
+            idx = _skip(text, idx)
+            if _expect(text, idx, ",}") == "}":
+                idx += 1
+                break
+            idx = _skip(text, idx + 1)
+
+    if _skip(text, idx) != len(text):
+        raise json.JSONDecodeError("Dati extra dopo il documento", text, idx)
+    return result
+
+
+async def _decode_array(
+    text: str, idx: int, transform: Optional[Transform], batch: int
+) -> Tuple[list, int]:
+    items = []
+    idx = _skip(text, idx + 1)
+    if text.startswith("]", idx):
+        return items, idx + 1
+    while True:
+        item, idx = _decoder.raw_decode(text, idx)
+        items.append(transform(item) if transform else item)
+        if len(items) % batch == 0:
+            await asyncio.sleep(0)
+        idx = _skip(text, idx)
+        if _expect(text, idx, ",]") == "]":
+            return items, idx + 1
+        idx = _skip(text, idx + 1)
@@ -0,0 +1,98 @@
+"""Metriche in-process (contatori, gauge, istogrammi) in formato Prometheus."""
+import bisect
+from typing import Dict, Tuple
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_counters: Dict[LabelKey, float] = {}
+_gauges: Dict[LabelKey, float] = {}
+_histograms: Dict[LabelKey, "Histogram"] = {}
+
+
+class Histogram:
+    """Istogramma cumulativo a bucket fissi."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+def _key(name: str, labels: Dict[str, object]) -> LabelKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def incr(name: str, value: float = 1, **labels) -> None:
+    """Incrementa un contatore."""
+    key = _key(name, labels)
+    _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    """Imposta il valore di una gauge."""
+    _gauges[_key(name, labels)] = value
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Registra un valore in un istogramma."""
+    key = _key(name, labels)
+    histogram = _histograms.get(key)
+    if histogram is None:
+        histogram = _histograms[key] = Histogram()
+    histogram.observe(value)
+
+
+def get_counter(name: str, **labels) -> float:
+    return _counters.get(_key(name, labels), 0)
+
+
+def get_gauge(name: str, **labels) -> float:
+    return _gauges.get(_key(name, labels), 0)
+
+
+def get_histogram(name: str, **labels) -> Histogram:
+    return _histograms.get(_key(name, labels)) or Histogram()
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render_prometheus() -> str:
+    """Restituisce tutte le metriche nel formato testuale di Prometheus."""
+    lines = []
+    for (name, labels), value in sorted(_counters.items()):
+        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+    for (name, labels), value in sorted(_gauges.items()):
+        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+    for (name, labels), histogram in sorted(_histograms.items(), key=lambda i: i[0]):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            le = _format_labels(labels, f'le="{bound:g}"')
+            lines.append(f"{name}_bucket{le} {cumulative}")
+        inf = _format_labels(labels, 'le="+Inf"')
+        lines.append(f"{name}_bucket{inf} {histogram.count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:g}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics() -> None:
+    """Azzera tutte le metriche (usato nei test)."""
+    _counters.clear()
+    _gauges.clear()
+    _histograms.clear()
@@ -1,61 +1,473 @@
 import asyncio
 import time
-from datetime import datetime, timedelta, timezone
-
-class RateLimiter:
-    def __init__(self, requests_per_minute: int = 30):
-        self.rate = requests_per_minute
-        self.tokens = requests_per_minute
-        self.last_update = datetime.now(timezone.utc)
-        self._lock = asyncio.Lock()
-
-    async def acquire(self) -> bool:
-        async with self._lock:
-            now = datetime.now(timezone.utc)
-            time_passed = (now - self.last_update).total_seconds() / 60.0
-            self.tokens = min(self.rate, self.tokens + time_passed * self.rate)
-            self.last_update = now
-
-            if self.tokens >= 1:
-                self.tokens -= 1
-                return True
-            return False
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import (
+    UPSTREAM_RATE_LIMIT,
+    UPSTREAM_RATE_BURST,
+    UPSTREAM_RATE_FAMILY_LIMITS,
+    UPSTREAM_RATE_ADAPTIVE,
+    UPSTREAM_RATE_FLOOR,
+    UPSTREAM_RATE_CEILING,
+    UPSTREAM_RATE_INCREASE,
+    UPSTREAM_RATE_DECREASE,
+    UPSTREAM_RATE_LATENCY_TARGET,
+    UPSTREAM_PRIORITY_AGING,
+    UPSTREAM_RATE_BACKEND,
+    UPSTREAM_RATE_STORE_PATH,
+    INBOUND_TOKEN_RATE_PER_MINUTE,
+    INBOUND_USER_RATE_PER_MINUTE,
+    INBOUND_IP_RATE_PER_MINUTE,
+    INBOUND_BURST,
+    INBOUND_IP_BURST,
+    FEED_MAX_INFLIGHT_RENDERS,
+)
+from utils import metrics
+from utils.bucket_store import BucketStore, MemoryBucketStore, build_bucket_store
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Limiti predefiniti (richieste al secondo, burst) per famiglia di endpoint
+UPSTREAM_FAMILY_LIMITS = {
+    "catalog": (2.0, 4),
+    "episodes": (10.0, 10),
+    "batch": (2.0, 4),
+    "bff": (1.0, 2),
+    "login": (0.2, 2),
+}
+
+# Classi di priorita' delle chiamate upstream, dalla piu' alta
+INTERACTIVE = "interactive"
+FEED_POLL = "feed_poll"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, FEED_POLL, BACKGROUND)
+
+_priority: ContextVar[str] = ContextVar("upstream_priority", default=INTERACTIVE)
+# Chiamata condivisa (singleflight) in cui gira il task corrente, se c'e'
+_flight: ContextVar[Optional["FlightPriority"]] = ContextVar("upstream_flight", default=None)
+
+
+@contextmanager
+def upstream_priority(priority: str) -> Iterator[None]:
+    """Le chiamate upstream fatte nel blocco (anche nei task creati) usano ``priority``."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Priorita' sconosciuta: {priority!r}")
+    # Una priorita' esplicita vale anche dentro una chiamata condivisa
+    token = _priority.set(priority)
+    flight_token = _flight.set(None)
+    try:
+        yield
+    finally:
+        _flight.reset(flight_token)
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    flight = _flight.get()
+    return flight.priority if flight is not None else _priority.get()
+
+
+class FlightPriority:
+    """
+    Priorita' di una chiamata upstream condivisa da piu' chiamanti (singleflight).
+
+    Parte dalla priorita' di chi avvia la chiamata e sale alla piu' alta tra
+    chi si aggiunge dopo: un refresh avviato in background e poi atteso da una
+    richiesta utente non resta in coda come background. Le attese gia' in coda
+    nel limiter vengono spostate, e le chiamate condivise avviate o attese
+    dall'interno salgono insieme a questa.
+    """
+
+    def __init__(self, priority: str):
+        self.priority = priority
+        self._children: List["FlightPriority"] = []
+        self._queued: List[Tuple["UpstreamRateLimiter", tuple]] = []
+
+    def join(self):
+        """Aggiunge il chiamante corrente tra chi attende la chiamata."""
+        parent = _flight.get()
+        if parent is not None and parent is not self:
+            parent._children.append(self)
+        self.raise_to(current_priority())
+
+    def raise_to(self, priority: str):
+        if PRIORITIES.index(priority) >= PRIORITIES.index(self.priority):
+            return
+        previous, self.priority = self.priority, priority
+        for limiter, entry in self._queued:
+            limiter._requeue(entry, previous, priority)
+        for child in self._children:
+            child.raise_to(priority)
+
+    async def run(self, fn: Callable[[], Awaitable]):
+        """Esegue ``fn`` con la priorita' della chiamata condivisa."""
+        _flight.set(self)
+        return await fn()
+
+
+class TokenBucket:
+    """
+    Token bucket con prenotazione: ``rate`` token al secondo, fino a ``burst``.
+
+    :meth:`reserve` preleva subito un token (il saldo puo' andare in negativo)
+    e restituisce quanto attendere: l'attesa avviene fuori da qualsiasi lock,
+    quindi chiamate concorrenti si distribuiscono nel tempo senza accodarsi
+    una dietro l'altra.
+
+    Il saldo sta in uno :class:`~utils.bucket_store.BucketStore` sotto la
+    chiave ``key``: con uno store condiviso piu' processi rispettano lo
+    stesso limite.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float = 1,
+        timer: Callable[[], float] = time.monotonic,
+        store: Optional[BucketStore] = None,
+        key: str = "default",
+    ):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.key = key
+        self._timer = timer
+        self._store = store or MemoryBucketStore()
+
+    def _take(self, cost: float, debt: bool) -> float:
+        return self._store.take(self.key, self.rate, self.burst, self._timer(), cost, debt)
+
+    def set_rate(self, rate: float):
+        """Cambia il rate; i token maturati finora restano calcolati col rate precedente."""
+        self._take(0, debt=True)
+        self.rate = rate
+
+    def try_acquire(self) -> float:
+        """Preleva un token se disponibile (0), altrimenti i secondi prima che lo sia."""
+        return self._take(1, debt=False)
+
+    def reserve(self) -> float:
+        """Prenota un token e restituisce i secondi da attendere prima di usarlo."""
+        return self._take(1, debt=True)
+
 
-    async def wait(self):
-        while not await self.acquire():
-            await asyncio.sleep(60 / self.rate)  # Wait for approximately one token
+class AimdController:
+    """
+    Regola il rate di un :class:`TokenBucket` in base alle risposte upstream.
 
-    async def __aenter__(self):
-        await self.wait()
-        return self
+    Additive increase / multiplicative decrease: finche' le risposte sono sane
+    il rate sale di ``increase`` richieste al secondo per ogni secondo di
+    traffico; a un 429, o se la latenza media (EWMA) supera
+    ``latency_target``, il rate viene moltiplicato per ``decrease``. Dopo una
+    riduzione le successive vengono ignorate per ``cooldown`` secondi, perche'
+    le richieste gia' partite al rate precedente riportano lo stesso segnale.
+    Il rate resta sempre tra ``floor`` e ``ceiling``.
+    """
 
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
-        pass  # Non abbiamo bisogno di fare nulla all'uscita
+    def __init__(
+        self,
+        bucket: TokenBucket,
+        floor: float,
+        ceiling: float,
+        increase: float = 0.5,
+        decrease: float = 0.5,
+        latency_target: float = 2.0,
+        cooldown: float = 2.0,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self.bucket = bucket
+        self.floor = floor
+        self.ceiling = max(floor, ceiling)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self._timer = timer
+        self._latency: Optional[float] = None
+        self._last_decrease = float("-inf")
+        self._set_rate(bucket.rate)
 
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
 
-class GlobalRateLimiter:
-    def __init__(self, rate_limit_ms: int = 20):
-        self.rate_limit_ms = rate_limit_ms
-        self.last_call: float = 0
-        self._lock = asyncio.Lock()
+    def record_response(self, status: int, latency: float):
+        """Registra l'esito di una chiamata upstream e aggiorna il rate."""
+        if status == 429:
+            self._cut("throttled")
+            return
+        if status >= 500:
+            # Gli errori del server sono gestiti da retry e circuit breaker
+            return
+        self._latency = latency if self._latency is None else (
+            0.8 * self._latency + 0.2 * latency
+        )
+        if self._latency > self.latency_target:
+            self._cut("latency")
+        else:
+            self._set_rate(self.rate + self.increase / self.rate)
+
+    def _cut(self, reason: str):
+        now = self._timer()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        previous = self.rate
+        self._set_rate(previous * self.decrease)
+        metrics.incr("upstream_rate_limit_decreases_total", reason=reason)
+        logger.info(
+            f"Rate verso l'API ridotto ({reason}): {previous:.2f} -> {self.rate:.2f} req/s"
+        )
+
+    def _set_rate(self, rate: float):
+        self.bucket.set_rate(min(self.ceiling, max(self.floor, rate)))
+        metrics.set_gauge("upstream_rate_limit_rps", self.rate)
+
+
+class UpstreamRateLimiter:
+    """
+    Rate limiter delle chiamate all'API Il Post.
+
+    Ogni chiamata preleva un token dal bucket globale e da quello della sua
+    famiglia di endpoint (catalogo, episodi, batch, BFF, login), cosi' un
+    tipo di chiamata non consuma tutta la capacita' degli altri.
+
+    Quando il bucket globale e' vuoto le chiamate si accodano per classe di
+    priorita' (:data:`PRIORITIES`) e ogni token che si libera va alla classe
+    piu' alta in attesa. Per non lasciare indietro all'infinito le classi
+    basse, una chiamata sale di una classe ogni ``aging`` secondi di attesa.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        families: Optional[Dict[str, Tuple[float, float]]] = None,
+        adaptive: Optional[Dict[str, float]] = None,
+        aging: float = 5.0,
+        store: Optional[BucketStore] = None,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self._timer = timer
+        self.aging = aging
+        # Con uno store condiviso (es. SQLiteBucketStore) i bucket valgono per
+        # tutti i processi che lo usano; il timer deve essere comune (time.time)
+        store = store or MemoryBucketStore()
+        self.global_bucket = TokenBucket(rate, burst, timer, store, key="global")
+        self.buckets = {
+            family: TokenBucket(family_rate, family_burst, timer, store, key=family)
+            for family, (family_rate, family_burst) in (families or {}).items()
+        }
+        # Con ``adaptive`` (parametri di AimdController) il rate globale si
+        # adatta alle risposte upstream invece di restare fisso
+        self.controller = (
+            AimdController(self.global_bucket, timer=timer, **adaptive)
+            if adaptive is not None else None
+        )
+        # Chiamate in attesa del bucket globale: (accodata alle, future)
+        self._queues: Dict[str, deque] = {priority: deque() for priority in PRIORITIES}
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def queue_depth(self, priority: str) -> int:
+        return len(self._queues[priority])
+
+    async def wait(self, family: str = "default", priority: Optional[str] = None):
+        """Attende il proprio turno per una chiamata della famiglia indicata."""
+        flight = _flight.get() if priority is None else None
+        priority = priority or current_priority()
+        started = self._timer()
+        if any(self._queues.values()) or self.global_bucket.try_acquire() > 0:
+            await self._enqueue(priority, flight)
+
+        bucket = self.buckets.get(family)
+        delay = bucket.reserve() if bucket is not None else 0.0
+        if delay > 0:
+            await asyncio.sleep(delay)
+        metrics.observe(
+            "upstream_rate_limit_wait_seconds",
+            self._timer() - started,
+            family=family,
+            priority=priority,
+        )
+
+    async def _enqueue(self, priority: str, flight: Optional[FlightPriority] = None):
+        loop = asyncio.get_running_loop()
+        entry = (self._timer(), loop.create_future())
+        self._queues[priority].append(entry)
+        self._export_depth(priority)
+        # Se la chiamata condivisa sale di priorita', l'attesa cambia coda
+        if flight is not None:
+            flight._queued.append((self, entry))
+        if (
+            self._dispatcher is None
+            or self._dispatcher.done()
+            or self._dispatcher.get_loop() is not loop
+        ):
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        try:
+            await entry[1]
+        except asyncio.CancelledError:
+            for queued_priority, queue in self._queues.items():
+                if entry in queue:
+                    queue.remove(entry)
+                    self._export_depth(queued_priority)
+            raise
+        finally:
+            if flight is not None:
+                flight._queued.remove((self, entry))
+
+    def _requeue(self, entry: tuple, previous: str, priority: str):
+        """Sposta un'attesa in un'altra coda, nell'ordine di arrivo."""
+        if entry not in self._queues[previous]:
+            return
+        self._queues[previous].remove(entry)
+        queue = self._queues[priority]
+        index = next((i for i, other in enumerate(queue) if other[0] > entry[0]), len(queue))
+        queue.insert(index, entry)
+        self._export_depth(previous)
+        self._export_depth(priority)
+
+    async def _dispatch(self):
+        """Assegna i token del bucket globale alle chiamate in coda, per priorita'."""
+        while any(self._queues.values()):
+            delay = self.global_bucket.try_acquire()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            # Il token e' gia' preso: va alla chiamata con priorita' piu' alta
+            # in attesa in questo momento
+            future = self._next_waiter()
+            if future is None:
+                break
+            future.set_result(None)
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        now = self._timer()
+        best = None
+        for rank, priority in enumerate(PRIORITIES):
+            queue = self._queues[priority]
+            while queue and queue[0][1].done():
+                queue.popleft()
+            if not queue:
+                continue
+            effective = rank - int((now - queue[0][0]) / self.aging) if self.aging > 0 else rank
+            if best is None or effective < best[0]:
+                best = (effective, priority)
+        if best is None:
+            return None
+        _, future = self._queues[best[1]].popleft()
+        self._export_depth(best[1])
+        return future
+
+    def _export_depth(self, priority: str):
+        metrics.set_gauge(
+            "upstream_rate_limit_queue_depth", len(self._queues[priority]), priority=priority
+        )
+
+    def record_response(self, status: int, latency: float):
+        """Segnala l'esito di una chiamata upstream al controllo adattivo."""
+        if self.controller is not None:
+            self.controller.record_response(status, latency)
+
+
+class InboundRateLimiter:
+    """
+    Limiti sulle richieste in ingresso, per ambito (token RSS, utente, IP).
+
+    Ogni ambito ha un token bucket per chiave con ``per_minute`` richieste al
+    minuto e ``burst``; un limite a 0 disattiva l'ambito. I bucket restano in
+    memoria (i piu' recenti ``maxsize`` per ambito).
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[float, float]],
+        maxsize: int = 10000,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self.buckets = {
+            scope: (per_minute / 60.0, max(1.0, burst), MemoryBucketStore(maxsize))
+            for scope, (per_minute, burst) in limits.items()
+            if per_minute > 0
+        }
+        self._timer = timer
+
+    def check(self, **keys: Optional[str]) -> float:
+        """
+        Conta una richiesta per ogni ``ambito=chiave``; restituisce 0 se e'
+        ammessa, altrimenti i secondi dopo cui riprovare.
+        """
+        now = self._timer()
+        retry_after = 0.0
+        for scope, key in keys.items():
+            if key is None or scope not in self.buckets:
+                continue
+            rate, burst, store = self.buckets[scope]
+            delay = store.take(key, rate, burst, now, debt=False)
+            if delay > 0:
+                metrics.incr("inbound_rate_limited_total", scope=scope)
+                retry_after = max(retry_after, delay)
+        return retry_after
+
+
+class ConcurrencyLimiter:
+    """Numero massimo di operazioni in corso; oltre il limite si scarta il carico."""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.in_flight = 0
+
+    def try_acquire(self) -> bool:
+        if self.limit > 0 and self.in_flight >= self.limit:
+            metrics.incr("load_shed_total", limiter=self.name)
+            return False
+        self.in_flight += 1
+        metrics.set_gauge("in_flight", self.in_flight, limiter=self.name)
+        return True
 
-    async def wait(self):
-        """Attende il tempo necessario per rispettare il rate limit."""
-        async with self._lock:
-            current_time = time.time() * 1000  # Converti in millisecondi
-            time_since_last_call = current_time - self.last_call
+    def release(self):
+        self.in_flight = max(0, self.in_flight - 1)
+        metrics.set_gauge("in_flight", self.in_flight, limiter=self.name)
 
-            if time_since_last_call < self.rate_limit_ms:
-                wait_time = (
-                    self.rate_limit_ms - time_since_last_call
-                ) / 1000  # Converti in secondi
-                await asyncio.sleep(wait_time)
 
-            self.last_call = time.time() * 1000
+def parse_family_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    """Interpreta ``famiglia=rate/burst,...`` (es. ``login=0.1/2,bff=1/3``)."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            family, values = item.split("=", 1)
+            rate, _, burst = values.partition("/")
+            limits[family.strip()] = (float(rate), float(burst or 1))
+        except ValueError:
+            raise ValueError(f"Limite non valido per famiglia di endpoint: {item!r}")
+    return limits
 
 
 # Istanza globale del rate limiter per le chiamate API
-api_rate_limiter = GlobalRateLimiter(rate_limit_ms=100)
+api_rate_limiter = UpstreamRateLimiter(
+    rate=UPSTREAM_RATE_LIMIT,
+    burst=UPSTREAM_RATE_BURST,
+    families={**UPSTREAM_FAMILY_LIMITS, **parse_family_limits(UPSTREAM_RATE_FAMILY_LIMITS)},
+    adaptive=dict(
+        floor=UPSTREAM_RATE_FLOOR,
+        ceiling=UPSTREAM_RATE_CEILING,
+        increase=UPSTREAM_RATE_INCREASE,
+        decrease=UPSTREAM_RATE_DECREASE,
+        latency_target=UPSTREAM_RATE_LATENCY_TARGET,
+    ) if UPSTREAM_RATE_ADAPTIVE else None,
+    aging=UPSTREAM_PRIORITY_AGING,
+    store=build_bucket_store(UPSTREAM_RATE_BACKEND, UPSTREAM_RATE_STORE_PATH),
+    timer=time.monotonic if UPSTREAM_RATE_BACKEND == "memory" else time.time,
+)
 
-# Istanza globale del rate limiter per il rate limiting generale
-rate_limiter = RateLimiter()
+# Limiti sulle richieste in ingresso ai feed RSS
+inbound_rate_limiter = InboundRateLimiter({
+    "token": (INBOUND_TOKEN_RATE_PER_MINUTE, INBOUND_BURST),
+    "user": (INBOUND_USER_RATE_PER_MINUTE, INBOUND_BURST),
+    "ip": (INBOUND_IP_RATE_PER_MINUTE, INBOUND_IP_BURST),
+})
+feed_render_limiter = ConcurrencyLimiter("feed_renders", FEED_MAX_INFLIGHT_RENDERS)
@@ -0,0 +1,114 @@
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import httpx
+
+from config import (
+    UPSTREAM_RETRY_MAX_RETRIES,
+    UPSTREAM_RETRY_BASE_DELAY,
+    UPSTREAM_RETRY_MAX_DELAY,
+    UPSTREAM_RETRY_BUDGET_RATIO,
+    UPSTREAM_RETRY_BUDGET_MAX,
+)
+from utils import metrics
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Interpreta un header Retry-After (secondi o data HTTP) in secondi."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryBudget:
+    """
+    Budget di retry condiviso da tutto il processo.
+
+    Ogni richiesta deposita ``ratio`` token (fino a ``max_tokens``) e ogni retry
+    ne consuma uno: i retry restano una frazione del traffico e non possono
+    trasformarsi in una tempesta quando l'upstream fallisce per tutti.
+    """
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def record_request(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+        metrics.set_gauge("upstream_retry_budget_tokens", self.tokens)
+
+    def try_spend(self) -> bool:
+        if self.tokens < 1:
+            metrics.incr("upstream_retry_budget_exhausted_total")
+            return False
+        self.tokens -= 1
+        metrics.set_gauge("upstream_retry_budget_tokens", self.tokens)
+        return True
+
+
+class RetryPolicy:
+    """Backoff esponenziale con full jitter per errori upstream transitori."""
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        budget: Optional[RetryBudget] = None,
+        retryable_statuses: frozenset = RETRYABLE_STATUSES,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+        self.retryable_statuses = retryable_statuses
+
+    def is_retryable_status(self, status_code: int) -> bool:
+        return status_code in self.retryable_statuses
+
+    @staticmethod
+    def is_retryable_error(error: Exception) -> bool:
+        """Timeout ed errori di rete: la richiesta (GET) puo' essere ripetuta."""
+        return isinstance(error, (httpx.TimeoutException, httpx.NetworkError))
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Attesa prima del retry numero ``attempt`` (da 0), rispettando Retry-After."""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def should_retry(self, attempt: int, reason: str) -> bool:
+        """Decide se ritentare e registra la decisione nelle metriche."""
+        if attempt >= self.max_retries:
+            metrics.incr("upstream_retries_exhausted_total", reason=reason)
+            return False
+        if not self.budget.try_spend():
+            return False
+        metrics.incr("upstream_retries_total", reason=reason)
+        return True
+
+
+# Istanza globale della policy di retry per le chiamate API
+upstream_retry_policy = RetryPolicy(
+    max_retries=UPSTREAM_RETRY_MAX_RETRIES,
+    base_delay=UPSTREAM_RETRY_BASE_DELAY,
+    max_delay=UPSTREAM_RETRY_MAX_DELAY,
+    budget=RetryBudget(
+        ratio=UPSTREAM_RETRY_BUDGET_RATIO, max_tokens=UPSTREAM_RETRY_BUDGET_MAX
+    ),
+)
@@ -0,0 +1,49 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from utils import metrics
+from utils.rate_limiter import FlightPriority, current_priority
+
+
+class SingleFlight:
+    """
+    Coalesce chiamate concorrenti con la stessa chiave.
+
+    La prima chiamata esegue ``fn`` in un task separato; le chiamate che arrivano
+    mentre e' in corso attendono lo stesso task e ricevono il suo risultato (o la
+    sua eccezione). La cancellazione di un chiamante non interrompe il task.
+    Il task gira con la priorita' upstream piu' alta tra i chiamanti in attesa.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._priorities: Dict[Hashable, FlightPriority] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is not None:
+            metrics.incr("singleflight_deduplicated_total", group=self.name)
+            self._priorities[key].join()
+            return await asyncio.shield(task)
+
+        metrics.incr("singleflight_executions_total", group=self.name)
+        flight = FlightPriority(current_priority())
+        flight.join()
+        task = asyncio.ensure_future(flight.run(fn))
+        self._calls[key] = task
+        self._priorities[key] = flight
+        task.add_done_callback(lambda t: self._forget(key, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            del self._priorities[key]
+        # Evita il warning "exception was never retrieved" se tutti i chiamanti
+        # sono stati cancellati prima della fine del task
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,236 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from cachetools import LRUCache
+
+from utils import metrics
+from utils.disk_cache import DiskCache
+from utils.logging import get_logger
+from utils.rate_limiter import BACKGROUND, upstream_priority
+
+logger = get_logger(__name__)
+
+Fetcher = Callable[[], Awaitable[Any]]
+
+# Cache con copia su disco, ricaricate all'avvio da restore_persistent_caches()
+_persistent_caches: List["SWRCache"] = []
+
+# Intervallo minimo tra due registrazioni su disco delle voci servite
+_TOUCH_INTERVAL = 60.0
+
+
+class SWRCache:
+    """
+    Cache con semantica stale-while-revalidate e stale-if-error.
+
+    - entro ``ttl`` il valore e' fresco e viene restituito direttamente;
+    - entro ``ttl + grace`` il valore scaduto viene restituito subito e un solo
+      task in background lo aggiorna;
+    - oltre, il chiamante attende il nuovo valore; se il recupero fallisce e il
+      valore ha meno di ``ttl + stale_if_error`` secondi viene servito quello
+      vecchio invece dell'errore.
+
+    Con ``store`` ogni valore scritto viene copiato anche su disco (serializzato
+    e scritto in un thread, senza bloccare l'event loop) e puo' essere
+    ricaricato con :meth:`restore`; le voci servite vengono registrate sullo
+    store a gruppi, per rimuovere dal disco quelle usate meno di recente. I
+    valori in cache sono condivisi con i chiamanti: non vanno modificati.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        ttl: float,
+        grace: float = 0,
+        stale_if_error: float = 0,
+        timer: Callable[[], float] = time.monotonic,
+        store: Optional[DiskCache] = None,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.grace = grace
+        self.stale_if_error = stale_if_error
+        self._timer = timer
+        self._entries: LRUCache = LRUCache(maxsize=maxsize)
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+        self._store = store
+        self._pending_writes: Set[asyncio.Future] = set()
+        self._touched: Set[str] = set()
+        self._touched_at = time.monotonic()
+        if store is not None:
+            _persistent_caches.append(self)
+
+    # --- Interfaccia mapping (compatibile con TTLCache) ---
+
+    def _entry(self, key: Hashable, max_age: float) -> Optional[Tuple[Any, float]]:
+        entry = self._entries.get(key)
+        if entry is None or self._timer() - entry[1] >= max_age:
+            return None
+        self._touch(key)
+        return entry
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._entry(key, self.ttl) is not None
+
+    def __getitem__(self, key: Hashable) -> Any:
+        entry = self._entry(key, self.ttl)
+        if entry is None:
+            raise KeyError(key)
+        return entry[0]
+
+    def __setitem__(self, key: Hashable, value: Any):
+        self._entries[key] = (value, self._timer())
+        if self._store is not None:
+            self._persist(str(key), value)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entry(key, self.ttl)
+        return default if entry is None else entry[0]
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.pop(key, None)
+        if self._store is not None:
+            self._run_store(self._store.delete, self.name, str(key))
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        self._entries.clear()
+        if self._store is not None:
+            self._run_store(self._store.clear, self.name)
+
+    # --- Persistenza su disco ---
+
+    def _run_store(self, fn: Callable, *args):
+        """Esegue un'operazione sullo store in un thread se c'e' un event loop."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            fn(*args)
+            return
+        future = loop.run_in_executor(self._store.executor, fn, *args)
+        self._pending_writes.add(future)
+        future.add_done_callback(self._write_done)
+
+    def _write_done(self, future: asyncio.Future):
+        self._pending_writes.discard(future)
+        if not future.cancelled() and future.exception():
+            logger.warning(f"Scrittura cache su disco {self.name} fallita: {future.exception()}")
+
+    def _persist(self, key: str, value: Any):
+        self._run_store(self._write_entry, key, value, time.time())
+
+    def _write_entry(self, key: str, value: Any, fetched_at: float):
+        """Serializza e salva un valore (nel thread dello store)."""
+        try:
+            payload = self._store.encode(value)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Valore non serializzabile per la cache {self.name} ({key}): {e}")
+            return
+        self._store.put(self.name, key, payload, fetched_at)
+
+    def _touch(self, key: Hashable):
+        """Registra una voce servita; le registrazioni vanno su disco a gruppi."""
+        if self._store is None:
+            return
+        self._touched.add(str(key))
+        if time.monotonic() - self._touched_at >= _TOUCH_INTERVAL:
+            self._flush_touched()
+
+    def _flush_touched(self):
+        self._touched_at = time.monotonic()
+        if self._touched:
+            keys, self._touched = list(self._touched), set()
+            self._run_store(self._store.touch, self.name, keys, time.time())
+
+    async def flush(self):
+        """Attende il completamento delle scritture su disco in corso."""
+        if self._store is not None:
+            self._flush_touched()
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+
+    async def restore(self) -> int:
+        """Ricarica dal disco le voci ancora utilizzabili, mantenendone l'eta'."""
+        if self._store is None:
+            return 0
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(self._store.executor, self._store.load, self.name)
+        now_wall, now = time.time(), self._timer()
+        max_age = self.ttl + max(self.grace, self.stale_if_error)
+        restored = 0
+        for key, value, fetched_at in rows:
+            age = max(0.0, now_wall - fetched_at)
+            if age < max_age:
+                self._entries[key] = (value, now - age)
+                restored += 1
+        metrics.incr("disk_cache_restored_total", restored, cache=self.name)
+        return restored
+
+    # --- Stale-while-revalidate ---
+
+    async def get_or_fetch(self, key: Hashable, fetch: Fetcher) -> Any:
+        """Restituisce il valore in cache, aggiornandolo con ``fetch`` se serve."""
+        entry = self._entries.get(key)
+        age = self._timer() - entry[1] if entry else None
+
+        if entry and age < self.ttl:
+            metrics.incr("api_cache_requests_total", cache=self.name, result="hit")
+            self._touch(key)
+            return entry[0]
+
+        if entry and age < self.ttl + self.grace:
+            metrics.incr("api_cache_requests_total", cache=self.name, result="stale")
+            self._touch(key)
+            self._schedule_refresh(key, fetch)
+            return entry[0]
+
+        metrics.incr("api_cache_requests_total", cache=self.name, result="miss")
+        try:
+            value = await fetch()
+        except Exception as e:
+            if entry and age < self.ttl + self.stale_if_error:
+                logger.warning(
+                    f"Errore aggiornamento cache {self.name} ({key}), "
+                    f"servo il valore precedente: {e}"
+                )
+                metrics.incr(
+                    "api_cache_requests_total", cache=self.name, result="stale_if_error"
+                )
+                return entry[0]
+            raise
+        self[key] = value
+        return value
+
+    def _schedule_refresh(self, key: Hashable, fetch: Fetcher):
+        if key in self._refreshing:
+            return
+        task = asyncio.ensure_future(self._refresh(key, fetch))
+        self._refreshing[key] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+
+    async def _refresh(self, key: Hashable, fetch: Fetcher):
+        try:
+            # Nessuno attende questo valore: le chiamate upstream cedono il
+            # passo a quelle delle richieste in corso
+            with upstream_priority(BACKGROUND):
+                self[key] = await fetch()
+            metrics.incr("api_cache_refreshes_total", cache=self.name, result="ok")
+        except Exception as e:
+            logger.warning(f"Aggiornamento in background cache {self.name} ({key}) fallito: {e}")
+            metrics.incr("api_cache_refreshes_total", cache=self.name, result="error")
+
+
+async def restore_persistent_caches() -> int:
+    """Ricarica dal disco tutte le cache persistenti (chiamata all'avvio)."""
+    restored = 0
+    for cache in _persistent_caches:
+        try:
+            restored += await cache.restore()
+        except Exception as e:
+            logger.error(f"Errore ripristino cache {cache.name} da disco: {e}")
+    return restored
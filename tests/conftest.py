@@ -7,6 +7,10 @@ os.environ.setdefault("EMAIL", "test@test.com")
 os.environ.setdefault("PASSWORD", "testpassword")
 os.environ.setdefault("SECRET_KEY", "test-secret-key-for-testing-only")
 os.environ.setdefault("BASE_URL", "http://testserver")
+# Nessun limite sulle richieste in ingresso: i test li attivano esplicitamente
+os.environ.setdefault("INBOUND_TOKEN_RATE_PER_MINUTE", "0")
+os.environ.setdefault("INBOUND_USER_RATE_PER_MINUTE", "0")
+os.environ.setdefault("INBOUND_IP_RATE_PER_MINUTE", "0")
 
 # Use a temp dir for DB so each test session gets a fresh one
 _test_db_dir = tempfile.mkdtemp(prefix="ilpostapi_test_")
@@ -27,6 +31,12 @@ from database.database import engine, AsyncSessionLocal, init_db
 from database.models import Base
 from database.user_operations import create_user
 
+# Test legati a SQLite (PRAGMA, piani di esecuzione, FTS5): saltati quando la
+# suite gira su PostgreSQL con DATABASE_URL
+requires_sqlite = pytest.mark.skipif(
+    engine.dialect.name != "sqlite", reason="richiede il backend SQLite"
+)
+
 
 @pytest.fixture(scope="session")
 def event_loop():
@@ -0,0 +1,551 @@
+"""Test del client API upstream con un'API Il Post simulata (httpx.MockTransport)."""
+import asyncio
+
+import httpx
+import pytest
+from unittest.mock import patch, AsyncMock
+
+import api_client
+from utils import metrics
+from utils.circuit_breaker import CircuitBreaker
+from utils.retry import RetryBudget, RetryPolicy
+
+
+def _make_episodes(total: int) -> list[dict]:
+    return [{"id": i, "title": f"Ep {i}"} for i in range(total, 0, -1)]
+
+
+class StubUpstream:
+    """API episodi simulata: pagina gli episodi e registra le richieste."""
+
+    def __init__(self, total: int, latency: float = 0.0, fail_pages: dict | None = None,
+                 etag: str | None = None):
+        self.episodes = _make_episodes(total)
+        self.latency = latency
+        self.fail_pages = dict(fail_pages or {})
+        self.etag = etag
+        self.requests: list[httpx.Request] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            page = int(request.url.params.get("pg", 1))
+            hits = int(request.url.params.get("hits", 1))
+            if self.fail_pages.get(page, 0) > 0:
+                self.fail_pages[page] -= 1
+                return httpx.Response(502, json={"error": "bad gateway"})
+            headers = {"ETag": self.etag} if self.etag else {}
+            if self.etag and request.headers.get("if-none-match") == self.etag:
+                return httpx.Response(304, headers=headers)
+            chunk = self.episodes[(page - 1) * hits: page * hits]
+            return httpx.Response(200, headers=headers, json={
+                "head": {"data": {"total": len(self.episodes), "pg": page, "hits": hits}},
+                "data": chunk,
+            })
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture
+def upstream():
+    """Installa un client httpx con transport simulato e disattiva auth e rate limit."""
+    stubs = []
+
+    def _install(stub: StubUpstream) -> StubUpstream:
+        api_client._async_client = httpx.AsyncClient(
+            transport=httpx.MockTransport(stub.handler)
+        )
+        stubs.append(stub)
+        return stub
+
+    fast_retries = RetryPolicy(max_retries=2, base_delay=0, max_delay=0,
+                               budget=RetryBudget(max_tokens=1000))
+    with patch("api_client.get_auth_headers", return_value={}), \
+         patch("api_client.api_rate_limiter.wait", new=AsyncMock()), \
+         patch("api_client.upstream_retry_policy", fast_retries), \
+         patch("api_client.upstream_breaker", CircuitBreaker("test")):
+        api_client.clear_all_caches()
+        yield _install
+    api_client._async_client = None
+    api_client.clear_all_caches()
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestFetchAllEpisodes:
+    """Test del recupero concorrente delle pagine di episodi."""
+
+    async def test_single_page_uses_one_request(self, upstream):
+        """Se gli episodi stanno in una pagina non serve alcuna richiesta di probe."""
+        stub = upstream(StubUpstream(total=120))
+
+        result = await api_client.fetch_all_episodes(1, batch_size=500)
+
+        assert len(result["data"]) == 120
+        assert len(stub.requests) == 1
+        assert stub.requests[0].url.params["hits"] == "500"
+
+    async def test_pages_reassembled_in_order(self, upstream):
+        """Le pagine scaricate in parallelo mantengono l'ordine dell'API."""
+        stub = upstream(StubUpstream(total=1050, latency=0.01))
+
+        result = await api_client.fetch_all_episodes(2, batch_size=100, concurrency=4)
+
+        assert [ep["id"] for ep in result["data"]] == [ep["id"] for ep in stub.episodes]
+        assert len(stub.requests) == 11
+
+    async def test_concurrency_cap_respected(self, upstream):
+        """Non devono esserci piu' di ``concurrency`` pagine in volo insieme."""
+        stub = upstream(StubUpstream(total=1000, latency=0.02))
+
+        await api_client.fetch_all_episodes(3, batch_size=100, concurrency=3)
+
+        assert stub.max_in_flight <= 3
+        assert stub.max_in_flight > 1
+
+    async def test_failed_page_is_retried(self, upstream):
+        """Una pagina che fallisce una volta viene riprovata e non va persa."""
+        stub = upstream(StubUpstream(total=300, fail_pages={2: 1}))
+
+        with patch("api_client.asyncio.sleep", new=AsyncMock()):
+            result = await api_client.fetch_all_episodes(4, batch_size=100)
+
+        assert len(result["data"]) == 300
+        pages = [r.url.params["pg"] for r in stub.requests]
+        assert pages.count("2") == 2
+
+    async def test_failing_page_is_retried_only_by_the_policy(self, upstream):
+        """Una pagina sempre in errore costa solo i tentativi della policy (1 + 2)."""
+        stub = upstream(StubUpstream(total=1000, fail_pages={2: 100}))
+
+        result = await api_client.fetch_all_episodes(14, batch_size=100)
+
+        assert len(result["data"]) == 900
+        pages = [r.url.params["pg"] for r in stub.requests]
+        assert pages.count("2") == 3
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestSingleFlight:
+    """Test del coalescing delle chiamate upstream concorrenti."""
+
+    async def test_concurrent_fetch_all_episodes_coalesced(self, upstream):
+        """N richieste concorrenti per lo stesso podcast fanno un solo download."""
+        stub = upstream(StubUpstream(total=50, latency=0.05))
+        before = metrics.get_counter("singleflight_deduplicated_total", group="all_episodes")
+
+        results = await asyncio.gather(
+            *(api_client.fetch_all_episodes(5) for _ in range(10))
+        )
+
+        assert len(stub.requests) == 1
+        assert all(len(r["data"]) == 50 for r in results)
+        after = metrics.get_counter("singleflight_deduplicated_total", group="all_episodes")
+        assert after - before == 9
+
+    async def test_concurrent_requests_same_url_coalesced(self, upstream):
+        """make_api_request unisce le chiamate allo stesso URL."""
+        stub = upstream(StubUpstream(total=5, latency=0.05))
+        url = f"{api_client.PODCAST_API_BASE_URL}/6/?pg=1&hits=5"
+
+        results = await asyncio.gather(
+            *(api_client.make_api_request(url) for _ in range(5))
+        )
+
+        assert len(stub.requests) == 1
+        assert all(r is results[0] for r in results)
+
+    async def test_error_propagated_to_all_waiters(self, upstream):
+        """Se la chiamata condivisa fallisce, ogni chiamante riceve l'errore."""
+        stub = upstream(StubUpstream(total=5, latency=0.05, fail_pages={1: 100}))
+        url = f"{api_client.PODCAST_API_BASE_URL}/7/?pg=1&hits=5"
+
+        results = await asyncio.gather(
+            *(api_client.make_api_request(url) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+        # Una sola chiamata condivisa (piu' i suoi retry), non una per chiamante
+        assert len(stub.requests) == 1 + api_client.upstream_retry_policy.max_retries
+        assert all(isinstance(r, api_client.HTTPException) for r in results)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestAsyncClientFactory:
+    """Test della configurazione del client HTTP condiviso."""
+
+    async def test_explicit_limits_and_timeouts(self):
+        """Il client usa pool e timeout espliciti, separati per fase."""
+        client = api_client.build_async_client(http2=False)
+        try:
+            assert client.timeout.connect == api_client.UPSTREAM_CONNECT_TIMEOUT
+            assert client.timeout.read == api_client.UPSTREAM_READ_TIMEOUT
+            assert client.timeout.pool == api_client.UPSTREAM_POOL_TIMEOUT
+            assert "gzip" in client.headers["accept-encoding"]
+        finally:
+            await client.aclose()
+
+    async def test_http2_reaches_the_client(self):
+        """Con h2 installato (httpx[http2]) il client viene creato con HTTP/2 attivo."""
+        with patch("httpx.AsyncClient", wraps=httpx.AsyncClient) as factory:
+            client = api_client.build_async_client(http2=True)
+        await client.aclose()
+        assert factory.call_args.kwargs["http2"] is True
+
+    async def test_compressed_encodings_are_advertised(self):
+        """brotli e zstandard (httpx[brotli,zstd]) abilitano br e zstd in Accept-Encoding."""
+        client = api_client.build_async_client(http2=False)
+        try:
+            encodings = client.headers["accept-encoding"].split(", ")
+            assert {"gzip", "br", "zstd"} <= set(encodings)
+        finally:
+            await client.aclose()
+
+    async def test_http2_falls_back_without_h2(self):
+        """Senza il pacchetto h2 il client ripiega su HTTP/1.1 invece di fallire."""
+        with patch("api_client._module_available", return_value=False), \
+                patch("httpx.AsyncClient", wraps=httpx.AsyncClient) as factory:
+            client = api_client.build_async_client(http2=True)
+        await client.aclose()
+        assert factory.call_args.kwargs["http2"] is False
+
+    async def test_warm_up_opens_connection(self, upstream):
+        """Il pre-riscaldamento fa una richiesta verso l'host upstream."""
+        stub = upstream(StubUpstream(total=1))
+
+        assert await api_client.warm_up_client() is True
+        assert stub.requests[0].method == "HEAD"
+        assert stub.requests[0].url.host == "api-prod.ilpost.it"
+
+    async def test_warm_up_failure_is_not_fatal(self):
+        """Un errore di rete durante il pre-riscaldamento non blocca l'avvio."""
+        def _fail(request):
+            raise httpx.ConnectError("down", request=request)
+
+        api_client._async_client = httpx.AsyncClient(transport=httpx.MockTransport(_fail))
+        try:
+            assert await api_client.warm_up_client() is False
+        finally:
+            api_client._async_client = None
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestConditionalRevalidation:
+    """Test delle richieste condizionali verso l'API upstream."""
+
+    async def test_revalidation_sends_if_none_match(self, upstream):
+        """Dopo la scadenza della cache si invia l'ETag salvato e si riusa il body su 304."""
+        stub = upstream(StubUpstream(total=250, etag='"v1"'))
+        before = metrics.get_counter("upstream_not_modified_total")
+
+        first = await api_client.fetch_all_episodes(8, batch_size=100)
+        api_client.commit_validators(first)
+        api_client.clear_episodes_cache(8)
+        second = await api_client.fetch_all_episodes(8, batch_size=100)
+
+        assert not api_client.is_not_modified(first)
+        assert api_client.is_not_modified(second)
+        assert "not_modified" not in second
+        assert second["data"] == first["data"]
+        revalidations = stub.requests[3:]
+        assert len(revalidations) == 3
+        assert all(r.headers["if-none-match"] == '"v1"' for r in revalidations)
+        assert metrics.get_counter("upstream_not_modified_total") - before == 3
+
+    async def test_unsaved_refresh_does_not_validate_the_next_sync(self, upstream):
+        """Un aggiornamento in background non salvato nel DB non produce 304 dopo."""
+        stub = upstream(StubUpstream(total=10, etag='"v1"'))
+        cache = api_client._episodes_list_cache
+        stale = cache.ttl + 1
+        with patch.object(cache, "_timer", side_effect=lambda: 0.0):
+            await api_client.fetch_all_episodes(15)
+        # Voce scaduta ma nella finestra di grazia: parte l'aggiornamento in background
+        with patch.object(cache, "_timer", side_effect=lambda: stale), \
+             patch.object(cache, "grace", stale):
+            await api_client.fetch_all_episodes(15)
+            await asyncio.gather(*cache._refreshing.values())
+        assert len(stub.requests) == 2
+
+        api_client.clear_episodes_cache(15)
+        synced = await api_client.fetch_all_episodes(15)
+
+        assert not api_client.is_not_modified(synced)
+        assert len(synced["data"]) == 10
+        assert "if-none-match" not in stub.requests[-1].headers
+
+        api_client.commit_validators(synced)
+        api_client.clear_episodes_cache(15)
+        assert api_client.is_not_modified(await api_client.fetch_all_episodes(15))
+
+    async def test_changed_content_is_not_flagged(self, upstream):
+        """Se l'ETag cambia la risposta completa non e' marcata come non modificata."""
+        stub = upstream(StubUpstream(total=10, etag='"v1"'))
+
+        await api_client.fetch_all_episodes(9)
+        api_client.clear_episodes_cache(9)
+        stub.etag = '"v2"'
+        result = await api_client.fetch_all_episodes(9)
+
+        assert not api_client.is_not_modified(result)
+        assert len(result["data"]) == 10
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestUpstreamRetries:
+    """Test della policy di retry in make_api_request."""
+
+    URL = f"{api_client.PODCAST_API_BASE_URL}/11/?pg=1&hits=5"
+
+    async def test_transient_5xx_is_retried(self, upstream):
+        stub = upstream(StubUpstream(total=5, fail_pages={1: 2}))
+
+        data = await api_client.make_api_request(self.URL)
+
+        assert len(data["data"]) == 5
+        assert len(stub.requests) == 3
+
+    async def test_retry_after_is_honoured(self, upstream):
+        """Su 429 si attende quanto indicato da Retry-After."""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(429, headers={"Retry-After": "7"})
+            return httpx.Response(200, json={"data": []})
+
+        api_client._async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        api_client.upstream_retry_policy.max_delay = 60
+        with patch("api_client.asyncio.sleep", new=AsyncMock()) as sleep:
+            await api_client.make_api_request(self.URL)
+
+        sleep.assert_awaited_once_with(7.0)
+
+    async def test_timeout_is_retried(self, upstream):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                raise httpx.ReadTimeout("timeout", request=request)
+            return httpx.Response(200, json={"data": []})
+
+        api_client._async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        await api_client.make_api_request(self.URL)
+
+        assert len(calls) == 2
+
+    async def test_exhausted_budget_stops_retries(self, upstream):
+        """Senza budget disponibile l'errore arriva subito, senza retry."""
+        stub = upstream(StubUpstream(total=5, fail_pages={1: 100}))
+        api_client.upstream_retry_policy.budget = RetryBudget(ratio=0, max_tokens=0)
+
+        with pytest.raises(api_client.HTTPException):
+            await api_client.make_api_request(self.URL)
+
+        assert len(stub.requests) == 1
+
+    async def test_429_after_retries_maps_to_429(self, upstream):
+        def handler(request):
+            return httpx.Response(429)
+
+        api_client._async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with pytest.raises(api_client.HTTPException) as exc:
+            await api_client.make_api_request(self.URL)
+
+        assert exc.value.status_code == 429
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestUpstreamCircuitBreaker:
+    """Test del circuit breaker attorno alle chiamate upstream."""
+
+    URL = f"{api_client.PODCAST_API_BASE_URL}/12/?pg=1&hits=5"
+
+    async def test_open_circuit_skips_upstream(self, upstream):
+        """Con il circuito aperto si risponde 503 senza contattare l'API."""
+        stub = upstream(StubUpstream(total=5, fail_pages={1: 100}))
+        api_client.upstream_breaker.min_calls = 3
+
+        with pytest.raises(api_client.HTTPException):
+            await api_client.make_api_request(self.URL)
+        assert api_client.upstream_breaker.state == "open"
+        sent = len(stub.requests)
+
+        with pytest.raises(api_client.UpstreamUnavailableError) as exc:
+            await api_client.make_api_request(self.URL)
+        assert exc.value.status_code == 503
+        assert "Retry-After" in exc.value.headers
+        assert len(stub.requests) == sent
+
+    async def test_open_circuit_stops_page_retries(self, upstream):
+        stub = upstream(StubUpstream(total=5))
+        api_client.upstream_breaker.record_failure()
+        api_client.upstream_breaker._open()
+
+        with pytest.raises(api_client.UpstreamUnavailableError):
+            await api_client.fetch_all_episodes(12, batch_size=5)
+        assert stub.requests == []
+
+    async def test_client_errors_do_not_open_circuit(self, upstream):
+        def handler(request):
+            return httpx.Response(404)
+
+        api_client._async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        api_client.upstream_breaker.min_calls = 1
+        with pytest.raises(api_client.HTTPException):
+            await api_client.make_api_request(self.URL)
+        assert api_client.upstream_breaker.state == "closed"
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestCompactDecoding:
+    """Test della riduzione degli episodi ai campi salvati nel DB."""
+
+    URL = f"{api_client.PODCAST_API_BASE_URL}/13/?pg=1&hits=200"
+
+    @staticmethod
+    def _install_large_upstream(count: int = 200):
+        episodes = [
+            {
+                "id": i, "title": f"Ep {i}", "milliseconds": 1000,
+                "transcript": "x" * 500, "chapters": [{"t": 0}],
+                "parent": {"id": 13, "title": "Show", "stats": {"plays": 1}},
+            }
+            for i in range(count)
+        ]
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, json={"head": {"data": {"total": count}}, "data": episodes})
+
+        api_client._async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return calls
+
+    @pytest.mark.parametrize("threshold", [0, 10**9])
+    async def test_compact_keeps_persisted_fields(self, upstream, threshold):
+        """Stesso risultato con decodifica incrementale e in un colpo solo."""
+        self._install_large_upstream()
+        with patch("api_client.UPSTREAM_JSON_INCREMENTAL_MIN_BYTES", threshold):
+            data = await api_client.make_api_request(self.URL, compact=True)
+
+        assert len(data["data"]) == 200
+        assert data["data"][0] == {
+            "id": 0, "title": "Ep 0", "milliseconds": 1000,
+            "parent": {"id": 13, "title": "Show"},
+        }
+        assert data["head"]["data"]["total"] == 200
+
+    async def test_full_response_not_shared_with_compact(self, upstream):
+        calls = self._install_large_upstream(count=5)
+
+        compact, full = await asyncio.gather(
+            api_client.make_api_request(self.URL, compact=True),
+            api_client.make_api_request(self.URL),
+        )
+
+        assert len(calls) == 2
+        assert "transcript" not in compact["data"][0]
+        assert "transcript" in full["data"][0]
+
+    async def test_fetch_all_episodes_is_compact(self, upstream):
+        self._install_large_upstream(count=5)
+        result = await api_client.fetch_all_episodes(13, batch_size=500)
+        assert "transcript" not in result["data"][0]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestFetchNewEpisodes:
+    """Test della sincronizzazione incrementale dal piu' recente."""
+
+    async def test_stops_at_first_fully_known_page(self, upstream):
+        stub = upstream(StubUpstream(total=100))
+
+        # Episodi dal 100 al 1: sono nuovi solo quelli sopra l'85
+        result = await api_client.fetch_new_episodes(
+            21, is_known=lambda ep: ep["id"] <= 85, page_size=10
+        )
+
+        assert [ep["id"] for ep in result["data"]] == list(range(100, 85, -1))
+        assert [r.url.params["pg"] for r in stub.requests] == ["1", "2", "3"]
+
+    async def test_stops_at_last_page(self, upstream):
+        stub = upstream(StubUpstream(total=15))
+
+        result = await api_client.fetch_new_episodes(
+            22, is_known=lambda ep: False, page_size=10
+        )
+
+        assert len(result["data"]) == 15
+        assert len(stub.requests) == 2
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestAuthFailureReplay:
+    """Test del rinnovo del token e della ripetizione su 401/403."""
+
+    URL = f"{api_client.PODCAST_API_BASE_URL}/14/?pg=1&hits=5"
+
+    @staticmethod
+    def _install(accepted: set, calls: list):
+        """Upstream che accetta solo i token in ``accepted``."""
+        def handler(request):
+            calls.append(request.headers.get("Token"))
+            if request.headers.get("Token") not in accepted:
+                return httpx.Response(401)
+            return httpx.Response(200, json={"data": []})
+
+        api_client._async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    @staticmethod
+    def _manager(logins: list):
+        from auth import TokenManager
+
+        async def login():
+            logins.append(1)
+            await asyncio.sleep(0.01)
+            return f"nuovo-{len(logins)}"
+
+        return TokenManager(login, default_ttl=3600)
+
+    async def test_rejected_token_refreshed_and_replayed(self, upstream):
+        calls, logins = [], []
+        self._install({"nuovo-1"}, calls)
+        before = metrics.get_counter("upstream_auth_failures_total", status=401)
+
+        with patch("api_client.token_manager", self._manager(logins)):
+            data = await api_client.make_api_request(self.URL, headers={"Token": "revocato"})
+
+        assert data == {"data": []}
+        assert calls == ["revocato", "nuovo-1"]
+        assert len(logins) == 1
+        assert metrics.get_counter("upstream_auth_failures_total", status=401) == before + 1
+
+    async def test_concurrent_rejections_share_one_refresh(self, upstream):
+        calls, logins = [], []
+        self._install({"nuovo-1"}, calls)
+
+        with patch("api_client.token_manager", self._manager(logins)):
+            results = await asyncio.gather(*(
+                api_client.make_api_request(f"{self.URL}&n={i}", headers={"Token": "revocato"})
+                for i in range(5)
+            ))
+
+        assert all(r == {"data": []} for r in results)
+        assert len(logins) == 1
+
+    async def test_replayed_only_once(self, upstream):
+        calls, logins = [], []
+        self._install(set(), calls)
+
+        with patch("api_client.token_manager", self._manager(logins)):
+            with pytest.raises(api_client.HTTPException):
+                await api_client.make_api_request(self.URL, headers={"Token": "revocato"})
+
+        assert calls == ["revocato", "nuovo-1"]
@@ -0,0 +1,102 @@
+"""Test degli store dei token bucket (stato condiviso tra processi)."""
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from utils.bucket_store import (
+    BucketStore,
+    MemoryBucketStore,
+    SQLiteBucketStore,
+    build_bucket_store,
+)
+from utils.rate_limiter import TokenBucket
+
+
+@pytest.fixture
+def path():
+    return os.path.join(tempfile.mkdtemp(prefix="ilpostapi_buckets_"), "rate_limit.db")
+
+
+def _take_many(path: str, attempts: int) -> int:
+    """Eseguito in un processo separato: quanti token riesce a prendere."""
+    store = SQLiteBucketStore(path)
+    try:
+        return sum(
+            1 for _ in range(attempts)
+            if store.take("global", 1e-6, 10, 1000.0, debt=False) == 0
+        )
+    finally:
+        store.close()
+
+
+class TestMemoryBucketStore:
+
+    def test_reservations_go_into_debt(self):
+        store = MemoryBucketStore()
+        assert store.take("k", 10, 1, 0.0) == 0
+        assert store.take("k", 10, 1, 0.0) == pytest.approx(0.1)
+        assert store.take("k", 10, 1, 0.0) == pytest.approx(0.2)
+
+    def test_keys_are_independent(self):
+        store = MemoryBucketStore()
+        store.take("a", 1, 1, 0.0)
+        assert store.take("b", 1, 1, 0.0) == 0
+
+
+class TestSQLiteBucketStore:
+
+    def test_state_is_shared_between_connections(self, path):
+        """Due worker sullo stesso file consumano lo stesso bucket."""
+        worker_a, worker_b = SQLiteBucketStore(path), SQLiteBucketStore(path)
+        bucket_a = TokenBucket(10, 2, timer=lambda: 1000.0, store=worker_a, key="global")
+        bucket_b = TokenBucket(10, 2, timer=lambda: 1000.0, store=worker_b, key="global")
+        assert bucket_a.reserve() == 0
+        assert bucket_b.reserve() == 0
+        assert bucket_a.reserve() == pytest.approx(0.1)
+        assert bucket_b.reserve() == pytest.approx(0.2)
+        worker_a.close()
+        worker_b.close()
+
+    def test_processes_never_exceed_burst(self, path):
+        with ProcessPoolExecutor(max_workers=3) as pool:
+            taken = sum(pool.map(_take_many, [path] * 3, [8] * 3))
+        assert taken == 10
+
+    def test_falls_back_to_memory_when_file_is_unusable(self, path):
+        store = SQLiteBucketStore(os.path.join(path, "missing", "rate_limit.db"))
+        assert store.take("k", 10, 1, 0.0) == 0
+        assert store.take("k", 10, 1, 0.0) == pytest.approx(0.1)
+
+    def test_busy_file_does_not_stall_the_caller(self, path):
+        """Con il file bloccato da un altro processo si passa subito alla memoria."""
+        store = SQLiteBucketStore(path)
+        assert store.take("k", 10, 2, 0.0) == 0
+        holder = sqlite3.connect(path, isolation_level=None)
+        holder.execute("BEGIN IMMEDIATE")
+        try:
+            started = time.perf_counter()
+            assert store.take("k", 10, 2, 0.0) == 0
+            assert time.perf_counter() - started < 0.5
+        finally:
+            holder.execute("ROLLBACK")
+            holder.close()
+            store.close()
+
+
+class TestBuildBucketStore:
+
+    def test_backends(self, path):
+        assert isinstance(build_bucket_store("memory", path), MemoryBucketStore)
+        assert isinstance(build_bucket_store("sqlite", path), SQLiteBucketStore)
+
+    def test_store_must_implement_take(self):
+        with pytest.raises(TypeError):
+            BucketStore()
+
+    def test_unknown_backend(self, path):
+        with pytest.raises(ValueError):
+            build_bucket_store("redis", path)
@@ -0,0 +1,107 @@
+"""Test del circuit breaker verso l'API upstream."""
+import pytest
+
+from utils import metrics
+from utils.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _breaker(clock: FakeClock, **kwargs) -> CircuitBreaker:
+    options = dict(
+        failure_rate_threshold=0.5, slow_call_seconds=2, slow_call_rate_threshold=0.8,
+        window_size=10, min_calls=4, open_seconds=30, half_open_calls=2,
+    )
+    options.update(kwargs)
+    return CircuitBreaker("test", timer=clock, **options)
+
+
+class TestCircuitBreaker:
+
+    def test_stays_closed_below_min_calls(self):
+        breaker = _breaker(FakeClock())
+        for _ in range(3):
+            breaker.before_call()
+            breaker.record_failure()
+        assert breaker.state == CLOSED
+
+    def test_opens_on_failure_rate(self):
+        breaker = _breaker(FakeClock())
+        for failed in (False, True, False, True):
+            breaker.before_call()
+            breaker.record_failure() if failed else breaker.record_success(0.1)
+
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError) as exc:
+            breaker.before_call()
+        assert exc.value.retry_after == pytest.approx(30)
+        assert metrics.get_gauge("circuit_breaker_state", breaker="test") == 2
+
+    def test_opens_on_slow_calls(self):
+        """Un upstream che risponde ma troppo lentamente apre il circuito."""
+        breaker = _breaker(FakeClock())
+        for _ in range(4):
+            breaker.before_call()
+            breaker.record_success(5.0)
+        assert breaker.state == OPEN
+
+    def test_half_open_closes_after_successful_probes(self):
+        clock = FakeClock()
+        breaker = _breaker(clock, min_calls=1)
+        breaker.record_failure()
+        assert breaker.state == OPEN
+
+        clock.now += 30
+        assert breaker.state == HALF_OPEN
+        breaker.before_call()
+        breaker.before_call()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()  # oltre il numero di chiamate di prova
+
+        breaker.record_success(0.1)
+        breaker.record_success(0.1)
+        assert breaker.state == CLOSED
+        assert breaker.snapshot()["calls"] == 0
+
+    def test_half_open_reopens_on_failure(self):
+        clock = FakeClock()
+        breaker = _breaker(clock, min_calls=1)
+        breaker.record_failure()
+        clock.now += 30
+
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        clock.now += 29
+        assert breaker.state == OPEN
+
+    def test_released_probe_frees_slot(self):
+        clock = FakeClock()
+        breaker = _breaker(clock, min_calls=1, half_open_calls=1)
+        breaker.record_failure()
+        clock.now += 30
+
+        breaker.before_call()
+        breaker.release()
+        breaker.before_call()
+        assert breaker.state == HALF_OPEN
+
+    def test_snapshot(self):
+        breaker = _breaker(FakeClock(), min_calls=10)
+        breaker.record_success(0.1)
+        breaker.record_failure()
+        assert breaker.snapshot() == {
+            "state": CLOSED, "calls": 2, "failure_rate": 0.5, "slow_call_rate": 0.0,
+        }
@@ -0,0 +1,50 @@
+"""Test della configurazione dell'engine (URL, pool e PRAGMA di SQLite)."""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import NullPool
+
+from database import database
+from database.database import AsyncSessionLocal, engine
+from tests.conftest import requires_sqlite
+
+
+async def _pragma(session, name: str):
+    return (await session.execute(text(f"PRAGMA {name}"))).scalar()
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestDatabaseEngine:
+
+    async def test_connections_are_pooled(self, setup_db):
+        assert not isinstance(engine.pool, NullPool)
+        async with AsyncSessionLocal() as session:
+            first = (await (await session.connection()).get_raw_connection()).dbapi_connection
+        async with AsyncSessionLocal() as session:
+            second = (await (await session.connection()).get_raw_connection()).dbapi_connection
+        assert first is second
+
+    @requires_sqlite
+    async def test_pragmas_applied_on_connect(self, setup_db):
+        async with AsyncSessionLocal() as session:
+            assert await _pragma(session, "journal_mode") == "wal"
+            assert await _pragma(session, "synchronous") == 1  # NORMAL
+            assert await _pragma(session, "temp_store") == 2  # MEMORY
+            assert await _pragma(session, "cache_size") == -20000
+            assert await _pragma(session, "busy_timeout") == 30000
+            assert await _pragma(session, "mmap_size") == 256 * 1024 * 1024
+
+    async def test_pool_can_be_disabled(self, monkeypatch):
+        monkeypatch.setattr(database, "DB_POOL_SIZE", 0)
+        unpooled = database.create_engine_for("sqlite+aiosqlite://")
+        try:
+            assert isinstance(unpooled.pool, NullPool)
+        finally:
+            await unpooled.dispose()
+
+    async def test_database_url_selects_asyncpg(self, monkeypatch):
+        monkeypatch.setattr(database, "DATABASE_URL", "postgres://app:secret@db:5432/ilpost")
+        assert database.get_database_url() == "postgresql+asyncpg://app:secret@db:5432/ilpost"
+        monkeypatch.setattr(database, "DATABASE_URL", "postgresql+asyncpg://db/ilpost")
+        assert database.get_database_url() == "postgresql+asyncpg://db/ilpost"
+        monkeypatch.setattr(database, "DATABASE_URL", "")
+        assert database.get_database_url().startswith("sqlite+aiosqlite:///")
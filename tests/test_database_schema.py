@@ -0,0 +1,23 @@
+"""Test dell'aggiornamento dello schema del database esistente."""
+from sqlalchemy import create_engine, inspect, text
+
+from database.database import _add_missing_columns
+
+
+def test_missing_nullable_columns_are_added_without_data_loss():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE podcasts (id INTEGER PRIMARY KEY, ilpost_id VARCHAR, title VARCHAR,"
+            " description TEXT, image_url VARCHAR, author VARCHAR, share_url VARCHAR,"
+            " slug VARCHAR, last_checked DATETIME)"
+        ))
+        conn.execute(text("INSERT INTO podcasts (ilpost_id, title) VALUES ('1', 'Show')"))
+
+        added = _add_missing_columns(conn)
+
+        assert "podcasts.last_full_sync" in added
+        columns = {c["name"] for c in inspect(conn).get_columns("podcasts")}
+        assert "last_full_sync" in columns
+        assert conn.execute(text("SELECT title FROM podcasts")).scalar() == "Show"
+        assert _add_missing_columns(conn) == []
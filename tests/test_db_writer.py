@@ -0,0 +1,119 @@
+"""Test dello scrittore unico del database (coda di scritture con COMMIT di gruppo)."""
+import asyncio
+import itertools
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from database.models import Podcast
+from database.writer import DatabaseWriter
+from utils import metrics
+
+_ids = itertools.count(900000)
+
+
+def _insert_podcast(ilpost_id: str):
+    async def intent(session):
+        podcast = Podcast(ilpost_id=ilpost_id, title="Show")
+        session.add(podcast)
+        await session.flush()
+        return podcast.id
+    return intent
+
+
+async def _count(db, ilpost_ids) -> int:
+    return await db.scalar(
+        select(func.count()).select_from(Podcast).where(Podcast.ilpost_id.in_(ilpost_ids))
+    )
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestDatabaseWriter:
+
+    async def test_returns_the_intent_result(self, db_session):
+        writer = DatabaseWriter()
+        ilpost_id = str(next(_ids))
+
+        podcast_id = await writer.submit(_insert_podcast(ilpost_id))
+
+        podcast = await db_session.get(Podcast, podcast_id)
+        assert podcast.ilpost_id == ilpost_id
+        await writer.stop()
+
+    async def test_queued_writes_share_a_transaction(self, db_session):
+        writer = DatabaseWriter(max_batch=50)
+        ilpost_ids = [str(next(_ids)) for _ in range(20)]
+        before = metrics.get_counter("db_write_transactions_total")
+
+        await asyncio.gather(*(writer.submit(_insert_podcast(i)) for i in ilpost_ids))
+
+        # La prima scrittura parte da sola, le altre arrivano mentre e' in corso
+        assert metrics.get_counter("db_write_transactions_total") - before <= 2
+        assert await _count(db_session, ilpost_ids) == 20
+        await writer.stop()
+
+    async def test_batch_size_is_capped(self, db_session):
+        writer = DatabaseWriter(max_batch=5)
+        ilpost_ids = [str(next(_ids)) for _ in range(20)]
+        before = metrics.get_counter("db_write_transactions_total")
+
+        await asyncio.gather(*(writer.submit(_insert_podcast(i)) for i in ilpost_ids))
+
+        assert metrics.get_counter("db_write_transactions_total") - before >= 4
+        assert await _count(db_session, ilpost_ids) == 20
+        await writer.stop()
+
+    async def test_failing_write_does_not_affect_the_others(self, db_session):
+        writer = DatabaseWriter()
+        duplicate = str(next(_ids))
+        await writer.submit(_insert_podcast(duplicate))
+        ilpost_ids = [str(next(_ids)) for _ in range(3)]
+
+        results = await asyncio.gather(
+            writer.submit(_insert_podcast(ilpost_ids[0])),
+            writer.submit(_insert_podcast(ilpost_ids[1])),
+            writer.submit(_insert_podcast(duplicate)),
+            writer.submit(_insert_podcast(ilpost_ids[2])),
+            return_exceptions=True,
+        )
+
+        assert isinstance(results[2], IntegrityError)
+        assert all(isinstance(r, int) for r in results[:2] + results[3:])
+        assert await _count(db_session, ilpost_ids) == 3
+        await writer.stop()
+
+    async def test_stop_flushes_queued_writes(self, db_session):
+        writer = DatabaseWriter()
+        ilpost_ids = [str(next(_ids)) for _ in range(3)]
+        pending = [asyncio.ensure_future(writer.submit(_insert_podcast(i))) for i in ilpost_ids]
+        await asyncio.sleep(0)
+
+        await writer.stop()
+
+        assert all(task.done() and not task.exception() for task in pending)
+        assert await _count(db_session, ilpost_ids) == 3
+
+    async def test_cancelled_writer_does_not_leave_callers_waiting(self, db_session):
+        writer = DatabaseWriter(max_batch=1)
+        started = asyncio.Event()
+
+        async def blocked(session):
+            started.set()
+            await asyncio.Event().wait()
+
+        pending = [
+            asyncio.ensure_future(writer.submit(blocked)),
+            asyncio.ensure_future(writer.submit(_insert_podcast(str(next(_ids))))),
+        ]
+        await started.wait()
+        writer._task.cancel()
+
+        results = await asyncio.wait_for(
+            asyncio.gather(*pending, return_exceptions=True), timeout=5
+        )
+
+        assert all(isinstance(r, asyncio.CancelledError) for r in results)
+        # Lo scrittore riparte alla scrittura successiva
+        assert isinstance(await writer.submit(_insert_podcast(str(next(_ids)))), int)
+        await writer.stop()
@@ -0,0 +1,115 @@
+"""Test della cache persistente su disco delle risposte upstream."""
+import os
+import tempfile
+
+import pytest
+
+from utils.disk_cache import DiskCache
+from utils.swr_cache import SWRCache
+
+
+@pytest.fixture
+def store():
+    path = os.path.join(tempfile.mkdtemp(prefix="ilpostapi_disk_cache_"), "cache.db")
+    disk = DiskCache(path, max_bytes=1024 * 1024)
+    yield disk
+    disk.close()
+
+
+class TestDiskCache:
+
+    def test_roundtrip_is_compressed(self, store):
+        """I valori vengono salvati compressi e riletti identici."""
+        value = {"data": [{"id": i, "title": "Episodio " * 20} for i in range(200)]}
+        payload = DiskCache.encode(value)
+
+        store.put("episodes", "all_episodes_1", payload, fetched_at=123.0)
+
+        [(key, loaded, fetched_at)] = store.load("episodes")
+        assert (key, loaded, fetched_at) == ("all_episodes_1", value, 123.0)
+        assert store.total_size() < len(payload) / 5
+
+    def test_lru_eviction_when_over_size(self, store):
+        """Oltre il limite di dimensione vengono eliminate le voci meno usate."""
+        store.max_bytes = 2500
+        for i in range(5):
+            payload = os.urandom(1000)  # incomprimibile
+            store.put("ns", f"k{i}", DiskCache.encode(payload.hex()), fetched_at=float(i))
+
+        keys = {key for key, _, _ in store.load("ns")}
+        assert store.total_size() <= 2500
+        assert "k4" in keys and "k0" not in keys
+
+    def test_namespaces_are_isolated(self, store):
+        store.put("a", "k", DiskCache.encode(1), 0)
+        store.put("b", "k", DiskCache.encode(2), 0)
+        store.clear("a")
+
+        assert store.load("a") == []
+        assert [v for _, v, _ in store.load("b")] == [2]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestPersistentSWRCache:
+
+    async def test_restart_restores_warm_entries(self, store):
+        """Una nuova istanza (riavvio) ritrova i valori scritti dalla precedente."""
+        cache = SWRCache("podcasts", maxsize=10, ttl=900, store=store)
+        cache["podcasts_1_100"] = {"data": [{"id": 1}]}
+        await cache.flush()
+
+        restarted = SWRCache("podcasts", maxsize=10, ttl=900, store=store)
+        assert await restarted.restore() == 1
+        assert restarted["podcasts_1_100"] == {"data": [{"id": 1}]}
+
+    async def test_restore_keeps_entry_age(self, store):
+        """L'eta' della voce sopravvive al riavvio: voci troppo vecchie non tornano."""
+        import time
+
+        store.put("episodes", "old", DiskCache.encode({"data": []}), time.time() - 3600)
+        store.put("episodes", "new", DiskCache.encode({"data": []}), time.time() - 60)
+
+        cache = SWRCache("episodes", maxsize=10, ttl=900, grace=900, store=store)
+        assert await cache.restore() == 1
+        assert "new" in cache and "old" not in cache
+
+    async def test_pop_removes_from_disk(self, store):
+        cache = SWRCache("episodes", maxsize=10, ttl=900, store=store)
+        cache["k"] = {"data": []}
+        cache.pop("k")
+        await cache.flush()
+
+        assert store.load("episodes") == []
+
+    async def test_values_are_encoded_off_the_event_loop(self, store):
+        import threading
+        from unittest.mock import patch
+
+        threads = []
+
+        def encode(value):
+            threads.append(threading.current_thread())
+            return DiskCache.encode(value)
+
+        cache = SWRCache("episodes", maxsize=10, ttl=900, store=store)
+        with patch.object(store, "encode", side_effect=encode):
+            cache["k"] = {"data": []}
+            await cache.flush()
+
+        assert threads and threads[0] is not threading.current_thread()
+
+    async def test_served_entries_survive_eviction(self, store):
+        """Le voci servite dalla cache in memoria non sono le prime a lasciare il disco."""
+        store.max_bytes = 2500
+        cache = SWRCache("ns", maxsize=10, ttl=900, store=store)
+        for i in range(2):
+            cache[f"k{i}"] = os.urandom(1000).hex()
+            await cache.flush()
+
+        assert cache.get("k0") is not None
+        await cache.flush()
+        cache["k2"] = os.urandom(1000).hex()
+        await cache.flush()
+
+        keys = {key for key, _, _ in store.load("ns")}
+        assert keys == {"k0", "k2"}
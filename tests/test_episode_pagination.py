@@ -0,0 +1,146 @@
+"""Test delle letture degli episodi: paginazione nel DB e righe a colonne selezionate."""
+import itertools
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import Row, select, text
+
+from database.database import _add_missing_indexes, engine
+from database.models import Episode, Podcast
+from database.operations import (
+    EPISODE_FEED_COLUMNS,
+    LATEST_EPISODE_COLUMNS,
+    count_podcast_episodes,
+    get_podcast_episodes,
+    get_podcast_episodes_page,
+    save_episode_descriptions,
+    select_episode_rows,
+)
+from tests.conftest import requires_sqlite
+
+_ids = itertools.count(800000)
+_BASE_DATE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+async def _podcast_with_episodes(db, days: list) -> Podcast:
+    """Podcast con un episodio per ogni elemento di ``days`` (None = senza data)."""
+    podcast = Podcast(
+        ilpost_id=str(next(_ids)), title="Show", last_checked=datetime.now(timezone.utc)
+    )
+    db.add(podcast)
+    db.add_all(
+        Episode(
+            ilpost_id=str(next(_ids)),
+            podcast=podcast,
+            title=f"Giorno {day}",
+            publication_date=_BASE_DATE + timedelta(days=day) if day is not None else None,
+        )
+        for day in days
+    )
+    await db.commit()
+    return podcast
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestEpisodePagination:
+
+    async def test_pages_are_sorted_newest_first(self, db_session):
+        podcast = await _podcast_with_episodes(db_session, [3, None, 7, 1, 5])
+
+        first, total, needs_update = await get_podcast_episodes_page(
+            db_session, podcast.id, page=1, per_page=2
+        )
+        second, _, _ = await get_podcast_episodes_page(db_session, podcast.id, page=2, per_page=2)
+        last, _, _ = await get_podcast_episodes_page(db_session, podcast.id, page=3, per_page=2)
+
+        assert total == 5
+        assert not needs_update
+        assert [ep.title for ep in first] == ["Giorno 7", "Giorno 5"]
+        assert [ep.title for ep in second] == ["Giorno 3", "Giorno 1"]
+        assert [ep.title for ep in last] == ["Giorno None"]
+
+    async def test_lookup_by_ilpost_id(self, db_session):
+        podcast = await _podcast_with_episodes(db_session, [1, 2])
+
+        episodes, total, _ = await get_podcast_episodes_page(
+            db_session, int(podcast.ilpost_id), per_page=10
+        )
+        assert total == 2
+        assert [ep.title for ep in episodes] == ["Giorno 2", "Giorno 1"]
+
+    async def test_page_past_the_end_is_empty(self, db_session):
+        podcast = await _podcast_with_episodes(db_session, [1, 2])
+
+        episodes, total, _ = await get_podcast_episodes_page(
+            db_session, podcast.id, page=5, per_page=10
+        )
+        assert episodes == []
+        assert total == await count_podcast_episodes(db_session, podcast.id) == 2
+
+    async def test_unknown_podcast_needs_update(self, db_session):
+        assert await get_podcast_episodes_page(db_session, 999999999) == ([], 0, True)
+
+    @requires_sqlite
+    async def test_page_query_uses_the_index(self, db_session):
+        plan = (await db_session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM episodes WHERE podcast_id = 1 "
+            "ORDER BY publication_date DESC, id LIMIT 20 OFFSET 40"
+        ))).all()
+        details = " ".join(row[-1] for row in plan)
+        assert "ix_episodes_podcast_id_publication_date" in details
+        assert "TEMP B-TREE" not in details
+
+    async def test_missing_index_is_created(self, setup_db):
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP INDEX ix_episodes_podcast_id_publication_date"))
+            added = await conn.run_sync(_add_missing_indexes)
+            again = await conn.run_sync(_add_missing_indexes)
+        assert added == ["ix_episodes_podcast_id_publication_date"]
+        assert again == []
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestEpisodeRows:
+
+    async def test_rows_have_only_the_requested_columns(self, db_session):
+        podcast = await _podcast_with_episodes(db_session, [1, 2])
+
+        rows = await select_episode_rows(db_session, podcast.id, LATEST_EPISODE_COLUMNS)
+
+        assert all(isinstance(row, Row) for row in rows)
+        assert rows[0]._fields == ("title", "publication_date", "duration")
+        assert [row.title for row in rows] == ["Giorno 2", "Giorno 1"]
+
+    async def test_latest_episode_with_limit(self, db_session):
+        podcast = await _podcast_with_episodes(db_session, [4, 9, 2])
+
+        episodes, needs_update = await get_podcast_episodes(
+            db_session, podcast.id, columns=LATEST_EPISODE_COLUMNS, limit=1
+        )
+        assert [ep.title for ep in episodes] == ["Giorno 9"]
+        assert not needs_update
+
+    async def test_feed_columns_cover_the_feed_fields(self, db_session):
+        podcast = await _podcast_with_episodes(db_session, [1])
+
+        episodes, _ = await get_podcast_episodes(
+            db_session, podcast.id, columns=EPISODE_FEED_COLUMNS
+        )
+        row = episodes[0]
+        for field in ("id", "ilpost_id", "description", "summary", "audio_url",
+                      "description_verified", "episode_type", "publication_date"):
+            assert hasattr(row, field)
+
+    async def test_save_episode_descriptions(self, db_session):
+        podcast = await _podcast_with_episodes(db_session, [1, 2])
+        rows = await select_episode_rows(db_session, podcast.id, (Episode.ilpost_id,))
+
+        await save_episode_descriptions(db_session, {rows[0].ilpost_id: "<p>Completa</p>"})
+
+        result = await db_session.execute(
+            select(Episode.ilpost_id, Episode.description, Episode.description_verified)
+            .where(Episode.podcast_id == podcast.id)
+        )
+        saved = {row.ilpost_id: (row.description, row.description_verified) for row in result}
+        assert saved[rows[0].ilpost_id] == ("<p>Completa</p>", True)
+        assert saved[rows[1].ilpost_id] == (None, False)
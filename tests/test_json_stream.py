@@ -0,0 +1,63 @@
+"""Test della decodifica JSON incrementale delle risposte upstream."""
+import asyncio
+import json
+
+import pytest
+
+from utils.json_stream import decode_object
+
+DOCUMENT = {
+    "head": {"data": {"total": 3}, "note": "virgola, graffa } e [ parentesi"},
+    "data": [{"id": 1, "tags": ["a", "b"]}, {"id": 2, "nested": {"x": [1, {}]}}, {"id": 3}],
+    "empty": [],
+    "flag": True,
+}
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestDecodeObject:
+
+    @pytest.mark.parametrize("indent", [None, 2])
+    async def test_matches_json_loads(self, indent):
+        text = json.dumps(DOCUMENT, indent=indent)
+        assert await decode_object(text) == json.loads(text)
+
+    async def test_transform_applied_to_list_items(self):
+        text = json.dumps(DOCUMENT)
+        result = await decode_object(text, transform=lambda ep: ep["id"])
+        assert result["data"] == [1, 2, 3]
+        assert result["head"] == DOCUMENT["head"]
+
+    async def test_yields_to_event_loop(self):
+        """Altri task avanzano mentre una lista lunga viene decodificata."""
+        text = json.dumps({"data": [{"id": i} for i in range(1000)]})
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.ensure_future(ticker())
+        await asyncio.sleep(0)
+        result = await decode_object(text, batch=100)
+        task.cancel()
+
+        assert len(result["data"]) == 1000
+        assert ticks >= 10
+
+    async def test_non_object_document(self):
+        assert await decode_object("[1, 2]") == [1, 2]
+        assert await decode_object("{}") == {}
+
+    @pytest.mark.parametrize("text", [
+        '{"data": [1, 2',
+        '{"data": [1 2]}',
+        '{"data": []} extra',
+        '{"data" []}',
+        '{data: []}',
+    ])
+    async def test_invalid_json_raises(self, text):
+        with pytest.raises(json.JSONDecodeError):
+            await decode_object(text)
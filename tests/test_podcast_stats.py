@@ -0,0 +1,157 @@
+"""Test del riepilogo per podcast (podcast_stats) aggiornato dal salvataggio degli episodi."""
+import itertools
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+
+from database.database import engine
+from database.models import Podcast, PodcastStats
+from database.operations import get_podcast_summaries, save_episodes, update_episode
+from database.stats import build_podcast_stats
+
+_ids = itertools.count(960000)
+
+
+def _episode(ilpost_id: int, day: int, title: str = None, milliseconds: int = 60000) -> dict:
+    return {
+        "id": ilpost_id,
+        "title": title or f"Giorno {day}",
+        "content_html": "<p>Testo</p>",
+        "summary": "Sommario",
+        "episode_raw_url": f"https://example.com/{ilpost_id}.mp3",
+        "date": f"2026-01-{day:02d}T06:00:00+00:00",
+        "milliseconds": milliseconds,
+    }
+
+
+async def _podcast(db) -> Podcast:
+    podcast = Podcast(ilpost_id=str(next(_ids)), title="Show")
+    db.add(podcast)
+    await db.commit()
+    return podcast
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestPodcastStats:
+
+    async def test_saving_episodes_updates_the_summary(self, db_session):
+        podcast = await _podcast(db_session)
+        await save_episodes(db_session, podcast, [
+            _episode(next(_ids), 1, milliseconds=60000),
+            _episode(next(_ids), 3, milliseconds=120000),
+            _episode(next(_ids), 2, milliseconds=30000),
+        ])
+
+        stats = await db_session.get(PodcastStats, podcast.id, populate_existing=True)
+
+        assert stats.episode_count == 3
+        assert stats.total_duration == 210
+        assert stats.last_episode_title == "Giorno 3"
+        assert stats.last_episode_duration == 120
+        assert stats.last_episode_date.day == 3
+        assert stats.last_sync_episodes == 3
+        assert stats.last_sync_at is not None
+
+    async def test_summary_follows_updates_and_new_episodes(self, db_session):
+        podcast = await _podcast(db_session)
+        latest = next(_ids)
+        await save_episodes(db_session, podcast, [_episode(next(_ids), 1), _episode(latest, 2)])
+        await save_episodes(db_session, podcast, [_episode(latest, 2, title="Titolo corretto")])
+
+        (row,) = await get_podcast_summaries(db_session, [int(podcast.ilpost_id)])
+        assert row.last_episode_title == "Titolo corretto"
+        assert row.episode_count == 2
+
+        await save_episodes(db_session, podcast, [_episode(next(_ids), 5)])
+        (row,) = await get_podcast_summaries(db_session, [int(podcast.ilpost_id)])
+        assert row.last_episode_title == "Giorno 5"
+        assert row.episode_count == 3
+
+    async def test_refreshed_episode_updates_the_summary(self, db_session):
+        podcast = await _podcast(db_session)
+        latest = next(_ids)
+        await save_episodes(db_session, podcast, [_episode(next(_ids), 1), _episode(latest, 2)])
+
+        await update_episode(db_session, str(latest), {"title": "Titolo aggiornato"})
+
+        stats = await db_session.get(PodcastStats, podcast.id, populate_existing=True)
+        assert stats.last_episode_title == "Titolo aggiornato"
+        # Non e' una sincronizzazione: restano i dati dell'ultima
+        assert stats.last_sync_episodes == 2
+
+    async def test_summaries_include_podcasts_without_episodes(self, db_session):
+        empty = await _podcast(db_session)
+        podcast = await _podcast(db_session)
+        await save_episodes(db_session, podcast, [_episode(next(_ids), 4)])
+
+        rows = await get_podcast_summaries(
+            db_session, [int(empty.ilpost_id), int(podcast.ilpost_id)]
+        )
+
+        # Dal podcast con l'ultimo episodio piu' recente, quelli senza episodi in fondo
+        assert [row.ilpost_id for row in rows] == [podcast.ilpost_id, empty.ilpost_id]
+        assert rows[1].episode_count is None and rows[1].last_episode_date is None
+
+    async def test_existing_podcasts_are_summarized_on_upgrade(self, db_session):
+        podcast = await _podcast(db_session)
+        await save_episodes(db_session, podcast, [_episode(next(_ids), 1), _episode(next(_ids), 2)])
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP TABLE podcast_stats"))
+            summarized = await conn.run_sync(build_podcast_stats)
+            again = await conn.run_sync(build_podcast_stats)
+
+        assert summarized > 0
+        assert again == 0
+        (row,) = await get_podcast_summaries(db_session, [int(podcast.ilpost_id)])
+        assert (row.episode_count, row.last_episode_title) == (2, "Giorno 2")
+
+    async def test_last_episode_info_is_read_without_upstream_calls(self, db_session, monkeypatch):
+        from routes import web
+
+        async def no_upstream(*args, **kwargs):
+            raise AssertionError("chiamata upstream inattesa")
+
+        monkeypatch.setattr(web, "fetch_episodes", no_upstream)
+        podcast = await _podcast(db_session)
+        await save_episodes(db_session, podcast, [_episode(next(_ids), 7, milliseconds=90000)])
+
+        date, title, duration = await web._load_last_episode_info(
+            int(podcast.ilpost_id), use_db=True
+        )
+
+        assert title == "Giorno 7"
+        assert duration == 90000
+        assert date.startswith("2026-01-07")
+
+
+def _summary_row(last_episode_date, title: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        last_episode_date=last_episode_date, last_episode_title=title,
+        last_episode_duration=60, episode_count=10,
+    )
+
+
+class TestDirectorySummary:
+
+    def test_newer_summary_replaces_the_upstream_episode(self):
+        from routes.web import _apply_podcast_summary
+
+        # 05:30 UTC e' dopo le 06:00+01:00 (05:00 UTC), anche se la stringa e' "minore"
+        entry = {"last_episode_date": "2026-01-07T06:00:00+01:00", "last_episode_title": "API"}
+        _apply_podcast_summary(
+            entry, _summary_row(datetime(2026, 1, 7, 5, 30, tzinfo=timezone.utc), "DB")
+        )
+        assert entry["last_episode_title"] == "DB"
+
+    def test_older_summary_keeps_the_upstream_episode(self):
+        from routes.web import _apply_podcast_summary
+
+        # 05:30 UTC e' prima delle 08:00+02:00 (06:00 UTC): resta l'episodio dell'API
+        entry = {"last_episode_date": "2026-07-07T08:00:00+02:00", "last_episode_title": "API"}
+        _apply_podcast_summary(
+            entry, _summary_row(datetime(2026, 7, 7, 5, 30, tzinfo=timezone.utc), "DB")
+        )
+        assert entry["last_episode_title"] == "API"
+        assert entry["episode_count"] == 10
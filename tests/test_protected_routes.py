@@ -22,6 +22,7 @@ class TestProtectedRoutes:
         "/clear-cache",
         "/api/podcast/1/episodes",
         "/api/podcast/1/episode/1/description",
+        "/api/search?q=test",
         "/profile",
         "/auth/change-password",
         "/admin/users",
@@ -72,6 +73,7 @@ class TestPublicRoutes:
         "/healthz",
         "/readyz",
         "/healthcheck",
+        "/metrics",
         "/auth/login",
         "/auth/setup",
         "/docs",
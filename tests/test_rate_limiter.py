@@ -0,0 +1,373 @@
+"""Test del token bucket verso l'API upstream."""
+import asyncio
+import time
+
+import pytest
+
+from utils import metrics
+from utils.rate_limiter import (
+    BACKGROUND,
+    FEED_POLL,
+    INTERACTIVE,
+    AimdController,
+    ConcurrencyLimiter,
+    InboundRateLimiter,
+    TokenBucket,
+    UpstreamRateLimiter,
+    current_priority,
+    parse_family_limits,
+    upstream_priority,
+)
+from utils.singleflight import SingleFlight
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestTokenBucket:
+
+    def test_burst_is_served_immediately(self):
+        bucket = TokenBucket(rate=1, burst=3, timer=FakeClock())
+        assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+        assert bucket.reserve() == pytest.approx(1.0)
+
+    def test_reservations_are_spaced_by_rate(self):
+        bucket = TokenBucket(rate=10, burst=1, timer=FakeClock())
+        delays = [bucket.reserve() for _ in range(4)]
+        assert delays == pytest.approx([0.0, 0.1, 0.2, 0.3])
+
+    def test_refill_is_capped_at_burst(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, burst=2, timer=clock)
+        bucket.reserve()
+        clock.now += 60
+        assert [bucket.reserve() for _ in range(2)] == [0, 0]
+        assert bucket.reserve() == pytest.approx(0.1)
+
+    def test_refill_pays_back_reservations(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, burst=1, timer=clock)
+        bucket.reserve()
+        bucket.reserve()
+        clock.now += 0.1
+        assert bucket.reserve() == pytest.approx(0.1)
+
+    def test_set_rate_keeps_tokens_accrued_at_old_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, burst=10, timer=clock)
+        for _ in range(10):
+            bucket.reserve()
+        clock.now += 2
+        bucket.set_rate(100)
+        assert [bucket.reserve() for _ in range(2)] == [0, 0]
+        assert bucket.reserve() == pytest.approx(0.01)
+
+    def test_try_acquire_does_not_take_missing_tokens(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, burst=1, timer=clock)
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() == pytest.approx(0.1)
+        clock.now += 0.1
+        assert bucket.try_acquire() == 0
+
+
+def _controller(clock: FakeClock, rate: float = 10, **kwargs) -> AimdController:
+    options = dict(floor=1, ceiling=20, increase=1, decrease=0.5,
+                   latency_target=1.0, cooldown=2.0)
+    options.update(kwargs)
+    return AimdController(TokenBucket(rate, 1, timer=clock), timer=clock, **options)
+
+
+class TestAimdController:
+
+    def test_healthy_responses_raise_rate_additively(self):
+        controller = _controller(FakeClock())
+        # ~rate risposte (un secondo di traffico) alzano il rate di ``increase``
+        for _ in range(10):
+            controller.record_response(200, 0.1)
+        assert controller.rate == pytest.approx(11, abs=0.1)
+
+    def test_rate_is_capped_at_ceiling(self):
+        controller = _controller(FakeClock(), rate=19.9)
+        for _ in range(100):
+            controller.record_response(200, 0.1)
+        assert controller.rate == 20
+
+    def test_throttle_cuts_rate_multiplicatively(self):
+        controller = _controller(FakeClock())
+        controller.record_response(429, 0.1)
+        assert controller.rate == 5
+        assert metrics.get_gauge("upstream_rate_limit_rps") == 5
+
+    def test_cuts_are_spaced_by_cooldown(self):
+        clock = FakeClock()
+        controller = _controller(clock)
+        controller.record_response(429, 0.1)
+        controller.record_response(429, 0.1)
+        assert controller.rate == 5
+        clock.now += 2
+        controller.record_response(429, 0.1)
+        assert controller.rate == 2.5
+
+    def test_rate_never_goes_below_floor(self):
+        clock = FakeClock()
+        controller = _controller(clock, rate=2, floor=1.5)
+        for _ in range(5):
+            controller.record_response(429, 0.1)
+            clock.now += 10
+        assert controller.rate == 1.5
+
+    def test_high_latency_cuts_rate(self):
+        controller = _controller(FakeClock())
+        for _ in range(10):
+            controller.record_response(200, 5.0)
+        assert controller.rate == 5
+
+    def test_server_errors_do_not_change_rate(self):
+        controller = _controller(FakeClock())
+        controller.record_response(503, 0.1)
+        assert controller.rate == 10
+
+    def test_limiter_without_controller_ignores_responses(self):
+        limiter = UpstreamRateLimiter(rate=10, burst=1, timer=FakeClock())
+        limiter.record_response(429, 0.1)
+        assert limiter.global_bucket.rate == 10
+
+    def test_limiter_adapts_global_bucket(self):
+        limiter = UpstreamRateLimiter(
+            rate=10, burst=1, timer=FakeClock(),
+            adaptive=dict(floor=1, ceiling=20),
+        )
+        limiter.record_response(429, 0.1)
+        assert limiter.global_bucket.rate == 5
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestUpstreamRateLimiter:
+
+    async def test_family_buckets_are_independent(self):
+        limiter = UpstreamRateLimiter(
+            rate=1000, burst=100, families={"login": (20, 1), "episodes": (1000, 100)}
+        )
+        started = time.monotonic()
+        await limiter.wait("episodes")
+        await limiter.wait("login")
+        assert time.monotonic() - started < 0.04
+        await limiter.wait("login")
+        assert time.monotonic() - started >= 0.04
+
+    async def test_global_bucket_applies_to_every_family(self):
+        limiter = UpstreamRateLimiter(rate=20, burst=1, families={"catalog": (1000, 100)})
+        started = time.monotonic()
+        await limiter.wait("catalog")
+        await limiter.wait("bff")
+        assert time.monotonic() - started >= 0.04
+
+    async def test_waiters_sleep_concurrently(self):
+        """Le attese non si sommano dietro un lock: N chiamate durano ~N/rate."""
+        limiter = UpstreamRateLimiter(rate=50, burst=1)
+        started = time.monotonic()
+        await asyncio.gather(*(limiter.wait("episodes") for _ in range(6)))
+        assert time.monotonic() - started < 0.25
+
+    async def test_wait_time_histogram(self):
+        metrics.reset_metrics()
+        limiter = UpstreamRateLimiter(rate=1000, burst=1)
+        await limiter.wait("batch", priority=BACKGROUND)
+        await limiter.wait("batch", priority=BACKGROUND)
+        histogram = metrics.get_histogram(
+            "upstream_rate_limit_wait_seconds", family="batch", priority=BACKGROUND
+        )
+        assert histogram.count == 2
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestPriorities:
+
+    async def test_higher_class_is_served_first(self):
+        limiter = UpstreamRateLimiter(rate=50, burst=1)
+        await limiter.wait()  # svuota il bucket
+        served = []
+
+        async def call(name: str, priority: str):
+            await limiter.wait("episodes", priority=priority)
+            served.append(name)
+
+        tasks = [asyncio.ensure_future(call(f"bg{i}", BACKGROUND)) for i in range(3)]
+        tasks.append(asyncio.ensure_future(call("feed", FEED_POLL)))
+        tasks.append(asyncio.ensure_future(call("user", INTERACTIVE)))
+        await asyncio.gather(*tasks)
+        assert served == ["user", "feed", "bg0", "bg1", "bg2"]
+
+    async def test_aging_promotes_long_waiting_calls(self):
+        clock = FakeClock()
+        limiter = UpstreamRateLimiter(rate=1, burst=1, aging=5, timer=clock)
+        loop = asyncio.get_running_loop()
+        background = loop.create_future()
+        limiter._queues[BACKGROUND].append((clock.now, background))
+        clock.now += 15
+        interactive = loop.create_future()
+        limiter._queues[INTERACTIVE].append((clock.now, interactive))
+        assert limiter._next_waiter() is background
+        assert limiter._next_waiter() is interactive
+
+    async def test_queue_depth_metric(self):
+        limiter = UpstreamRateLimiter(rate=20, burst=1)
+        await limiter.wait()
+        tasks = [
+            asyncio.ensure_future(limiter.wait(priority=BACKGROUND)) for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+        assert limiter.queue_depth(BACKGROUND) == 2
+        assert metrics.get_gauge(
+            "upstream_rate_limit_queue_depth", priority=BACKGROUND
+        ) == 2
+        await asyncio.gather(*tasks)
+        assert limiter.queue_depth(BACKGROUND) == 0
+
+    async def test_cancelled_waiter_leaves_the_queue(self):
+        limiter = UpstreamRateLimiter(rate=5, burst=1)
+        await limiter.wait()
+        task = asyncio.ensure_future(limiter.wait(priority=FEED_POLL))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert limiter.queue_depth(FEED_POLL) == 0
+
+    async def test_priority_from_context(self):
+        limiter = UpstreamRateLimiter(rate=1000, burst=10)
+        metrics.reset_metrics()
+        with upstream_priority(FEED_POLL):
+            assert current_priority() == FEED_POLL
+            await limiter.wait("episodes")
+        assert current_priority() == INTERACTIVE
+        assert metrics.get_histogram(
+            "upstream_rate_limit_wait_seconds", family="episodes", priority=FEED_POLL
+        ).count == 1
+
+    async def test_shared_call_takes_the_highest_waiting_priority(self):
+        """Un refresh in background atteso da un utente passa davanti ai feed."""
+        limiter = UpstreamRateLimiter(rate=20, burst=1)
+        await limiter.wait()
+        flight = SingleFlight("test")
+        served = []
+
+        async def fetch():
+            await limiter.wait("episodes")
+            served.append(("shared", current_priority()))
+            return "dati"
+
+        async def feed():
+            await limiter.wait("episodes", priority=FEED_POLL)
+            served.append(("feed", FEED_POLL))
+
+        with upstream_priority(BACKGROUND):
+            refresh = asyncio.ensure_future(flight.do("episodes", fetch))
+        await asyncio.sleep(0)
+        poll = asyncio.ensure_future(feed())
+        await asyncio.sleep(0)
+        assert limiter.queue_depth(BACKGROUND) == 1
+
+        assert await flight.do("episodes", fetch) == "dati"
+        assert limiter.queue_depth(BACKGROUND) == 0
+        await asyncio.gather(refresh, poll)
+        assert served == [("shared", INTERACTIVE), ("feed", FEED_POLL)]
+
+    async def test_nested_shared_calls_are_raised_together(self):
+        limiter = UpstreamRateLimiter(rate=20, burst=1)
+        await limiter.wait()
+        outer, inner = SingleFlight("outer"), SingleFlight("inner")
+
+        async def page():
+            await limiter.wait("episodes")
+            return current_priority()
+
+        with upstream_priority(BACKGROUND):
+            refresh = asyncio.ensure_future(
+                outer.do("podcast", lambda: inner.do("page", page))
+            )
+        await asyncio.sleep(0)
+        with upstream_priority(FEED_POLL):
+            assert await outer.do("podcast", page) == FEED_POLL
+        assert await refresh == FEED_POLL
+
+    async def test_explicit_priority_inside_a_shared_call(self):
+        flight = SingleFlight("test")
+
+        async def fetch():
+            with upstream_priority(BACKGROUND):
+                return current_priority()
+
+        assert await flight.do("key", fetch) == BACKGROUND
+
+    async def test_unknown_priority(self):
+        with pytest.raises(ValueError):
+            with upstream_priority("urgent"):
+                pass
+
+
+class TestInboundRateLimiter:
+
+    def test_limits_each_key_separately(self):
+        limiter = InboundRateLimiter({"token": (60, 2)}, timer=FakeClock())
+        assert limiter.check(token="a") == 0
+        assert limiter.check(token="a") == 0
+        assert limiter.check(token="a") == pytest.approx(1.0)
+        assert limiter.check(token="b") == 0
+
+    def test_strictest_scope_wins(self):
+        limiter = InboundRateLimiter(
+            {"user": (60, 5), "ip": (6, 1)}, timer=FakeClock()
+        )
+        assert limiter.check(user="1", ip="10.0.0.1") == 0
+        assert limiter.check(user="1", ip="10.0.0.1") == pytest.approx(10.0)
+        assert metrics.get_counter("inbound_rate_limited_total", scope="ip") >= 1
+
+    def test_disabled_and_missing_scopes_are_ignored(self):
+        limiter = InboundRateLimiter({"token": (0, 1)}, timer=FakeClock())
+        for _ in range(10):
+            assert limiter.check(token="a", ip=None, user="1") == 0
+
+    def test_refills_over_time(self):
+        clock = FakeClock()
+        limiter = InboundRateLimiter({"ip": (60, 1)}, timer=clock)
+        limiter.check(ip="x")
+        assert limiter.check(ip="x") > 0
+        clock.now += 1
+        assert limiter.check(ip="x") == 0
+
+
+class TestConcurrencyLimiter:
+
+    def test_sheds_over_limit(self):
+        limiter = ConcurrencyLimiter("renders", 2)
+        assert limiter.try_acquire() and limiter.try_acquire()
+        assert not limiter.try_acquire()
+        assert metrics.get_gauge("in_flight", limiter="renders") == 2
+        limiter.release()
+        assert limiter.try_acquire()
+
+    def test_zero_means_unlimited(self):
+        limiter = ConcurrencyLimiter("renders", 0)
+        assert all(limiter.try_acquire() for _ in range(100))
+
+
+class TestParseFamilyLimits:
+
+    def test_parses_rate_and_burst(self):
+        assert parse_family_limits("login=0.5/2, bff=3") == {
+            "login": (0.5, 2.0), "bff": (3.0, 1.0),
+        }
+
+    def test_empty_spec(self):
+        assert parse_family_limits("") == {}
+
+    def test_invalid_spec(self):
+        with pytest.raises(ValueError):
+            parse_family_limits("login")
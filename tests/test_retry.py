@@ -0,0 +1,62 @@
+"""Test della policy di retry verso l'API upstream."""
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+
+from utils.retry import RetryBudget, RetryPolicy, parse_retry_after
+
+
+class TestParseRetryAfter:
+
+    def test_seconds(self):
+        assert parse_retry_after("12") == 12.0
+
+    def test_http_date(self):
+        when = datetime.now(timezone.utc) + timedelta(seconds=30)
+        assert 25 <= parse_retry_after(format_datetime(when, usegmt=True)) <= 30
+
+    def test_invalid_or_missing(self):
+        assert parse_retry_after(None) is None
+        assert parse_retry_after("domani") is None
+
+
+class TestRetryPolicy:
+
+    def test_backoff_full_jitter_is_bounded(self):
+        policy = RetryPolicy(base_delay=0.5, max_delay=4)
+        for attempt in range(6):
+            ceiling = min(4, 0.5 * 2 ** attempt)
+            assert all(0 <= policy.backoff(attempt) <= ceiling for _ in range(50))
+
+    def test_backoff_prefers_retry_after_capped(self):
+        policy = RetryPolicy(max_delay=10)
+        assert policy.backoff(0, retry_after=3) == 3
+        assert policy.backoff(0, retry_after=120) == 10
+
+    def test_retryable_conditions(self):
+        policy = RetryPolicy()
+        assert policy.is_retryable_status(503)
+        assert not policy.is_retryable_status(404)
+        assert policy.is_retryable_error(httpx.ConnectTimeout("t"))
+        assert not policy.is_retryable_error(ValueError("x"))
+
+    def test_max_retries(self):
+        policy = RetryPolicy(max_retries=2, budget=RetryBudget(max_tokens=100))
+        assert policy.should_retry(0, "test")
+        assert policy.should_retry(1, "test")
+        assert not policy.should_retry(2, "test")
+
+
+class TestRetryBudget:
+
+    def test_budget_limits_retries_to_fraction_of_requests(self):
+        """Con il budget esaurito si concede un retry ogni 1/ratio richieste."""
+        budget = RetryBudget(ratio=0.25, max_tokens=2)
+        assert budget.try_spend() and budget.try_spend()
+        assert not budget.try_spend()
+
+        for _ in range(4):
+            budget.record_request()
+        assert budget.try_spend()
+        assert not budget.try_spend()
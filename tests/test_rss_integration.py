@@ -257,3 +257,278 @@ class TestBatchDescriptionUpdate:
             resp = await client.get(f"/podcast/{PODCAST_ID}/rss/{token}")
             assert resp.status_code == 200
             mock_batch.assert_not_called()
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestUpstreamNotModified:
+    """Testa il percorso 304 upstream: nessun nuovo salvataggio degli episodi."""
+
+    async def test_not_modified_skips_save_episodes(self, client: AsyncClient):
+        """Con una risposta upstream non modificata si aggiorna solo last_checked."""
+        token = await _setup_and_get_token(client)
+        await _populate_db(client, token)
+
+        from database.database import AsyncSessionLocal
+        from database.models import Podcast
+        from sqlalchemy import update
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Podcast).values(last_checked=None, last_full_sync=None))
+            await db.commit()
+
+        from api_client import UpstreamData
+
+        not_modified = UpstreamData(MOCK_API_EPISODES, not_modified=True)
+        with patch("routes.api.fetch_all_episodes", return_value=not_modified), \
+             patch("routes.api.save_episodes") as mock_save:
+            resp = await client.get(f"/podcast/{PODCAST_ID}/rss/{token}")
+            assert resp.status_code == 200
+            mock_save.assert_not_called()
+
+        async with AsyncSessionLocal() as db:
+            from database.operations import get_podcast_by_ilpost_id
+            podcast = await get_podcast_by_ilpost_id(db, str(PODCAST_ID))
+            assert podcast.last_checked is not None
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestUpstreamUnavailable:
+    """Con l'API non disponibile il feed viene servito dai dati del DB."""
+
+    async def test_open_circuit_serves_db_episodes(self, client: AsyncClient):
+        token = await _setup_and_get_token(client)
+        await _populate_db(client, token)
+
+        from api_client import UpstreamUnavailableError
+        from database.database import AsyncSessionLocal
+        from database.models import Podcast
+        from sqlalchemy import update
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Podcast).values(last_checked=None, last_full_sync=None))
+            await db.commit()
+
+        with patch("routes.api.fetch_all_episodes",
+                   side_effect=UpstreamUnavailableError(30)) as mock_fetch:
+            resp = await client.get(f"/podcast/{PODCAST_ID}/rss/{token}")
+
+        mock_fetch.assert_called_once()
+        assert resp.status_code == 200
+        assert resp.headers["X-Served-Stale"] == "true"
+        assert "max-age=60" in resp.headers["Cache-Control"]
+        assert "<item>" in resp.text
+
+    async def test_unavailable_without_db_data_fails(self, client: AsyncClient):
+        token = await _setup_and_get_token(client)
+
+        from api_client import UpstreamUnavailableError
+
+        with patch("routes.api.fetch_all_episodes",
+                   side_effect=UpstreamUnavailableError(30)):
+            resp = await client.get(f"/podcast/999999/rss/{token}")
+
+        assert resp.status_code == 503
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestIncrementalSync:
+    """Dopo una sincronizzazione completa recente si scaricano solo gli episodi nuovi."""
+
+    NEW_EPISODE = {
+        **MOCK_API_EPISODES["data"][0],
+        "id": 1004,
+        "title": "Quarto episodio",
+        "episode_raw_url": "https://cdn.ilpost.it/ep4.mp3",
+        "date": "2026-03-23T08:00:00+01:00",
+    }
+
+    async def _expire_check(self, **values):
+        from database.database import AsyncSessionLocal
+        from database.models import Podcast
+        from sqlalchemy import update
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Podcast).values(last_checked=None, **values))
+            await db.commit()
+
+    async def test_only_new_episodes_are_saved(self, client: AsyncClient):
+        token = await _setup_and_get_token(client)
+        await _populate_db(client, token)
+        await self._expire_check()
+
+        from database.operations import save_episodes
+
+        page = {
+            "head": {"data": {"total": 4}},
+            "data": [self.NEW_EPISODE] + MOCK_API_EPISODES["data"],
+        }
+        with patch("api_client.fetch_episodes", return_value=page) as mock_page, \
+             patch("routes.api.fetch_all_episodes") as mock_full, \
+             patch("routes.api.save_episodes", wraps=save_episodes) as mock_save:
+            resp = await client.get(f"/podcast/{PODCAST_ID}/rss/{token}")
+
+        assert resp.status_code == 200
+        mock_full.assert_not_called()
+        assert mock_page.call_count == 1
+        saved = mock_save.call_args.args[2]
+        assert [ep["id"] for ep in saved] == [1004]
+        assert "Quarto episodio" in resp.text
+
+    async def test_unchanged_first_page_writes_nothing(self, client: AsyncClient):
+        token = await _setup_and_get_token(client)
+        await _populate_db(client, token)
+        await self._expire_check()
+
+        with patch("api_client.fetch_episodes", return_value=MOCK_API_EPISODES), \
+             patch("routes.api.save_episodes") as mock_save:
+            resp = await client.get(f"/podcast/{PODCAST_ID}/rss/{token}")
+
+        assert resp.status_code == 200
+        mock_save.assert_not_called()
+
+    async def test_full_sync_when_due(self, client: AsyncClient):
+        token = await _setup_and_get_token(client)
+        await _populate_db(client, token)
+        await self._expire_check(last_full_sync=None)
+
+        with patch("routes.api.fetch_all_episodes", return_value=MOCK_API_EPISODES) as mock_full, \
+             patch("routes.api.fetch_new_episodes") as mock_incremental:
+            resp = await client.get(f"/podcast/{PODCAST_ID}/rss/{token}")
+
+        assert resp.status_code == 200
+        mock_full.assert_called_once()
+        mock_incremental.assert_not_called()
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestFailedSave:
+
+    async def test_failed_save_keeps_validators_unconfirmed(self, client: AsyncClient):
+        from api_client import UpstreamData
+
+        token = await _setup_and_get_token(client)
+        response = UpstreamData(MOCK_API_EPISODES, validators={"pagina": {"etag": '"v1"'}})
+
+        with patch("routes.api.fetch_all_episodes", return_value=response), \
+             patch("routes.api.save_episodes", side_effect=RuntimeError("disco pieno")), \
+             patch("routes.api.commit_validators") as commit:
+            resp = await client.get(f"/podcast/{PODCAST_ID}/rss/{token}")
+
+        assert resp.status_code == 500
+        commit.assert_not_called()
+
+    async def test_update_refetches_and_confirms_validators(self, client: AsyncClient):
+        import api_client
+        from api_client import UpstreamData
+
+        await _setup_and_get_token(client)
+        validated = {"etag": '"v1"', "last_modified": None, "data": {}, "size": 0}
+        response = UpstreamData(MOCK_API_EPISODES, validators={"pagina-update": validated})
+
+        with patch("routes.api.fetch_all_episodes", return_value=response), \
+             patch("routes.api.clear_episodes_cache") as clear:
+            resp = await client.post(f"/api/podcast/{PODCAST_ID}/update")
+
+        assert resp.status_code == 200
+        clear.assert_called_once_with(PODCAST_ID)
+        assert api_client._validators_cache.get("pagina-update") == validated
+        api_client.clear_all_caches()
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestInboundLimits:
+    """Limiti sulle richieste ai feed e load shedding."""
+
+    async def test_rate_limited_client_gets_cached_feed(self, client: AsyncClient):
+        from utils.rate_limiter import InboundRateLimiter
+
+        token = await _setup_and_get_token(client)
+        with patch("routes.api.inbound_rate_limiter",
+                   InboundRateLimiter({"token": (1, 1)})):
+            first = await _populate_db(client, token)
+
+            with patch("routes.api._generate_rss") as generate:
+                cached = await client.get(f"/podcast/{PODCAST_ID}/rss/{token}")
+                not_modified = await client.get(
+                    f"/podcast/{PODCAST_ID}/rss/{token}",
+                    headers={"If-None-Match": first.headers["etag"]},
+                )
+                generate.assert_not_called()
+
+        assert cached.status_code == 200
+        assert cached.content == first.content
+        assert cached.headers["etag"] == first.headers["etag"]
+        assert not_modified.status_code == 304
+
+    async def test_revoked_token_is_not_served_the_cached_feed(self, client: AsyncClient):
+        from database.database import AsyncSessionLocal
+        from database.user_operations import get_user_by_rss_token, regenerate_rss_token
+        from utils.rate_limiter import InboundRateLimiter
+
+        token = await _setup_and_get_token(client)
+        with patch("routes.api.inbound_rate_limiter",
+                   InboundRateLimiter({"token": (1, 1)})):
+            await _populate_db(client, token)
+            async with AsyncSessionLocal() as db:
+                await regenerate_rss_token(db, await get_user_by_rss_token(db, token))
+            resp = await client.get(f"/podcast/{PODCAST_ID}/rss/{token}")
+
+        assert resp.status_code == 403
+
+    async def test_rate_limited_without_cache_gets_429(self, client: AsyncClient):
+        from utils.rate_limiter import InboundRateLimiter
+
+        token = await _setup_and_get_token(client)
+        await _populate_db(client, token)
+        with patch("routes.api.inbound_rate_limiter",
+                   InboundRateLimiter({"ip": (1, 1)})), \
+             patch("routes.api._feed_cache", {}) as feed_cache:
+            await client.get(f"/podcast/{PODCAST_ID}/rss/{token}")
+            feed_cache.clear()
+            resp = await client.get(f"/podcast/{PODCAST_ID}/rss/{token}")
+
+        assert resp.status_code == 429
+        assert int(resp.headers["retry-after"]) >= 1
+
+    async def test_opml_refresh_with_one_token(self, client: AsyncClient):
+        from fastapi import Response
+        from utils.rate_limiter import InboundRateLimiter
+
+        token = await _setup_and_get_token(client)
+        # Limiti di default (conftest li disattiva); nessun feed in cache,
+        # come dopo un riavvio
+        limiter = InboundRateLimiter({"token": (6, 5), "ip": (60, 100)})
+        feeds = range(1, 31)
+        with patch("routes.api.inbound_rate_limiter", limiter), \
+             patch("routes.api._feed_cache", {}), \
+             patch("routes.api._serve_feed", return_value=Response("<rss/>")):
+            refreshed = [
+                (await client.get(f"/podcast/{podcast_id}/rss/{token}")).status_code
+                for podcast_id in feeds
+            ]
+            hammered = [
+                (await client.get(f"/podcast/1/rss/{token}")).status_code
+                for _ in range(5)
+            ]
+
+        assert refreshed == [200] * len(feeds)
+        # Lo stesso feed richiesto di continuo resta limitato
+        assert hammered[-1] == 429
+
+    async def test_load_shedding(self, client: AsyncClient):
+        from utils.rate_limiter import ConcurrencyLimiter
+
+        token = await _setup_and_get_token(client)
+        first = await _populate_db(client, token)
+        busy = ConcurrencyLimiter("test", 1)
+        assert busy.try_acquire()
+
+        with patch("routes.api.feed_render_limiter", busy):
+            cached = await client.get(f"/podcast/{PODCAST_ID}/rss/{token}")
+            with patch("routes.api._feed_cache", {}):
+                shed = await client.get(f"/podcast/{PODCAST_ID}/rss/{token}")
+
+        assert cached.status_code == 200
+        assert cached.content == first.content
+        assert shed.status_code == 503
+        assert "retry-after" in shed.headers
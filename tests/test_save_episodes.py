@@ -0,0 +1,91 @@
+"""Test del salvataggio in blocco degli episodi."""
+import itertools
+
+import pytest
+from sqlalchemy import func, select
+
+from database.models import Episode, Podcast
+from database.operations import get_podcast_episodes, save_episodes
+from utils import metrics
+
+_ids = itertools.count(700000)
+
+
+def _episode(ilpost_id: int, title: str = None) -> dict:
+    return {
+        "id": ilpost_id,
+        "title": title or f"Episodio {ilpost_id}",
+        "content_html": f"<p>Descrizione {ilpost_id}</p>",
+        "summary": "Sommario",
+        "episode_raw_url": f"https://example.com/{ilpost_id}.mp3",
+        "date": "2026-01-01T06:00:00+01:00",
+        "milliseconds": 60000,
+    }
+
+
+async def _podcast(db) -> Podcast:
+    podcast = Podcast(ilpost_id=str(next(_ids)), title="Show")
+    db.add(podcast)
+    await db.commit()
+    return podcast
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestSaveEpisodes:
+
+    async def test_inserts_new_episodes(self, db_session):
+        podcast = await _podcast(db_session)
+        data = [_episode(next(_ids)) for _ in range(3)]
+
+        assert await save_episodes(db_session, podcast, data) == 3
+
+        episodes, _ = await get_podcast_episodes(db_session, int(podcast.ilpost_id))
+        assert sorted(ep.title for ep in episodes) == sorted(ep["title"] for ep in data)
+        assert all(ep.content_hash and ep.description_verified for ep in episodes)
+
+    async def test_unchanged_episodes_are_not_written(self, db_session):
+        podcast = await _podcast(db_session)
+        data = [_episode(next(_ids)) for _ in range(3)]
+        await save_episodes(db_session, podcast, data)
+        before = metrics.get_counter("episodes_saved_total", result="unchanged")
+
+        assert await save_episodes(db_session, podcast, data) == 0
+        assert metrics.get_counter("episodes_saved_total", result="unchanged") == before + 3
+
+    async def test_changed_episode_is_updated_in_loaded_objects(self, db_session):
+        podcast = await _podcast(db_session)
+        data = [_episode(next(_ids)) for _ in range(2)]
+        await save_episodes(db_session, podcast, data)
+        episodes, _ = await get_podcast_episodes(db_session, int(podcast.ilpost_id))
+        assert len(episodes) == 2
+
+        data[0] = _episode(data[0]["id"], title="Titolo corretto")
+        data.append(_episode(next(_ids)))
+        assert await save_episodes(db_session, podcast, data) == 2
+
+        episodes, _ = await get_podcast_episodes(db_session, int(podcast.ilpost_id))
+        titles = {ep.ilpost_id: ep.title for ep in episodes}
+        assert len(titles) == 3
+        assert titles[str(data[0]["id"])] == "Titolo corretto"
+
+    async def test_duplicate_ids_keep_the_last_one(self, db_session):
+        podcast = await _podcast(db_session)
+        ilpost_id = next(_ids)
+        data = [_episode(ilpost_id, "Vecchio"), _episode(ilpost_id, "Nuovo")]
+
+        assert await save_episodes(db_session, podcast, data) == 1
+        title = await db_session.scalar(
+            select(Episode.title).where(Episode.ilpost_id == str(ilpost_id))
+        )
+        assert title == "Nuovo"
+
+    async def test_large_podcast_uses_chunked_lookups(self, db_session):
+        podcast = await _podcast(db_session)
+        data = [_episode(next(_ids)) for _ in range(1200)]
+
+        assert await save_episodes(db_session, podcast, data) == 1200
+        assert await save_episodes(db_session, podcast, data) == 0
+        count = await db_session.scalar(
+            select(func.count()).select_from(Episode).where(Episode.podcast_id == podcast.id)
+        )
+        assert count == 1200
@@ -0,0 +1,204 @@
+"""Test della ricerca negli episodi salvati (FTS5 e ricerca ILIKE senza indice)."""
+import itertools
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select, text
+
+from database.database import engine
+from database.models import Episode, Podcast
+from database.operations import save_episode_descriptions, save_episodes, update_episode
+from database.search import _search_like, build_search_index, match_expression, search_episodes
+from tests.conftest import create_admin_via_setup, requires_sqlite
+
+_ids = itertools.count(950000)
+
+
+def _episode(ilpost_id: int, title: str, content_html: str = "", summary: str = "") -> dict:
+    return {
+        "id": ilpost_id,
+        "title": title,
+        "content_html": content_html,
+        "summary": summary,
+        "episode_raw_url": f"https://example.com/{ilpost_id}.mp3",
+        "date": "2026-01-01T06:00:00+01:00",
+        "milliseconds": 60000,
+    }
+
+
+async def _podcast(db, title: str = "Show") -> Podcast:
+    podcast = Podcast(ilpost_id=str(next(_ids)), title=title)
+    db.add(podcast)
+    await db.commit()
+    return podcast
+
+
+@requires_sqlite
+@pytest.mark.asyncio(loop_scope="session")
+class TestSearchIndex:
+
+    async def test_saved_episodes_are_searchable(self, db_session):
+        podcast = await _podcast(db_session, "Rassegna")
+        await save_episodes(db_session, podcast, [
+            _episode(next(_ids), "Cronache dal pianeta Zorblax"),
+            _episode(next(_ids), "Altro episodio", "<p>Si parla di <b>cucina</b></p>"),
+        ])
+
+        results, total = await search_episodes(db_session, "zorblax")
+
+        assert total == 1
+        assert results[0]["title"] == "Cronache dal pianeta Zorblax"
+        assert results[0]["podcast_title"] == "Rassegna"
+        assert results[0]["podcast_id"] == int(podcast.ilpost_id)
+        assert "<mark>Zorblax</mark>" in results[0]["snippet"]
+
+    async def test_description_is_indexed_without_html(self, db_session):
+        podcast = await _podcast(db_session)
+        await save_episodes(db_session, podcast, [
+            _episode(next(_ids), "Puntata", '<p class="quxbarfoo">Intervista sul <b>quokkismo</b></p>'),
+        ])
+
+        assert (await search_episodes(db_session, "quokkismo"))[1] == 1
+        # Gli attributi HTML non finiscono nell'indice
+        assert (await search_episodes(db_session, "quxbarfoo"))[1] == 0
+
+    async def test_title_matches_rank_first(self, db_session):
+        podcast = await _podcast(db_session)
+        in_description = _episode(next(_ids), "Puntata qualunque", "<p>Parliamo di gnurfli</p>")
+        in_title = _episode(next(_ids), "Gnurfli", "<p>Altro</p>")
+        await save_episodes(db_session, podcast, [in_description, in_title])
+
+        results, _ = await search_episodes(db_session, "gnurfli")
+
+        assert [r["ilpost_id"] for r in results] == [str(in_title["id"]), str(in_description["id"])]
+
+    async def test_updated_episode_is_reindexed(self, db_session):
+        podcast = await _podcast(db_session)
+        ilpost_id = next(_ids)
+        await save_episodes(db_session, podcast, [_episode(ilpost_id, "Vecchio titolo plimb")])
+        await save_episodes(db_session, podcast, [_episode(ilpost_id, "Nuovo titolo snarv")])
+
+        assert (await search_episodes(db_session, "plimb"))[1] == 0
+        assert (await search_episodes(db_session, "snarv"))[1] == 1
+
+        await save_episode_descriptions(db_session, {str(ilpost_id): "<p>Testo completo vrungle</p>"})
+        assert (await search_episodes(db_session, "vrungle"))[1] == 1
+
+    async def test_refreshed_episode_is_reindexed_and_rehashed(self, db_session):
+        podcast = await _podcast(db_session)
+        ilpost_id = str(next(_ids))
+        await save_episodes(db_session, podcast, [_episode(int(ilpost_id), "Titolo frazzle")])
+        stored_hash = await db_session.scalar(
+            select(Episode.content_hash).where(Episode.ilpost_id == ilpost_id)
+        )
+
+        assert await update_episode(db_session, ilpost_id, {"title": "Titolo grommet"})
+
+        assert (await search_episodes(db_session, "frazzle"))[1] == 0
+        assert (await search_episodes(db_session, "grommet"))[1] == 1
+        assert await db_session.scalar(
+            select(Episode.content_hash).where(Episode.ilpost_id == ilpost_id)
+        ) != stored_hash
+        assert not await update_episode(db_session, "0", {"title": "Mai salvato"})
+
+    async def test_prefix_diacritics_and_pagination(self, db_session):
+        podcast = await _podcast(db_session)
+        await save_episodes(db_session, podcast, [
+            _episode(next(_ids), f"Perché trambolino {i}") for i in range(5)
+        ])
+
+        first, total = await search_episodes(db_session, "perche tramb", per_page=2)
+        second, _ = await search_episodes(db_session, "perche tramb", page=2, per_page=2)
+        third, _ = await search_episodes(db_session, "perche tramb", page=3, per_page=2)
+
+        assert total == 5
+        assert [len(first), len(second), len(third)] == [2, 2, 1]
+        assert len({r["ilpost_id"] for r in first + second + third}) == 5
+
+    async def test_filter_by_podcast(self, db_session):
+        podcast_a = await _podcast(db_session)
+        podcast_b = await _podcast(db_session)
+        await save_episodes(db_session, podcast_a, [_episode(next(_ids), "Blorptastico A")])
+        await save_episodes(db_session, podcast_b, [_episode(next(_ids), "Blorptastico B")])
+
+        results, total = await search_episodes(
+            db_session, "blorptastico", podcast_id=int(podcast_b.ilpost_id)
+        )
+        assert total == 1
+        assert results[0]["title"] == "Blorptastico B"
+
+    async def test_query_syntax_is_not_exposed(self, db_session):
+        assert match_expression('title:foo OR "bar') == '"title"* "foo"* "OR"* "bar"*'
+        assert match_expression("  ?!  ") is None
+        assert await search_episodes(db_session, 'NEAR( "*') == ([], 0)
+
+    async def test_existing_episodes_are_indexed_on_upgrade(self, db_session):
+        podcast = await _podcast(db_session)
+        await save_episodes(db_session, podcast, [_episode(next(_ids), "Episodio wombatico")])
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP TABLE episodes_fts"))
+            indexed = await conn.run_sync(build_search_index)
+            again = await conn.run_sync(build_search_index)
+
+        assert indexed > 0
+        assert again == 0
+        assert (await search_episodes(db_session, "wombatico"))[1] == 1
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestSearchLike:
+    """Ricerca usata con PostgreSQL, provata direttamente anche su SQLite."""
+
+    async def test_all_terms_must_match(self, db_session):
+        podcast = await _podcast(db_session, "Rassegna")
+        both = _episode(next(_ids), "Crumblefax del giorno", "<p>Si parla di <b>zentorio</b></p>")
+        one = _episode(next(_ids), "Crumblefax di ieri")
+        await save_episodes(db_session, podcast, [both, one])
+
+        results, total = await _search_like(db_session, ["crumblefax", "zentorio"], 1, 20, None)
+
+        assert total == 1
+        assert results[0]["ilpost_id"] == str(both["id"])
+        assert results[0]["podcast_title"] == "Rassegna"
+        assert "<mark>zentorio</mark>" in results[0]["snippet"]
+        assert "<b>" not in results[0]["snippet"]
+
+    async def test_title_matches_rank_first_and_filter(self, db_session):
+        podcast_a = await _podcast(db_session)
+        podcast_b = await _podcast(db_session)
+        in_description = _episode(next(_ids), "Puntata", "<p>Parliamo di flimbo_x</p>")
+        in_title = _episode(next(_ids), "Flimbo_x", "<p>Altro</p>")
+        await save_episodes(db_session, podcast_a, [in_description, in_title])
+        await save_episodes(db_session, podcast_b, [_episode(next(_ids), "Flimbo_x B")])
+
+        results, total = await _search_like(
+            db_session, ["flimbo_x"], 1, 20, int(podcast_a.ilpost_id)
+        )
+
+        assert total == 2
+        assert [r["ilpost_id"] for r in results] == [str(in_title["id"]), str(in_description["id"])]
+        # "_" e' un carattere qualunque per LIKE: va cercato letteralmente
+        assert (await _search_like(db_session, ["flimboxx"], 1, 20, None))[1] == 0
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestSearchEndpoint:
+
+    async def test_search_endpoint(self, client: AsyncClient):
+        await create_admin_via_setup(client)
+        from database.database import AsyncSessionLocal
+        async with AsyncSessionLocal() as db:
+            podcast = await _podcast(db, "Morning")
+            await save_episodes(db, podcast, [
+                _episode(next(_ids), f"Episodio frabjous {i}") for i in range(3)
+            ])
+
+        resp = await client.get("/api/search", params={"q": "frabjous", "per_page": 2})
+
+        assert resp.status_code == 200
+        body = resp.json()
+        assert body["total"] == 3
+        assert body["total_pages"] == 2
+        assert len(body["data"]) == 2
+        assert body["data"][0]["podcast_title"] == "Morning"
+        assert "<mark>frabjous</mark>" in body["data"][0]["snippet"]
@@ -0,0 +1,103 @@
+"""Test della cache stale-while-revalidate usata dal client API."""
+import asyncio
+
+import pytest
+
+from utils.swr_cache import SWRCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class CountingFetcher:
+    """Fetcher che restituisce valori incrementali e conta le chiamate."""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.calls = 0
+        self.delay = delay
+        self.fail = fail
+
+    async def __call__(self):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return f"v{self.calls}"
+
+
+def _cache(clock: FakeClock) -> SWRCache:
+    return SWRCache("test", maxsize=10, ttl=60, grace=30, stale_if_error=300, timer=clock)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestSWRCache:
+
+    async def test_fresh_value_served_without_fetch(self):
+        clock = FakeClock()
+        cache = _cache(clock)
+        fetch = CountingFetcher()
+
+        assert await cache.get_or_fetch("k", fetch) == "v1"
+        clock.now += 59
+        assert await cache.get_or_fetch("k", fetch) == "v1"
+        assert fetch.calls == 1
+
+    async def test_stale_value_served_while_one_refresh_runs(self):
+        """Nella finestra di grazia si serve il vecchio valore e parte un solo refresh."""
+        clock = FakeClock()
+        cache = _cache(clock)
+        fetch = CountingFetcher(delay=0.02)
+        await cache.get_or_fetch("k", fetch)
+
+        clock.now += 70
+        results = await asyncio.gather(*(cache.get_or_fetch("k", fetch) for _ in range(5)))
+        assert results == ["v1"] * 5
+
+        await asyncio.sleep(0.05)
+        assert fetch.calls == 2
+        assert await cache.get_or_fetch("k", fetch) == "v2"
+
+    async def test_expired_beyond_grace_waits_for_fetch(self):
+        clock = FakeClock()
+        cache = _cache(clock)
+        fetch = CountingFetcher()
+        await cache.get_or_fetch("k", fetch)
+
+        clock.now += 100
+        assert await cache.get_or_fetch("k", fetch) == "v2"
+
+    async def test_stale_if_error(self):
+        """Se l'aggiornamento fallisce si serve il valore precedente."""
+        clock = FakeClock()
+        cache = _cache(clock)
+        await cache.get_or_fetch("k", CountingFetcher())
+
+        clock.now += 200
+        assert await cache.get_or_fetch("k", CountingFetcher(fail=True)) == "v1"
+
+    async def test_error_without_usable_value_raises(self):
+        clock = FakeClock()
+        cache = _cache(clock)
+        await cache.get_or_fetch("k", CountingFetcher())
+
+        clock.now += 1000
+        with pytest.raises(RuntimeError):
+            await cache.get_or_fetch("k", CountingFetcher(fail=True))
+
+    async def test_mapping_interface_respects_ttl(self):
+        """L'interfaccia dict (in, get, pop) resta compatibile con TTLCache."""
+        clock = FakeClock()
+        cache = _cache(clock)
+        cache["k"] = "v"
+
+        assert "k" in cache and cache["k"] == "v"
+        clock.now += 61
+        assert "k" not in cache
+        assert cache.get("k") is None
+        assert cache.pop("k") == "v"
@@ -0,0 +1,170 @@
+"""Test del gestore asincrono del token dell'API Il Post."""
+import asyncio
+import base64
+import json
+
+import pytest
+
+from auth import TokenManager, token_expiry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeLogin:
+    """Login simulato che conta le chiamate e restituisce token numerati."""
+
+    def __init__(self, delay: float = 0.0, tokens=None, failures: int = 0):
+        self.calls = 0
+        self.delay = delay
+        self.tokens = list(tokens or [])
+        self.failures = failures
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("login fallito")
+        return self.tokens.pop(0) if self.tokens else f"token-{self.calls}"
+
+
+def _jwt(exp: float) -> str:
+    def part(data: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+    return f"{part({'alg': 'HS256'})}.{part({'exp': exp})}.firma"
+
+
+def test_token_expiry():
+    assert token_expiry(_jwt(1234)) == 1234
+    assert token_expiry("token-opaco") is None
+    assert token_expiry("a.non-base64!.c") is None
+
+
+@pytest.mark.asyncio(loop_scope="session")
+class TestTokenManager:
+
+    async def test_concurrent_requests_share_one_login(self):
+        login = FakeLogin(delay=0.02)
+        manager = TokenManager(login, default_ttl=3600, refresh_margin=60)
+
+        tokens = await asyncio.gather(*(manager.get_token() for _ in range(10)))
+
+        assert tokens == ["token-1"] * 10
+        assert login.calls == 1
+
+    async def test_expiry_read_from_jwt(self):
+        clock = FakeClock()
+        token = _jwt(clock.now + 900)
+        manager = TokenManager(FakeLogin(tokens=[token]), default_ttl=7200, timer=clock)
+
+        assert await manager.get_token() == token
+        assert manager.remaining == pytest.approx(900)
+
+    async def test_opaque_token_uses_default_ttl(self):
+        clock = FakeClock()
+        manager = TokenManager(FakeLogin(), default_ttl=7200, timer=clock)
+        await manager.get_token()
+        assert manager.remaining == pytest.approx(7200)
+
+    async def test_near_expiry_refreshes_in_background(self):
+        """Vicino alla scadenza si restituisce subito il token e lo si rinnova dietro."""
+        clock = FakeClock()
+        login = FakeLogin(delay=0.02)
+        manager = TokenManager(login, default_ttl=600, refresh_margin=60, timer=clock)
+        await manager.get_token()
+
+        clock.now += 570
+        assert await manager.get_token() == "token-1"
+        assert await manager.get_token() == "token-1"
+        await asyncio.sleep(0.05)
+
+        assert login.calls == 2
+        assert await manager.get_token() == "token-2"
+
+    async def test_expired_token_waits_for_refresh(self):
+        clock = FakeClock()
+        manager = TokenManager(FakeLogin(), default_ttl=600, timer=clock)
+        await manager.get_token()
+
+        clock.now += 601
+        assert await manager.get_token() == "token-2"
+
+    async def test_invalidate(self):
+        manager = TokenManager(FakeLogin(), default_ttl=600)
+        await manager.get_token()
+        manager.invalidate()
+        assert await manager.get_token() == "token-2"
+
+    async def test_refresh_rejected_skips_already_replaced_token(self):
+        login = FakeLogin()
+        manager = TokenManager(login, default_ttl=600)
+        await manager.get_token()
+
+        assert await manager.refresh_rejected("token-1") == "token-2"
+        # Un token rifiutato ma gia' sostituito non causa un altro login
+        assert await manager.refresh_rejected("token-1") == "token-2"
+        assert login.calls == 2
+
+    async def test_login_retried_once(self):
+        login = FakeLogin(failures=1)
+        manager = TokenManager(login, default_ttl=600)
+        assert await manager.get_token() == "token-2"
+
+        manager.invalidate()
+        login.failures = 2
+        with pytest.raises(RuntimeError):
+            await manager.get_token()
+
+    async def test_background_loop_refreshes_before_expiry(self):
+        login = FakeLogin()
+        manager = TokenManager(login, default_ttl=1.5, refresh_margin=1)
+        manager.start()
+        try:
+            await asyncio.sleep(1.3)
+        finally:
+            await manager.stop()
+
+        assert login.calls == 2
+
+    async def test_short_lived_token_is_not_refreshed_on_every_call(self):
+        """Con un token piu' breve del margine si rinnova a meta' della durata."""
+        clock = FakeClock()
+        login = FakeLogin(tokens=[_jwt(clock.now + 120), _jwt(clock.now + 240)])
+        manager = TokenManager(login, default_ttl=7200, refresh_margin=300, timer=clock)
+        await manager.get_token()
+
+        clock.now += 30
+        await manager.get_token()
+        await asyncio.sleep(0)
+        assert login.calls == 1
+
+        clock.now += 40
+        await manager.get_token()
+        await asyncio.sleep(0.01)
+        assert login.calls == 2
+
+    async def test_background_loop_waits_half_a_short_lifetime(self, monkeypatch):
+        clock = FakeClock()
+        login = FakeLogin(tokens=[_jwt(clock.now + 120)])
+        manager = TokenManager(login, default_ttl=7200, refresh_margin=300, timer=clock)
+        await manager.get_token()
+        sleeps = []
+
+        async def fake_sleep(delay):
+            sleeps.append(delay)
+            raise asyncio.CancelledError
+
+        monkeypatch.setattr("auth.asyncio.sleep", fake_sleep)
+        with pytest.raises(asyncio.CancelledError):
+            await manager._refresh_loop()
+
+        assert sleeps == [pytest.approx(60)]
+        assert login.calls == 1